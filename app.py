@@ -1,63 +1,203 @@
+import os
+import click
 from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
-from flask_migrate import Migrate
-from werkzeug.security import generate_password_hash  # Import for hashing passwords
-from models import db  
-from models.user import User  
-from models.quiz import Quiz  
-from controllers.main_controller import main  
-from controllers.auth_controller import auth  
-from controllers.quiz_controller import quiz  
-from controllers.admin import admin_bp as admin  
-from controllers.user_controller import user_bp
-
-app = Flask(__name__)
-
-# Configure SQLite database
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///quiz.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['SECRET_KEY'] = 'your_secret_key'  # Required for Flask-WTF forms
-
-db.init_app(app)  # Register SQLAlchemy with Flask app
+from models import db
+from services.database import init_database
+from services.quiz_cache import quiz_cache
+from services.score_writer import score_writer
+from services.leaderboard import leaderboards
+from services.attempts import attempts
+from services.answer_log import answer_log
+from services.quiz_payloads import quiz_payloads
+from services.assets import assets
+from services.page_cache import page_cache
+from services.credentials import credentials, DEFAULT_METHOD
+from services.identity import identity_cache
+from services.deletion import deletion
+from services.catalog import catalog
+from services.instrumentation import instrumentation, gauges
+
+# Application factory. Creating the app only reads configuration and wires extensions:
+# nothing touches the database until a request or CLI command does, so every worker
+# boots the same fast way. A fresh database is set up once with `flask --app app bootstrap`.
+#
+#   flask --app app run                  (the CLI finds create_app)
+#   gunicorn 'app:create_app()'          (or asgi.py for uvicorn)
+#
+# One app per process. The services (quiz_cache, score_writer, deletion, ...) are
+# module-level singletons that create_app configures in place and registers in
+# app.extensions, so a second create_app() in the same process rebinds them to the
+# new app's settings and database. Tests and benchmarks that build several apps
+# must use them one after another, never side by side.
+
+
+# Settings from the environment; create_app(config) overrides any of them
+def default_config():
+    return {
+        # Engine profile: WAL, pragmas, pools; see services/database.py
+        'SQLALCHEMY_DATABASE_URI': os.environ.get('QUIZ_DATABASE_URI', 'sqlite:///quiz.db'),
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        'SECRET_KEY': 'your_secret_key',  # Required for Flask-WTF forms
+        'SCORE_QUEUE_ENABLED': False,  # Group-commit quiz scores from a background writer
+        'INSTRUMENTATION_ENABLED': os.environ.get('QUIZ_INSTRUMENTATION') == '1',  # Served at /admin/metrics
+        'METRICS_TOKEN': os.environ.get('QUIZ_METRICS_TOKEN'),  # Bearer token for Prometheus scrapes
+        'PASSWORD_HASH_METHOD': os.environ.get('QUIZ_PASSWORD_HASH', DEFAULT_METHOD),  # Weaker hashes upgrade on login
+        'DELETE_MODE': os.environ.get('QUIZ_DELETE_MODE', 'hard'),  # 'soft': tombstone now, purge in the background
+        'ADMIN_EMAIL': os.environ.get('QUIZ_ADMIN_EMAIL', 'admin@quiz.com'),  # Account created by `bootstrap`
+        'ADMIN_PASSWORD': os.environ.get('QUIZ_ADMIN_PASSWORD', 'admin123'),
+    }
+
 
 # Flask-Login setup
 login_manager = LoginManager()
-login_manager.init_app(app)
 login_manager.login_view = 'auth.login'  # Redirect to login if user is not authenticated
 
 @login_manager.user_loader
 def load_user(user_id):
-    return db.session.get(User, int(user_id))
+    return identity_cache.load(int(user_id))  # Cached snapshot, not an ORM row
+
+
+def create_app(config=None):
+    app = Flask(__name__)
+    app.config.update(default_config())
+    app.config.update(config or {})
+
+    init_database(app)  # Register SQLAlchemy with Flask app
+    quiz_cache.init_app(app)
+    score_writer.init_app(app)
+    leaderboards.init_app(app)
+    attempts.init_app(app)
+    answer_log.init_app(app)
+    quiz_payloads.init_app(app)
+    assets.init_app(app)
+    page_cache.init_app(app)
+    credentials.init_app(app)
+    identity_cache.init_app(app)
+    deletion.init_app(app)
+    catalog.init_app(app)
+    instrumentation.init_app(app)
+    instrumentation.collectors[:] = [
+        gauges('quiz_cache', quiz_cache.stats), gauges('quiz_score_queue', score_writer.stats),
+        gauges('quiz_autosave', answer_log.stats), gauges('quiz_payload_cache', quiz_payloads.stats),
+        gauges('quiz_page_cache', page_cache.stats), gauges('quiz_credentials', credentials.stats),
+        gauges('quiz_identity_cache', identity_cache.stats), gauges('quiz_deletion', deletion.stats),
+        gauges('quiz_catalog', catalog.stats),
+    ]
+    login_manager.init_app(app)
+
+    register_blueprints(app)
+    register_commands(app)
+    if os.environ.get('FLASK_RUN_FROM_CLI') == 'true':
+        # `flask db ...`; Alembic is the slowest import of all and no request needs it
+        from flask_migrate import Migrate
+        Migrate(app, db)
+    return app
+
+
+# The controllers (and, through them, the form and template helpers) are imported here
+# rather than at the top, so importing this module stays cheap
+def register_blueprints(app):
+    from controllers.main_controller import main
+    from controllers.auth_controller import auth
+    from controllers.quiz_controller import quiz
+    from controllers.admin import admin_bp as admin
+    from controllers.user_controller import user_bp
+    from controllers.api import api_bp
+
+    app.register_blueprint(main)
+    app.register_blueprint(auth, url_prefix='/auth')
+    app.register_blueprint(quiz, url_prefix='/quiz')
+    app.register_blueprint(admin, url_prefix='/admin')
+    app.register_blueprint(user_bp, url_prefix='/user')
+    app.register_blueprint(api_bp, url_prefix='/api')
+
+
+# Maintenance commands import what they need when they run
+def register_commands(app):
+    # Tables, search indexes and the admin account, once per database: `flask --app app bootstrap`
+    @app.cli.command('bootstrap')
+    def bootstrap():
+        from services.bootstrap import bootstrap as bootstrap_database
+        if bootstrap_database(app.config['ADMIN_EMAIL'], app.config['ADMIN_PASSWORD']):
+            print(f"Admin user created: {app.config['ADMIN_EMAIL']}")
+        print("Database ready")
+
+    # Backfill per-quiz score aggregates: `flask --app app rebuild-quiz-stats`
+    @app.cli.command('rebuild-quiz-stats')
+    def rebuild_quiz_stats():
+        from services import score_stats
+        count = score_stats.rebuild()
+        print(f"Rebuilt score stats for {count} quizzes")
+
+    # Backfill leaderboards from UserScore: `flask --app app rebuild-leaderboards`
+    @app.cli.command('rebuild-leaderboards')
+    def rebuild_leaderboards():
+        count = leaderboards.rebuild()
+        print(f"Rebuilt {count} leaderboard entries")
+
+    # Backfill the daily and weekly score rollups: `flask --app app rebuild-score-rollups`
+    @app.cli.command('rebuild-score-rollups')
+    def rebuild_score_rollups():
+        from services import score_rollups
+        count = score_rollups.rebuild()
+        print(f"Rebuilt {count} score rollup rows")
+
+    # Expire abandoned quiz attempts now instead of waiting for the sweeper: `flask --app app sweep-attempts`
+    @app.cli.command('sweep-attempts')
+    def sweep_attempts():
+        expired, deleted = attempts.sweep()
+        print(f"{expired} attempts expired, {deleted} finished attempts deleted")
+
+    # Bulk question-bank import/export (CSV or JSONL): `flask --app app import-questions bank.csv`
+    @app.cli.command('import-questions')
+    @click.argument('path')
+    @click.option('--format', 'fmt', type=click.Choice(('csv', 'jsonl')), default=None)
+    def import_questions(path, fmt):
+        from services import question_bank
+        report = question_bank.import_file(path, fmt, progress=lambda r: print(
+            f"{r.rows_read} rows read, {r.questions_imported} questions imported, {r.error_count} errors"))
+        for error in report.errors:
+            print(f"line {error['line']}: {error['error']}")
 
-# Register blueprints BEFORE app.run()
-app.register_blueprint(main)
-app.register_blueprint(auth, url_prefix='/auth')
-app.register_blueprint(quiz, url_prefix='/quiz')  
-app.register_blueprint(admin, url_prefix='/admin')  
-app.register_blueprint(user_bp, url_prefix='/user')
+    @app.cli.command('export-questions')
+    @click.argument('path')
+    @click.option('--format', 'fmt', type=click.Choice(('csv', 'jsonl')), default=None)
+    def export_questions(path, fmt):
+        from services import question_bank
+        fmt = fmt or question_bank.detect_format(path)
+        stream = question_bank.stream_csv if fmt == 'csv' else question_bank.stream_jsonl
+        with open(path, 'w', encoding='utf-8', newline='') as out:
+            for chunk in stream(question_bank.export_rows()):
+                out.write(chunk)
+        print(f"Question bank exported to {path}")
 
+    # Download third-party front-end files (Chart.js) into static/vendor: `flask --app app vendor-assets`
+    @app.cli.command('vendor-assets')
+    @click.option('--force', is_flag=True, help='Re-download files that already exist')
+    def vendor_assets(force):
+        for name, digest in assets.vendor(force):
+            print(f"Fetched {name} (sha256 {digest})")
+        print(f"{len(assets.build())} static assets fingerprinted into {assets.output_dir}")
 
-# Ensure database tables exist and create an admin user
-with app.app_context():
-    db.create_all()
+    # Fold new quiz responses into the item statistics: `flask --app app refresh-item-analysis`
+    @app.cli.command('refresh-item-analysis')
+    def refresh_item_analysis():
+        from services import item_analysis
+        print(f"Item analysis refreshed for {item_analysis.refresh_all()} quiz versions")
 
-    # Check if admin exists, if not, create one
-    admin_email = "admin@quiz.com"
-    admin_user = User.query.filter_by(email=admin_email).first()
+    # Remove soft-deleted subjects, chapters and quizzes now: `flask --app app purge-deleted`
+    @app.cli.command('purge-deleted')
+    def purge_deleted():
+        print(f"{deletion.purge()} soft-deleted rows purged")
 
-    if not admin_user:
-        admin_user = User(
-            full_name="Admin", 
-            email=admin_email, 
-            role="admin", 
-            password=generate_password_hash("admin123")  # Hash the password for security
-        )
-        db.session.add(admin_user)
-        db.session.commit()
-        print("Admin user created: admin@quiz.com / admin123")
+    # Repopulate the full-text search indexes: `flask --app app rebuild-search-index`
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search_index():
+        from services import search
+        search.rebuild_search_index()
+        print("Search indexes rebuilt")
 
-migrate = Migrate(app, db)
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    create_app().run(debug=True)
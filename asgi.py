@@ -0,0 +1,16 @@
+# ASGI entry point: `uvicorn asgi:application`.
+# Needs two packages beyond the app's own: `pip install asgiref uvicorn`.
+#
+# This is an adapter, not an async app: WsgiToAsgi runs each request on a thread from
+# its pool, so a request in flight still holds one thread for as long as it runs. What
+# the event loop adds is that idle keep-alive connections (exam-takers between autosaves
+# and payload revalidations) hold none. Concurrency is still bounded by the pool, as with
+# a threaded WSGI server; `python app.py` / any WSGI server keeps working as before.
+try:
+    from asgiref.wsgi import WsgiToAsgi
+except ImportError as exc:
+    raise ImportError("asgi.py needs asgiref (and an ASGI server): pip install asgiref uvicorn") from exc
+
+from app import create_app
+
+application = WsgiToAsgi(create_app())
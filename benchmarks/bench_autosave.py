@@ -0,0 +1,102 @@
+"""Autosave load: many students with open attempts posting answer deltas.
+
+Each simulated student sends one or two changed answers every --interval seconds
+through the HTTP endpoint. "coalesced" is the shipped path (group commit: each
+request waits for the next batch, written at most once per AUTOSAVE_FLUSH_INTERVAL);
+"per-request" (AUTOSAVE_FLUSH_INTERVAL = 0) writes every autosave in its own
+transaction.
+
+Usage: python -m benchmarks.bench_autosave [--students 1000] [--interval 3] [--seconds 10]
+"""
+import argparse
+import os
+import random
+import threading
+import time
+
+from benchmarks.bench_concurrency import percentile
+from benchmarks.common import make_app, seed, login
+from models import db, AttemptAnswer
+from services.answer_log import answer_log
+from services.attempts import attempts
+from services.quiz_cache import quiz_cache
+
+
+def student_loop(client, attempt, stop, interval, latencies, errors):
+    rnd = random.Random()
+    question_ids = [int(qid) for qid in attempt.answer_key.question_ids]
+    url = f'/api/attempts/{attempt.id}/answers'
+    next_at = time.monotonic() + rnd.uniform(0, interval)
+    while not stop.is_set():
+        delay = next_at - time.monotonic()
+        if delay > 0:
+            stop.wait(delay)
+            continue
+        next_at += interval
+        answers = {str(rnd.choice(question_ids)): rnd.randint(1, 4) for _ in range(rnd.randint(1, 2))}
+        start = time.perf_counter()
+        response = client.post(url, json={'answers': answers})
+        latencies.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            errors.append(response.status_code)
+
+
+def run(name, args, flush_interval):
+    app = make_app(config={'AUTOSAVE_FLUSH_INTERVAL': flush_interval, 'ATTEMPT_SWEEP_INTERVAL': 0})
+    try:
+        with app.app_context():
+            seed(quizzes=10, questions_per_quiz=args.questions, users=args.students + 1, scores_per_user=0)
+            students = []
+            for user_id in range(2, args.students + 2):
+                attempt = attempts.open(user_id, quiz_cache.get(user_id % 10 + 1))
+                client = app.test_client()
+                login(client, user_id)
+                students.append((client, attempt))
+            db.session.commit()
+
+        stop = threading.Event()
+        latencies, errors = [], []
+        # One thread per student, each sleeping between saves like a browser tab
+        threads = [threading.Thread(target=student_loop,
+                                    args=(client, attempt, stop, args.interval, latencies, errors))
+                   for client, attempt in students]
+        for thread in threads:
+            thread.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        with app.app_context():
+            answer_log.flush()
+            rows = db.session.query(AttemptAnswer).count()
+
+        stats = answer_log.stats()
+        print(f"{name:>12} {len(latencies) / args.seconds:>9.1f} {percentile(latencies, 0.5) * 1000:>8.2f} "
+              f"{percentile(latencies, 0.95) * 1000:>8.2f} {percentile(latencies, 0.99) * 1000:>8.2f} "
+              f"{len(errors):>7} {stats['flushes']:>8} {stats['max_flush_ms']:>9.1f} {rows:>7}")
+    finally:
+        with app.app_context():
+            db.engine.dispose()
+        for suffix in ('', '-wal', '-shm', '-journal'):
+            if os.path.exists(app.db_path + suffix):
+                os.remove(app.db_path + suffix)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--students', type=int, default=1000)
+    parser.add_argument('--interval', type=float, default=3.0)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--questions', type=int, default=30)
+    parser.add_argument('--flush-interval', type=float, default=0.05)
+    args = parser.parse_args()
+
+    print(f"{'mode':>12} {'saves/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} "
+          f"{'flushes':>8} {'max flush':>9} {'rows':>7}")
+    for name, flush_interval in (('coalesced', args.flush_interval), ('per-request', 0)):
+        answer_log.metrics.update(flushes=0, max_flush_ms=0.0)
+        run(name, args, flush_interval)
+
+
+if __name__ == '__main__':
+    main()
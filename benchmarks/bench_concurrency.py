@@ -0,0 +1,119 @@
+"""Mixed readers and writers against one SQLite file, default vs tuned engine profile.
+
+Readers run the dashboard queries on the read-only pool; writers do admin-style
+CRUD (quiz edits and score inserts), each committing its own transaction.
+
+Usage: python -m benchmarks.bench_concurrency [--readers 8] [--writers 2] [--seconds 5]
+"""
+import argparse
+import os
+import random
+import threading
+import time
+from datetime import datetime
+
+from benchmarks.common import make_app, seed
+from models import db, Quiz, UserScore
+from services import performance, score_stats
+from services.database import read_session
+from services.score_writer import save_scores, new_submission_id
+
+# SQLite's own defaults, i.e. what the app ran with before the engine profile
+DEFAULT_PROFILE = {
+    'SQLITE_JOURNAL_MODE': 'DELETE',
+    'SQLITE_SYNCHRONOUS': 'FULL',
+    'SQLITE_BUSY_TIMEOUT_MS': 5000,
+    'SQLITE_MMAP_SIZE': 0,
+    'SQLITE_CACHE_SIZE_KB': 2000,
+    'DATABASE_READONLY_BIND': False,
+}
+TUNED_PROFILE = {}
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return 0
+    samples = sorted(samples)
+    return samples[min(int(len(samples) * fraction), len(samples) - 1)]
+
+
+def reader(app, stop, latencies, errors, users):
+    rnd = random.Random()
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            with app.app_context():
+                performance.performance_summary(rnd.randint(1, users))
+                score_stats.quiz_stats()
+                read_session().query(UserScore).order_by(UserScore.date_taken.desc()).limit(50).all()
+        except Exception:
+            errors.append(1)
+            continue
+        latencies.append(time.perf_counter() - start)
+
+
+def writer(app, stop, latencies, errors, users, quizzes):
+    rnd = random.Random()
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            with app.app_context():
+                quiz = db.session.get(Quiz, rnd.randint(1, quizzes))
+                quiz.remarks = f'edited {time.time()}'
+                save_scores([{'submission_id': new_submission_id(), 'user_id': rnd.randint(1, users),
+                              'quiz_id': quiz.id, 'score': rnd.randint(0, 10), 'date_taken': datetime.utcnow()}])
+                db.session.commit()
+        except Exception:
+            errors.append(1)
+            continue
+        latencies.append(time.perf_counter() - start)
+
+
+def run(name, profile, args):
+    app = make_app(config=profile)
+    try:
+        with app.app_context():
+            seed(quizzes=args.quizzes, users=args.users, scores_per_user=20, questions_per_quiz=1)
+            score_stats.rebuild()
+
+        stop = threading.Event()
+        results = {'read': ([], []), 'write': ([], [])}
+        threads = [threading.Thread(target=reader, args=(app, stop, *results['read'], args.users))
+                   for _ in range(args.readers)]
+        threads += [threading.Thread(target=writer, args=(app, stop, *results['write'], args.users, args.quizzes))
+                    for _ in range(args.writers)]
+        for thread in threads:
+            thread.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        for role, (latencies, errors) in results.items():
+            print(f"{name:>8} {role:>6} {len(latencies) / args.seconds:>9.1f} "
+                  f"{percentile(latencies, 0.5) * 1000:>8.2f} {percentile(latencies, 0.95) * 1000:>8.2f} "
+                  f"{percentile(latencies, 0.99) * 1000:>8.2f} {len(errors):>7}")
+    finally:
+        with app.app_context():
+            db.engine.dispose()
+        for suffix in ('', '-wal', '-shm', '-journal'):
+            if os.path.exists(app.db_path + suffix):
+                os.remove(app.db_path + suffix)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--quizzes', type=int, default=200)
+    parser.add_argument('--users', type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"{'profile':>8} {'role':>6} {'ops/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    run('default', DEFAULT_PROFILE, args)
+    run('tuned', TUNED_PROFILE, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Batch grading throughput: 1M submissions against a 100-question quiz.
+
+Usage: python -m benchmarks.bench_grading [--submissions 1000000] [--questions 100]
+"""
+import argparse
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from services import grading
+
+FakeQuestion = namedtuple('FakeQuestion', 'id correct_answer')
+
+
+def python_grade(correct, matrix):
+    # Per-question loop equivalent to the old start_quiz grading
+    return [sum(1 for answer, expected in zip(row, correct) if answer == expected) for row in matrix]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--submissions', type=int, default=1_000_000)
+    parser.add_argument('--questions', type=int, default=100)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    key = grading.compile_key(
+        FakeQuestion(i + 1, f'option_{rng.integers(1, 5)}') for i in range(args.questions)
+    )
+    matrix = rng.integers(0, grading.OPTION_COUNT, size=(args.submissions, args.questions), dtype=np.int8)
+
+    start = time.perf_counter()
+    result = grading.grade_batch(key, matrix)
+    elapsed = time.perf_counter() - start
+
+    sample = matrix[:10_000].tolist()
+    correct = key.correct.tolist()
+    start = time.perf_counter()
+    expected = python_grade(correct, sample)
+    loop_elapsed = (time.perf_counter() - start) * len(matrix) / len(sample)
+    assert expected == result.scores[:len(sample)].tolist()
+
+    unpacked = np.unpackbits(result.correct[:1], axis=1, count=result.total)[0]
+    assert unpacked.sum() == result.scores[0]
+
+    print(f"submissions: {args.submissions:,} x {args.questions} questions")
+    print(f"vectorized:  {elapsed:.3f}s  ({args.submissions / elapsed:,.0f} submissions/s)")
+    print(f"python loop: {loop_elapsed:.3f}s  (extrapolated from {len(sample):,})")
+    print(f"bitmap size: {result.correct.nbytes / 1e6:.1f} MB, mean score {result.scores.mean():.2f}")
+
+
+if __name__ == '__main__':
+    main()
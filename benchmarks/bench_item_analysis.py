@@ -0,0 +1,106 @@
+"""Item analysis of a large quiz: full recompute vs incremental refresh.
+
+Stores --responses graded responses to one --questions question quiz, then times
+a full recompute (reset + refresh over every stored response), an incremental
+refresh after --new more submissions (only those are read), and the per-question
+Python loop that computing the same statistics row by row would take.
+
+Usage: python -m benchmarks.bench_item_analysis [--responses 200000] [--questions 50] [--new 1000]
+"""
+import argparse
+import time
+from datetime import datetime
+
+import numpy as np
+
+from benchmarks.common import make_app, seed, insert_rows
+from models import db, QuizResponse
+from services import grading, item_analysis
+from services.attempts import Attempt
+from services.quiz_cache import quiz_cache
+
+
+def simulated_answers(rng, correct, count):
+    # Rasch-style responses: able students and easy questions answer correctly more often
+    ability = rng.normal(size=(count, 1))
+    easiness = np.linspace(2, -2, len(correct))
+    right = rng.random((count, len(correct))) < 1 / (1 + np.exp(-(ability + easiness)))
+    wrong = (correct + rng.integers(1, grading.OPTION_COUNT, size=(count, len(correct)))) % grading.OPTION_COUNT
+    answers = np.where(right, correct, wrong).astype(np.int8)
+    answers[rng.random(answers.shape) < 0.02] = grading.UNANSWERED
+    return answers
+
+
+def store(attempt, answers, user_ids):
+    for start in range(0, len(answers), 10000):
+        batch = answers[start:start + 10000]
+        scores = grading.grade_batch(attempt.answer_key, batch).scores
+        insert_rows(QuizResponse.__table__, [
+            {'quiz_id': attempt.quiz_id, 'quiz_version': attempt.quiz_version,
+             'user_id': int(user_ids[(start + i) % len(user_ids)]), 'options': row.tobytes(),
+             'score': int(score), 'submitted_at': datetime.utcnow()}
+            for i, (row, score) in enumerate(zip(batch, scores))
+        ])
+    db.session.commit()
+
+
+def python_difficulty(correct, rows):
+    # Per-response, per-question loop: proportion answering each question correctly
+    counts = [0] * len(correct)
+    for row in rows:
+        for j, (answer, expected) in enumerate(zip(row, correct)):
+            if answer == expected and answer != grading.UNANSWERED:
+                counts[j] += 1
+    return [count / len(rows) for count in counts]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--responses', type=int, default=200_000)
+    parser.add_argument('--questions', type=int, default=50)
+    parser.add_argument('--new', type=int, default=1000)
+    args = parser.parse_args()
+
+    app = make_app()
+    rng = np.random.default_rng(42)
+    with app.app_context():
+        seed(quizzes=1, questions_per_quiz=args.questions, users=200, scores_per_user=0)
+        snapshot = quiz_cache.get(1)
+        attempt = Attempt('bench', 2, 1, snapshot.version, snapshot.answer_key, None, None)
+        correct = snapshot.answer_key.correct
+        user_ids = np.arange(2, 201)
+
+        answers = simulated_answers(rng, correct, args.responses)
+        item_analysis.record_response(attempt, answers[0], 0, datetime.utcnow())
+        db.session.commit()
+        store(attempt, answers[1:], user_ids)
+
+        item_analysis.reset([1])
+        db.session.commit()
+        start = time.perf_counter()
+        item_analysis.refresh(1, snapshot.version)
+        full = time.perf_counter() - start
+
+        store(attempt, simulated_answers(rng, correct, args.new), user_ids)
+        start = time.perf_counter()
+        item_analysis.analyse(1)
+        incremental = time.perf_counter() - start
+        analysis = item_analysis.analyse(1)
+
+        sample = answers[:10_000].tolist()
+        start = time.perf_counter()
+        expected = python_difficulty(correct.tolist(), sample)
+        loop_elapsed = (time.perf_counter() - start) * analysis.responses / len(sample)
+        reference = ((answers[:10_000] == correct) & (answers[:10_000] != grading.UNANSWERED)).mean(axis=0)
+        assert np.allclose(expected, reference)
+
+    print(f"responses:   {analysis.responses:,} x {args.questions} questions")
+    print(f"full:        {full:.3f}s  ({analysis.responses / full:,.0f} responses/s)")
+    print(f"incremental: {incremental * 1000:.1f}ms  (+{args.new:,} responses, analysis included)")
+    print(f"python loop: {loop_elapsed:.3f}s  (difficulty only, extrapolated from {len(sample):,})")
+    print(f"KR-20 {analysis.kr20}, mean {analysis.mean} / {args.questions}, "
+          f"{sum(1 for item in analysis.items if item.flags)} questions flagged")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""Login storm: many students posting the login form at once.
+
+"inline" verifies passwords in the request threads (PASSWORD_POOL_SIZE=0), "pool"
+hands them to the hashing process pool. A probe thread keeps requesting the home
+page meanwhile, to show whether other traffic is starved. "throttled" replays
+wrong passwords for one account: after LOGIN_MAX_FAILURES they are refused
+before any hashing.
+
+Usage: python -m benchmarks.bench_logins [--method pbkdf2:sha256:1000000] [--clients 16] [--seconds 10]
+"""
+import argparse
+import os
+import threading
+import time
+
+from benchmarks.bench_concurrency import percentile
+from benchmarks.common import make_app, seed
+from models import db, User
+from services.credentials import credentials, DEFAULT_METHOD
+
+
+def login_loop(app, index, args, stop, latencies, errors, password):
+    client = app.test_client()
+    user_id = index + 2
+    while not stop.is_set():
+        email = 'user2@example.com' if password != 'password' else f'user{user_id}@example.com'
+        start = time.perf_counter()
+        response = client.post('/auth/login', data={'email': email, 'password': password})
+        latencies.append(time.perf_counter() - start)
+        if response.status_code not in (302, 429):
+            errors.append(response.status_code)
+        client.get('/auth/logout')
+        user_id = (user_id - 1) % (args.users - 1) + 2
+
+
+def probe_loop(app, stop, latencies):
+    client = app.test_client()
+    while not stop.is_set():
+        start = time.perf_counter()
+        client.get('/')
+        latencies.append(time.perf_counter() - start)
+        stop.wait(0.01)
+
+
+def run(name, args, pool_size, password='password'):
+    app = make_app(config={'PASSWORD_HASH_METHOD': args.method, 'PASSWORD_POOL_SIZE': pool_size,
+                           'PASSWORD_POOL_MAX_PENDING': args.clients, 'PASSWORD_POOL_TIMEOUT': 60})
+    try:
+        with app.app_context():
+            seed(quizzes=1, questions_per_quiz=1, users=args.users, scores_per_user=0)
+            # One hash for everyone, so no login pays for a rehash
+            db.session.query(User).update({User.password: credentials.hash_password('password', offload=False)})
+            db.session.commit()
+
+        stop = threading.Event()
+        latencies, errors, probe = [], [], []
+        threads = [threading.Thread(target=login_loop, args=(app, i, args, stop, latencies, errors, password))
+                   for i in range(args.clients)]
+        threads.append(threading.Thread(target=probe_loop, args=(app, stop, probe)))
+        for thread in threads:
+            thread.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        rate = len(latencies) / args.seconds
+        stats = credentials.stats()
+        print(f"{name:>10} {rate:>9.1f} {rate / os.cpu_count():>10.1f} {percentile(latencies, 0.5) * 1000:>8.1f} "
+              f"{percentile(latencies, 0.99) * 1000:>8.1f} {percentile(probe, 0.99) * 1000:>12.1f} "
+              f"{stats['hashes']:>7} {stats['throttled']:>9} {len(errors):>7}")
+    finally:
+        credentials.shutdown()
+        credentials.metrics.update(hashes=0, throttled=0)
+        with app.app_context():
+            db.engine.dispose()
+        for suffix in ('', '-wal', '-shm', '-journal'):
+            if os.path.exists(app.db_path + suffix):
+                os.remove(app.db_path + suffix)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--method', default=DEFAULT_METHOD)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--pool-size', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    print(f"method {args.method}, {os.cpu_count()} cores, {args.clients} concurrent clients")
+    print(f"{'mode':>10} {'logins/s':>9} {'per core':>10} {'p50 ms':>8} {'p99 ms':>8} {'probe p99 ms':>12} "
+          f"{'hashes':>7} {'throttled':>9} {'errors':>7}")
+    run('inline', args, 0)
+    run('pool', args, args.pool_size)
+    run('throttled', args, args.pool_size, password='wrong-password')
+
+
+if __name__ == '__main__':
+    main()
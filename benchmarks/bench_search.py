@@ -0,0 +1,67 @@
+"""Admin search latency over a large question bank (FTS5 vs the old ILIKE scan).
+
+Usage: python -m benchmarks.bench_search [--questions 300000]
+"""
+import argparse
+import os
+import random
+
+from benchmarks.common import make_app, seed, insert_rows, timed
+from models import db, Question
+from services import search
+
+TOPICS = ('matrix vector eigenvalue integral derivative velocity momentum entropy molecule enzyme '
+          'photosynthesis theorem polynomial probability equilibrium voltage resistance catalyst '
+          'isotope friction acceleration genome protein orbital').split()
+SYLLABLES = 'ka lo mi ne su ra te vo pi da gu be fo ri za no'.split()
+
+
+def vocabulary(rnd, size=20_000):
+    # Synthetic filler words so topic terms match a realistic fraction of the bank
+    return [''.join(rnd.choice(SYLLABLES) for _ in range(rnd.randint(2, 4))) for _ in range(size)]
+
+
+def question_text(rnd, words):
+    text = [rnd.choice(words) for _ in range(12)]
+    text[rnd.randrange(12)] = rnd.choice(TOPICS)
+    return ' '.join(text)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--questions', type=int, default=300_000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    app = make_app()
+    rnd = random.Random(7)
+    words = vocabulary(rnd)
+    try:
+        with app.app_context():
+            seed(quizzes=100, questions_per_quiz=0, users=10, scores_per_user=0)
+            for start in range(0, args.questions, 50_000):
+                insert_rows(Question.__table__, [
+                    {'quiz_id': rnd.randint(1, 100),
+                     'question_text': question_text(rnd, words) + '?',
+                     'option_1': rnd.choice(words), 'option_2': rnd.choice(words),
+                     'option_3': rnd.choice(words), 'option_4': rnd.choice(words),
+                     'correct_answer': 'option_1'}
+                    for i in range(min(50_000, args.questions - start))
+                ])
+                db.session.commit()
+            search.rebuild_search_index()
+
+            print(f"{'query':>22} {'fts ms':>8} {'ilike ms':>9} {'matches':>8}")
+            for query in ('eigen', 'photosynth', 'vel', 'kalomi', 'matrix kalo', 'zzz'):
+                fts = timed(lambda: search.search(query, 'questions'), args.repeat)
+                # What admin.search used to run: unranked, unpaginated full scan
+                ilike = timed(lambda: Question.query.filter(Question.question_text.ilike(f'%{query}%'))
+                              .all(), max(1, args.repeat // 10))
+                total = search.search(query, 'questions').total
+                print(f"{query:>22} {fts * 1000:>8.2f} {ilike * 1000:>9.2f} {total:>8}")
+    finally:
+        os.remove(app.db_path)
+
+
+if __name__ == '__main__':
+    main()
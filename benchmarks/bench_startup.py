@@ -0,0 +1,82 @@
+"""Startup budget: time from a cold `import app` to the first responses.
+
+Each run is a fresh interpreter (nothing cached in sys.modules) that imports app,
+calls create_app() and serves the home page and the login form through the test
+client against an already bootstrapped database, which is what a new worker does.
+Reports the median of every phase and exits non-zero if import-to-first-response
+goes over the budget.
+
+Usage: python -m benchmarks.bench_startup [--runs 7] [--budget 650]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.common import ROOT
+
+BUDGET_MS = 650  # Import to first response, median
+
+CHILD = r"""
+import json, sys, time
+start = time.perf_counter()
+import app as module
+imported = time.perf_counter()
+app = module.create_app({'WTF_CSRF_ENABLED': False})
+created = time.perf_counter()
+client = app.test_client()
+assert client.get('/').status_code == 200
+home = time.perf_counter()
+assert client.get('/auth/login').status_code == 200
+login = time.perf_counter()
+print(json.dumps({
+    'import': imported - start, 'create_app': created - imported, 'first /': home - created,
+    'first /auth/login': login - home, 'import to first response': home - start,
+    'modules': len(sys.modules), 'alembic loaded': 'alembic' in sys.modules,
+}))
+"""
+
+
+def run_child(env):
+    output = subprocess.run([sys.executable, '-c', CHILD], cwd=ROOT, env=env, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=7)
+    parser.add_argument('--budget', type=float, default=BUDGET_MS, help='Milliseconds')
+    args = parser.parse_args()
+
+    fd, db_path = tempfile.mkstemp(suffix='.db', prefix='quiz_bench_')
+    os.close(fd)
+    env = dict(os.environ, QUIZ_DATABASE_URI=f'sqlite:///{db_path}')
+    env.pop('FLASK_RUN_FROM_CLI', None)
+    try:
+        subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'bootstrap'], cwd=ROOT, env=env,
+                       check=True, capture_output=True)
+        run_child(env)  # Warm the OS file cache and the bytecode cache
+        runs = [run_child(env) for _ in range(args.runs)]
+    finally:
+        for suffix in ('', '-wal', '-shm', '-journal'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+
+    print(f"{args.runs} cold starts, median")
+    for phase in ('import', 'create_app', 'first /', 'first /auth/login', 'import to first response'):
+        print(f"{phase:>26} {statistics.median(run[phase] for run in runs) * 1000:>8.1f} ms")
+    print(f"{'modules loaded':>26} {runs[-1]['modules']:>8}")
+    print(f"{'alembic loaded':>26} {'yes' if runs[-1]['alembic loaded'] else 'no':>8}")
+
+    total = statistics.median(run['import to first response'] for run in runs) * 1000
+    ok = total <= args.budget
+    print(f"{'ok' if ok else 'OVER'}: {total:.1f} ms against a {args.budget:.0f} ms budget")
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,69 @@
+"""Dashboard latency and SQL round trips as the quiz count grows.
+
+Compares performance.performance_summary against the previous per-quiz loop
+(three aggregate queries per quiz). The summary's query count stays constant;
+what growth remains is the O(quizzes) payload the page has to render anyway.
+
+Usage: python -m benchmarks.bench_user_dashboard [--sizes 10,100,1000,10000]
+"""
+import argparse
+import os
+
+from sqlalchemy import event
+
+from benchmarks.common import make_app, seed, login, timed
+from sqlalchemy import func
+
+from models import db, Quiz, UserScore
+from services import score_stats, performance
+
+
+def legacy_summary(user_id):
+    data = []
+    for quiz in Quiz.query.all():
+        user_highest = db.session.query(func.max(UserScore.score)).filter(
+            UserScore.user_id == user_id, UserScore.quiz_id == quiz.id).scalar() or 0
+        highest = db.session.query(func.max(UserScore.score)).filter(
+            UserScore.quiz_id == quiz.id).scalar() or 0
+        average = db.session.query(func.avg(UserScore.score)).filter(
+            UserScore.quiz_id == quiz.id).scalar() or 0
+        data.append((quiz.title, user_highest, highest, round(average, 2)))
+    return data
+
+
+def run(quiz_count, repeat):
+    app = make_app()
+    try:
+        with app.app_context():
+            seed(quizzes=quiz_count, questions_per_quiz=1, users=200, scores_per_user=20)
+            score_stats.rebuild()
+
+            statements = []
+            for engine in db.engines.values():  # The summary reads through the read-only bind
+                event.listen(engine, 'before_cursor_execute', lambda *args: statements.append(1))
+            summary = timed(lambda: performance.performance_summary(2), repeat)
+            summary_queries = len(statements) // repeat
+            legacy = timed(lambda: legacy_summary(2), max(1, repeat // 5))
+
+        client = app.test_client()
+        login(client, 2)
+        page = timed(lambda: client.get('/user/user_dashboard'), repeat)
+        return legacy, summary, summary_queries, page
+    finally:
+        os.remove(app.db_path)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='10,100,1000,10000')
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'quizzes':>8} {'legacy ms':>10} {'summary ms':>11} {'queries':>8} {'page ms':>9}")
+    for size in (int(s) for s in args.sizes.split(',')):
+        legacy, summary, queries, page = run(size, args.repeat)
+        print(f"{size:>8} {legacy * 1000:>10.2f} {summary * 1000:>11.2f} {queries:>8} {page * 1000:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
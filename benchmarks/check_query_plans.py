@@ -0,0 +1,94 @@
+"""Query-plan regression check: every hot lookup must be served by an index.
+
+Runs EXPLAIN QUERY PLAN for the query shapes used by the dashboards, start_quiz
+and get_chapters against a freshly created schema, and exits non-zero if any of
+them falls back to a full table scan, or sorts in a temp b-tree without being
+listed in ACCEPTED_SORTS.
+
+Usage: python -m benchmarks.check_query_plans
+"""
+import os
+import re
+import sys
+
+from sqlalchemy import func, text
+
+from benchmarks.common import make_app, seed
+from models import db, Chapter, Quiz, Question, UserScore, ScoreRollup
+from models.quiz import QUESTION_ORDER
+
+# (description, table that must be SEARCHed via an index, query factory).
+# Unfiltered ordered reads only need to walk an index in order: the table is None.
+HOT_QUERIES = [
+    ("user best score per quiz (user_dashboard)", 'user_score',
+     lambda: db.session.query(UserScore.quiz_id, func.max(UserScore.score))
+     .filter(UserScore.user_id == 1).group_by(UserScore.quiz_id)),
+    ("per-quiz aggregate (score_stats.refresh_quiz)", 'user_score',
+     lambda: db.session.query(func.count(UserScore.id), func.sum(UserScore.score),
+                              func.min(UserScore.score), func.max(UserScore.score))
+     .filter(UserScore.quiz_id == 1)),
+    ("global quiz max/avg (performance fallback)", 'user_score',
+     lambda: db.session.query(UserScore.quiz_id, func.max(UserScore.score), func.avg(UserScore.score))
+     .filter(UserScore.quiz_id.in_([1, 2])).group_by(UserScore.quiz_id)),
+    ("user score history (user_dashboard, user_scores)", 'user_score',
+     lambda: db.session.query(UserScore).filter(UserScore.user_id == 1).order_by(UserScore.date_taken)),
+    ("admin scores page (keyset)", None,
+     lambda: db.session.query(UserScore).order_by(UserScore.date_taken.desc(), UserScore.id.desc()).limit(51)),
+    ("quiz questions (start_quiz)", 'question',
+     lambda: db.session.query(Question).filter(Question.quiz_id == 1).order_by(*QUESTION_ORDER)),
+    ("subject chapters (get_chapters)", 'chapter',
+     lambda: db.session.query(Chapter).filter(Chapter.subject_id == 1)),
+    ("chapter quizzes", 'quiz',
+     lambda: db.session.query(Quiz).filter(Quiz.chapter_id == 1)),
+    ("score trend range (score_rollups.trend)", 'score_rollup',
+     lambda: db.session.query(ScoreRollup)
+     .filter(ScoreRollup.scope == 'user', ScoreRollup.scope_id == 1, ScoreRollup.period == 'week',
+             ScoreRollup.bucket >= '2025-01-01', ScoreRollup.bucket <= '2026-01-01')
+     .order_by(ScoreRollup.bucket)),
+]
+
+# Queries allowed to sort their (index-selected) rows in a temp b-tree, and why
+ACCEPTED_SORTS = {
+    # SQLite indexes can't store NULLS LAST; one quiz's questions are a few dozen rows,
+    # sorted once per quiz version before quiz_cache keeps them
+    "quiz questions (start_quiz)": "position NULLS LAST",
+}
+
+
+def uses_index(plan, table):
+    if table is None:
+        # Ordered page read: no plain table scan and no temp sort
+        return not any(re.search(r'\bSCAN \w+$', detail) or 'TEMP B-TREE' in detail for detail in plan)
+    return any(re.match(rf'SEARCH {table} USING (COVERING )?INDEX', detail) for detail in plan) \
+        and not any(re.search(rf'\bSCAN {table}\b', detail) for detail in plan)
+
+
+def sorts(plan):
+    return any('TEMP B-TREE' in detail for detail in plan)
+
+
+def main():
+    app = make_app()
+    failures = 0
+    try:
+        with app.app_context():
+            seed(quizzes=50, users=200, scores_per_user=10)
+            db.session.execute(text('ANALYZE'))
+            for description, table, build in HOT_QUERIES:
+                statement = build().statement.compile(db.engine, compile_kwargs={'literal_binds': True})
+                plan = [row[3] for row in db.session.execute(text(f'EXPLAIN QUERY PLAN {statement}'))]
+                if not uses_index(plan, table):
+                    status = 'SCAN'
+                elif table is not None and sorts(plan):
+                    status = 'sort' if description in ACCEPTED_SORTS else 'SORT'
+                else:
+                    status = 'ok'
+                failures += status.isupper()
+                print(f"{status:>4}  {description}: {' | '.join(plan)}")
+    finally:
+        os.remove(app.db_path)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,94 @@
+import os
+import random
+import tempfile
+import time
+from datetime import date, datetime, time as dtime, timedelta
+
+from werkzeug.security import generate_password_hash
+
+from models import db, User, Subject, Chapter, Quiz, Question, UserScore
+from services.search import create_search_index
+from app import create_app
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# Standalone app bound to a throwaway database, so benchmarks never touch quiz.db
+def make_app(db_path=None, config=None):
+    if db_path is None:
+        fd, db_path = tempfile.mkstemp(suffix='.db', prefix='quiz_bench_')
+        os.close(fd)
+
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+        'SECRET_KEY': 'bench',
+        'WTF_CSRF_ENABLED': False,
+        'INSTRUMENTATION_ENABLED': False,
+        **(config or {}),
+    })
+    with app.app_context():
+        db.create_all()
+        create_search_index()
+    app.db_path = db_path
+    return app
+
+
+def insert_rows(table, rows):
+    if rows:
+        db.session.execute(table.insert(), rows)
+
+
+# Bulk-seed synthetic data through Core inserts; returns the ids created
+def seed(subjects=2, chapters_per_subject=3, quizzes=10, questions_per_quiz=10,
+         users=50, scores_per_user=5, seed_value=42):
+    rnd = random.Random(seed_value)
+    password = generate_password_hash('password', method='pbkdf2:sha256:1000')
+
+    insert_rows(Subject.__table__, [
+        {'id': i + 1, 'name': f'Subject {i + 1}', 'description': ''} for i in range(subjects)
+    ])
+    chapter_count = subjects * chapters_per_subject
+    insert_rows(Chapter.__table__, [
+        {'id': i + 1, 'name': f'Chapter {i + 1}', 'description': '',
+         'subject_id': i // chapters_per_subject + 1} for i in range(chapter_count)
+    ])
+    insert_rows(Quiz.__table__, [
+        {'id': i + 1, 'title': f'Quiz {i + 1}', 'chapter_id': i % chapter_count + 1,
+         'date_of_quiz': date(2025, 1, 1), 'time_duration': dtime(0, 30), 'remarks': None}
+        for i in range(quizzes)
+    ])
+    insert_rows(Question.__table__, [
+        {'quiz_id': q + 1, 'question_text': f'Question {n + 1} of quiz {q + 1}?',
+         'option_1': 'A', 'option_2': 'B', 'option_3': 'C', 'option_4': 'D',
+         'correct_answer': f'option_{rnd.randint(1, 4)}'}
+        for q in range(quizzes) for n in range(questions_per_quiz)
+    ])
+    insert_rows(User.__table__, [
+        {'id': i + 1, 'email': f'user{i + 1}@example.com', 'password': password,
+         'full_name': f'User {i + 1}', 'qualification': 'B.Sc', 'dob': date(2000, 1, 1),
+         'role': 'admin' if i == 0 else 'user'} for i in range(users)
+    ])
+    start = datetime(2025, 1, 1)
+    insert_rows(UserScore.__table__, [
+        {'user_id': u + 1, 'quiz_id': rnd.randint(1, quizzes),
+         'score': rnd.randint(0, questions_per_quiz),
+         'date_taken': start + timedelta(minutes=rnd.randint(0, 525600))}
+        for u in range(users) for _ in range(scores_per_user)
+    ])
+    db.session.commit()
+
+
+def login(client, user_id):
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+
+
+def timed(fn, repeat=20):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples[len(samples) // 2]
@@ -0,0 +1,345 @@
+"""Exam-day load test: students taking quizzes while admins edit them.
+
+Each virtual student loops through a full exam session (optional signup, login,
+dashboard, open a quiz, autosave a few answers, submit, dashboard again, logout);
+each virtual admin logs in and keeps viewing the dashboard and patching questions
+of the quizzes being taken. Latency and throughput are reported per endpoint as
+JSON (sorted keys, so two runs diff cleanly).
+
+In-process, against a throwaway database seeded at the chosen scale:
+    python -m benchmarks.load_test run [--scale small] [--students 20] [--seconds 30] [--output run.json]
+
+Against a local server (seed its database first, with the same scale flags):
+    python -m benchmarks.load_test seed --db /tmp/loadtest.db --scale medium
+    QUIZ_DATABASE_URI=sqlite:////tmp/loadtest.db flask --app app run
+    python -m benchmarks.load_test run --url http://127.0.0.1:5000 --scale medium
+
+Compare two runs:
+    python -m benchmarks.load_test compare before.json after.json
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime
+
+from benchmarks.bench_concurrency import percentile
+from benchmarks.common import make_app, seed, ROOT
+from models import db, User
+
+# Passed straight to benchmarks.common.seed; users 2..N are students, user 1 is the admin
+SCALES = {
+    'small': dict(subjects=2, chapters_per_subject=3, quizzes=10, questions_per_quiz=10,
+                  users=200, scores_per_user=5),
+    'medium': dict(subjects=5, chapters_per_subject=4, quizzes=100, questions_per_quiz=25,
+                   users=2000, scores_per_user=20),
+    'large': dict(subjects=10, chapters_per_subject=10, quizzes=1000, questions_per_quiz=40,
+                  users=20000, scores_per_user=50),
+}
+PASSWORD = 'password'  # What seed() hashes for every user
+
+CSRF_INPUT = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"')
+ATTEMPT_INPUT = re.compile(r'name="attempt_id" value="(\w+)"')
+QUESTION_INPUT = re.compile(r'name="question_(\d+)"')
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}  # endpoint -> [seconds]
+        self.errors = {}  # endpoint -> count
+        self._lock = threading.Lock()
+
+    def add(self, endpoint, seconds, ok):
+        with self._lock:
+            self.samples.setdefault(endpoint, []).append(seconds)
+            if not ok:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def report(self, elapsed):
+        def summary(samples, errors):
+            return {
+                'count': len(samples),
+                'errors': errors,
+                'rps': round(len(samples) / elapsed, 2),
+                'p50_ms': round(percentile(samples, 0.50) * 1000, 2),
+                'p95_ms': round(percentile(samples, 0.95) * 1000, 2),
+                'p99_ms': round(percentile(samples, 0.99) * 1000, 2),
+                'max_ms': round(max(samples, default=0) * 1000, 2),
+            }
+
+        with self._lock:
+            endpoints = {name: summary(samples, self.errors.get(name, 0))
+                         for name, samples in self.samples.items()}
+            everything = [s for samples in self.samples.values() for s in samples]
+            total = summary(everything, sum(self.errors.values()))
+        return endpoints, total
+
+
+class Client:
+    """Timed requests through a Flask test client or, with a base URL, real HTTP.
+
+    Redirects are never followed, so each sample is exactly one request.
+    """
+
+    def __init__(self, recorder, app=None, base_url=None):
+        self.recorder = recorder
+        self.base_url = base_url
+        if base_url:
+            handler = urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar())
+            self.opener = urllib.request.build_opener(handler, NoRedirect())
+        else:
+            self.client = app.test_client()
+
+    def request(self, endpoint, method, path, data=None, json_body=None, expect=(200,)):
+        start = time.perf_counter()
+        try:
+            status, text = self._send(method, path, data, json_body)
+        except OSError:
+            status, text = 0, ''
+        self.recorder.add(endpoint, time.perf_counter() - start, status in expect)
+        return status, text
+
+    def _send(self, method, path, data, json_body):
+        if not self.base_url:
+            response = self.client.open(path, method=method, data=data, json=json_body)
+            return response.status_code, response.get_data(as_text=True)
+        headers, body = {}, None
+        if json_body is not None:
+            headers['Content-Type'] = 'application/json'
+            body = json.dumps(json_body).encode()
+        elif data is not None:
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            body = urllib.parse.urlencode(data).encode()
+        request = urllib.request.Request(self.base_url + path, data=body, headers=headers, method=method)
+        try:
+            with self.opener.open(request, timeout=60) as response:
+                return response.status, response.read().decode('utf-8', 'replace')
+        except urllib.error.HTTPError as e:
+            return e.code, e.read().decode('utf-8', 'replace')
+
+    def csrf_token(self, endpoint, path):
+        _, text = self.request(endpoint, 'GET', path)
+        match = CSRF_INPUT.search(text)
+        return match.group(1) if match else ''
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def student(make_client, index, args, scale, stop):
+    rnd = random.Random(args.seed + index)
+    students = range(index + 2, scale['users'] + 1, args.students)  # Disjoint per thread
+    session_number = 0
+    while not stop.is_set():
+        client = make_client()
+        if rnd.random() < args.signup_rate:
+            email = f'load-{os.getpid()}-{index}-{session_number}@example.com'
+            token = client.csrf_token('signup GET', '/auth/signup')
+            client.request('signup POST', 'POST', '/auth/signup', data={
+                'csrf_token': token, 'email': email, 'password': PASSWORD, 'full_name': f'Load {index}',
+                'qualification': 'B.Sc', 'dob': '2000-01-01'}, expect=(302,))
+        else:
+            email = f'user{students[session_number % len(students)]}@example.com'
+        session_number += 1
+
+        client.request('login POST', 'POST', '/auth/login', data={'email': email, 'password': PASSWORD},
+                       expect=(302,))
+        client.request('user_dashboard', 'GET', '/user/user_dashboard')
+        quiz_id = rnd.randint(1, scale['quizzes'])
+        status, html = client.request('start_quiz GET', 'GET', f'/user/start_quiz/{quiz_id}')
+        attempt = ATTEMPT_INPUT.search(html)
+        question_ids = QUESTION_INPUT.findall(html)
+        if status == 200 and attempt and question_ids:
+            answers = {}
+            for _ in range(args.autosaves):
+                stop.wait(args.think)
+                batch = {qid: rnd.randint(1, 4) for qid in rnd.sample(question_ids, min(3, len(question_ids)))}
+                answers.update(batch)
+                client.request('autosave', 'POST', f'/api/attempts/{attempt.group(1)}/answers',
+                               json_body={'answers': batch})
+            stop.wait(args.think)
+            form = {f'question_{qid}': option for qid, option in answers.items()}
+            form['attempt_id'] = attempt.group(1)
+            client.request('start_quiz POST', 'POST', f'/user/start_quiz/{quiz_id}', data=form, expect=(302,))
+            client.request('user_dashboard', 'GET', '/user/user_dashboard')
+        client.request('logout', 'GET', '/auth/logout', expect=(302,))
+
+
+def admin(make_client, index, args, scale, stop):
+    rnd = random.Random(args.seed - index - 1)
+    client = make_client()
+    token = client.csrf_token('admin_login GET', '/auth/admin/login')
+    client.request('admin_login POST', 'POST', '/auth/admin/login',
+                   data={'csrf_token': token, 'email': 'user1@example.com', 'password': PASSWORD}, expect=(302,))
+    edit = 0
+    while not stop.is_set():
+        client.request('admin dashboard', 'GET', '/admin/')
+        client.request('admin scores table', 'GET', '/admin/api/scores?limit=50')
+        quiz_id = rnd.randint(1, scale['quizzes'])
+        status, text = client.request('quiz payload', 'GET', f'/api/quizzes/{quiz_id}')
+        questions = json.loads(text)['questions'] if status == 200 else []
+        if questions:
+            edit += 1
+            question = rnd.choice(questions)
+            client.request('admin patch questions', 'PATCH', f'/admin/edit_questions/{quiz_id}/patch',
+                           json_body={'update': {str(question['id']): {
+                               'question_text': f"{question['text'].split(' [')[0]} [edit {index}.{edit}]"}}})
+        stop.wait(args.admin_interval)
+
+
+def scale_from(args):
+    scale = dict(SCALES[args.scale])
+    for key in scale:
+        value = getattr(args, key, None)
+        if value is not None:
+            scale[key] = value
+    return scale
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run(args):
+    scale = scale_from(args)
+    recorder = Recorder()
+    app = None
+    if args.url:
+        base_url = args.url.rstrip('/')
+        make_client = lambda: Client(recorder, base_url=base_url)
+    else:
+        app = make_app(config={'ATTEMPT_SWEEP_INTERVAL': 0, 'SCORE_QUEUE_ENABLED': args.score_queue})
+        with app.app_context():
+            seed(seed_value=args.seed, **scale)
+        make_client = lambda: Client(recorder, app=app)
+
+    stop = threading.Event()
+    threads = [threading.Thread(target=student, args=(make_client, i, args, scale, stop))
+               for i in range(args.students)]
+    threads += [threading.Thread(target=admin, args=(make_client, i, args, scale, stop))
+                for i in range(args.admins)]
+    try:
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        if app is not None:
+            with app.app_context():
+                db.engine.dispose()
+            for suffix in ('', '-wal', '-shm', '-journal'):
+                if os.path.exists(app.db_path + suffix):
+                    os.remove(app.db_path + suffix)
+
+    endpoints, total = recorder.report(elapsed)
+    return {
+        'meta': {
+            'commit': git_commit(),
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+            'target': args.url or 'in-process',
+            'scale': scale,
+            'students': args.students,
+            'admins': args.admins,
+            'seconds': round(elapsed, 2),
+            'think': args.think,
+            'signup_rate': args.signup_rate,
+            'seed': args.seed,
+        },
+        'endpoints': endpoints,
+        'total': total,
+    }
+
+
+def seed_database(args):
+    app = make_app(db_path=os.path.abspath(args.db))
+    with app.app_context():
+        if db.session.query(User).count():
+            sys.exit(f"{args.db} already has users; seed an empty database")
+        seed(seed_value=args.seed, **scale_from(args))
+        db.engine.dispose()
+    print(f"Seeded {args.db} at scale {scale_from(args)}")
+
+
+def compare(args):
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    print(f"{'endpoint':<24} {'p50 ms':>17} {'p95 ms':>17} {'p99 ms':>17} {'rps':>15}")
+    names = sorted(set(before['endpoints']) | set(after['endpoints']))
+    for name in names + ['total']:
+        old = before['total'] if name == 'total' else before['endpoints'].get(name)
+        new = after['total'] if name == 'total' else after['endpoints'].get(name)
+        if not old or not new:
+            print(f"{name:<24} {'(only in one run)':>17}")
+            continue
+        cells = [f"{old[key]:>7.1f}->{new[key]:<8.1f}" for key in ('p50_ms', 'p95_ms', 'p99_ms', 'rps')]
+        print(f"{name:<24} " + ' '.join(cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def scale_options(command):
+        command.add_argument('--scale', choices=SCALES, default='small')
+        for key in SCALES['small']:
+            command.add_argument('--' + key.replace('_', '-'), dest=key, type=int, default=None)
+        command.add_argument('--seed', type=int, default=42)
+
+    run_command = commands.add_parser('run')
+    scale_options(run_command)
+    run_command.add_argument('--url', help='Base URL of a running server; default runs in-process')
+    run_command.add_argument('--students', type=int, default=20)
+    run_command.add_argument('--admins', type=int, default=1)
+    run_command.add_argument('--seconds', type=float, default=30)
+    run_command.add_argument('--think', type=float, default=0.2, help='Seconds between a student\'s actions')
+    run_command.add_argument('--autosaves', type=int, default=3)
+    run_command.add_argument('--signup-rate', type=float, default=0.05)
+    run_command.add_argument('--admin-interval', type=float, default=1.0)
+    run_command.add_argument('--score-queue', action='store_true', help='In-process only: enable the score queue')
+    run_command.add_argument('--output', help='Write the JSON report here instead of stdout')
+
+    seed_command = commands.add_parser('seed')
+    scale_options(seed_command)
+    seed_command.add_argument('--db', required=True)
+
+    compare_command = commands.add_parser('compare')
+    compare_command.add_argument('before')
+    compare_command.add_argument('after')
+
+    args = parser.parse_args()
+    if args.command == 'seed':
+        seed_database(args)
+    elif args.command == 'compare':
+        compare(args)
+    else:
+        report = json.dumps(run(args), indent=2, sort_keys=True)
+        if args.output:
+            with open(args.output, 'w') as f:
+                f.write(report + '\n')
+        else:
+            print(report)
+
+
+if __name__ == '__main__':
+    main()
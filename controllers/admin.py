@@ -1,37 +1,111 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, abort, current_app, Response, \
+    stream_with_context
+from flask_login import current_user
+import hmac
 from models import db, User, Subject, Chapter, Quiz, UserScore, Question
+from models.quiz import QUESTION_ORDER
 from datetime import datetime
 from flask import jsonify
+from sqlalchemy.orm import joinedload
+from services import score_stats, score_rollups, item_analysis
+from services.quiz_cache import quiz_cache
+from services.leaderboard import leaderboards
+from services.score_writer import score_writer
+from services.database import read_session
+from services import search as search_index
+from services.instrumentation import instrumentation
+from services.identity import identity_cache
+from services.deletion import deletion
+from services.catalog import catalog
+from services import question_bank
+from services.question_edits import apply_patch, PatchError, VersionConflict, EDITABLE
+from services.pagination import keyset_page, page_size
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
 # Admin Dashboard
 @admin_bp.route('/')
 def dashboard():
-    users = User.query.all()
-    subjects = Subject.query.all()
-    chapters = Chapter.query.all()
-    quizzes = Quiz.query.all()
-    quiz_scores = UserScore.query.all()
-    quiz_stats = []
-
-    for quiz in quizzes:
-       scores = UserScore.query.filter_by(quiz_id=quiz.id).all()
-    
-       highest = max((score.score for score in scores), default=0)
-       lowest = min((score.score for score in scores), default=0)
-       avg = sum(score.score for score in scores) / len(scores) if scores else 0
+    # Tables are fetched page by page from /admin/api/<table>; only the form dropdowns load here
+    subjects = read_session().query(Subject).order_by(Subject.name).all()
+    quiz_stats = score_stats.quiz_stats()
+
+    return render_template('admin_dashboard.html', subjects=subjects, quiz_stats=quiz_stats)
+
+
+# Paginated admin tables: (query, sort keys, newest first?, row serializer)
+ADMIN_TABLES = {
+    'users': (
+        lambda: read_session().query(User),
+        (User.id,), False,
+        lambda user: {
+            'full_name': user.full_name, 'email': user.email, 'role': user.role,
+            'edit_url': url_for('admin.edit_user', user_id=user.id),
+            'delete_url': url_for('admin.delete_user', user_id=user.id),
+        }
+    ),
+    'subjects': (
+        lambda: read_session().query(Subject),
+        (Subject.name,), False,
+        lambda subject: {
+            'name': subject.name, 'description': subject.description,
+            'edit_url': url_for('admin.edit_subject', subject_id=subject.id),
+            'delete_url': url_for('admin.delete_subject', subject_id=subject.id),
+        }
+    ),
+    'chapters': (
+        lambda: read_session().query(Chapter).options(joinedload(Chapter.subject)),
+        (Chapter.id,), False,
+        lambda chapter: {
+            'name': chapter.name, 'description': chapter.description,
+            'subject': chapter.subject.name if chapter.subject else None,
+            'edit_url': url_for('admin.edit_chapter', chapter_id=chapter.id),
+            'delete_url': url_for('admin.delete_chapter', chapter_id=chapter.id),
+        }
+    ),
+    'quizzes': (
+        lambda: read_session().query(Quiz).options(joinedload(Quiz.chapter)),
+        (Quiz.id,), False,
+        lambda quiz: {
+            'title': quiz.title,
+            'chapter': quiz.chapter.name if quiz.chapter else None,
+            'date_of_quiz': quiz.date_of_quiz.isoformat() if quiz.date_of_quiz else None,
+            'time_duration': str(quiz.time_duration) if quiz.time_duration else None,
+            'remarks': quiz.remarks,
+            'edit_url': url_for('admin.edit_quiz', quiz_id=quiz.id),
+            'delete_url': url_for('admin.delete_quiz', quiz_id=quiz.id),
+            'analysis_url': url_for('admin.quiz_analysis', quiz_id=quiz.id),
+        }
+    ),
+    'scores': (
+        lambda: read_session().query(UserScore).options(joinedload(UserScore.quiz), joinedload(UserScore.user)),
+        (UserScore.date_taken, UserScore.id), True,
+        lambda score: {
+            'quiz_title': score.quiz.title if score.quiz else None,
+            'user_name': score.user.full_name if score.user else None,
+            'date_taken': str(score.date_taken) if score.date_taken else None,
+            'score': score.score,
+            'edit_url': url_for('admin.edit_quiz_score', score_id=score.id),
+            'delete_url': url_for('admin.delete_quiz_score', score_id=score.id),
+        }
+    ),
+}
+
+@admin_bp.route('/api/<table>', methods=['GET'])
+def table_page(table):
+    if table not in ADMIN_TABLES:
+        return jsonify({'error': f'Unknown table: {table}'}), 404
+    query, keys, descending, serialize = ADMIN_TABLES[table]
+
+    try:
+        rows, next_cursor = keyset_page(query(), keys, after=request.args.get('after'),
+                                        limit=page_size(request.args.get('limit')),
+                                        descending=descending)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({'items': [serialize(row) for row in rows], 'next': next_cursor})
 
-       quiz_stats.append({
-          "title": quiz.title or "Unknown",
-          "highest": highest,
-          "lowest": lowest,
-          "average": avg
-       })
-
-
-    return render_template('admin_dashboard.html', users=users, subjects=subjects, 
-                           chapters=chapters, quizzes=quizzes, quiz_scores=quiz_scores, quiz_stats=quiz_stats)
 # CRUD for Users
 @admin_bp.route('/edit_user/<int:user_id>', methods=['GET', 'POST'])
 def edit_user(user_id):
@@ -39,17 +113,19 @@ def edit_user(user_id):
     if request.method == 'POST':
         user.full_name = request.form['full_name']
         user.email = request.form['email']
-        user.role = request.form['role']
+        if user.role != request.form['role']:
+            user.role = request.form['role']
+            user.session_version += 1  # A privilege change signs the user out everywhere
         db.session.commit()
+        identity_cache.invalidate(user.id)
         flash('User updated successfully!', 'success')
         return redirect(url_for('admin.dashboard'))
     return render_template('edit_user.html', user=user)
 
 @admin_bp.route('/delete_user/<int:user_id>')
 def delete_user(user_id):
-    user = User.query.get_or_404(user_id)
-    db.session.delete(user)
-    db.session.commit()
+    User.query.get_or_404(user_id)
+    deletion.delete_user(user_id)  # Scores, attempts and leaderboard entries go with the user
     flash('User deleted successfully!', 'danger')
     return redirect(url_for('admin.dashboard'))
 
@@ -60,6 +136,7 @@ def create_subject():
     description = request.form['description']
     new_subject = Subject(name=name, description=description)
     db.session.add(new_subject)
+    catalog.bump()
     db.session.commit()
     flash('Subject added successfully!', 'success')
     return redirect(url_for('admin.dashboard'))
@@ -70,6 +147,7 @@ def edit_subject(subject_id):
     if request.method == 'POST':
         subject.name = request.form['name']
         subject.description = request.form['description']
+        catalog.bump()
         db.session.commit()
         flash('Subject updated successfully!', 'success')
         return redirect(url_for('admin.dashboard'))
@@ -77,9 +155,8 @@ def edit_subject(subject_id):
 
 @admin_bp.route('/delete_subject/<int:subject_id>')
 def delete_subject(subject_id):
-    subject = Subject.query.get_or_404(subject_id)
-    db.session.delete(subject)
-    db.session.commit()
+    Subject.query.get_or_404(subject_id)
+    deletion.delete_subject(subject_id)  # Chapters, quizzes, questions and scores included
     flash('Subject deleted successfully!', 'danger')
     return redirect(url_for('admin.dashboard'))
 
@@ -91,6 +168,7 @@ def create_chapter():
     subject_id = request.form['subject_id']
     new_chapter = Chapter(name=name, description=description, subject_id=subject_id)
     db.session.add(new_chapter)
+    catalog.bump()
     db.session.commit()
     flash('Chapter added successfully!', 'success')
     return redirect(url_for('admin.dashboard'))
@@ -102,7 +180,12 @@ def edit_chapter(chapter_id):
     if request.method == 'POST':
         chapter.name = request.form['name']
         chapter.description = request.form['description']
-        chapter.subject_id = request.form['subject_id']
+        old_subject_id = chapter.subject_id
+        chapter.subject_id = int(request.form['subject_id'])
+        if chapter.subject_id != old_subject_id:
+            leaderboards.chapter_moved(chapter.id, old_subject_id)
+            score_rollups.chapter_moved(chapter.id, old_subject_id)
+        catalog.bump()
         db.session.commit()
         flash('Chapter updated successfully!', 'success')
         return redirect(url_for('admin.dashboard'))
@@ -110,9 +193,8 @@ def edit_chapter(chapter_id):
 
 @admin_bp.route('/delete_chapter/<int:chapter_id>')
 def delete_chapter(chapter_id):
-    chapter = Chapter.query.get_or_404(chapter_id)
-    db.session.delete(chapter)
-    db.session.commit()
+    Chapter.query.get_or_404(chapter_id)
+    deletion.delete_chapter(chapter_id)
     flash('Chapter deleted successfully!', 'danger')
     return redirect(url_for('admin.dashboard'))
 
@@ -126,6 +208,7 @@ def create_quiz():
     remarks = request.form.get('remarks', None)
     new_quiz = Quiz(title=title, chapter_id=chapter_id, date_of_quiz=date_of_quiz, time_duration=time_duration, remarks=remarks)
     db.session.add(new_quiz)
+    catalog.bump()
     db.session.commit()
     flash('Quiz added successfully!', 'success')
     return redirect(url_for('admin.dashboard'))
@@ -136,7 +219,11 @@ def edit_quiz(quiz_id):
     chapters = Chapter.query.all()
     if request.method == 'POST':
         quiz.title = request.form['title']
-        quiz.chapter_id = request.form['chapter_id']
+        old_chapter_id = quiz.chapter_id
+        quiz.chapter_id = int(request.form['chapter_id'])
+        if quiz.chapter_id != old_chapter_id:
+            leaderboards.quiz_moved(quiz.id, old_chapter_id)
+            score_rollups.quiz_moved(quiz.id, old_chapter_id)
         
         # Convert date_of_quiz to a Python date object
         date_of_quiz_str = request.form.get('date_of_quiz')
@@ -150,6 +237,8 @@ def edit_quiz(quiz_id):
             quiz.time_duration = datetime.strptime(time_duration_str, "%H:%M").time()
 
         quiz.remarks = request.form.get('remarks', None)  # Can be None if not provided
+        quiz_cache.invalidate(quiz.id)
+        catalog.bump()
         db.session.commit()
 
         flash('Quiz updated successfully!', 'success')
@@ -158,26 +247,35 @@ def edit_quiz(quiz_id):
 
 @admin_bp.route('/delete_quiz/<int:quiz_id>')
 def delete_quiz(quiz_id):
-    quiz = Quiz.query.get_or_404(quiz_id)
-
-    # Delete related records first
-    Question.query.filter_by(quiz_id=quiz.id).delete()
-    db.session.commit()  # Commit before deleting the quiz
-
-    db.session.delete(quiz)
-    db.session.commit()
-
+    Quiz.query.get_or_404(quiz_id)
+    deletion.delete_quiz(quiz_id)  # Questions, scores, attempts and aggregates in one transaction
     flash('Quiz deleted successfully!', 'danger')
     return redirect(url_for('admin.dashboard'))
 
 
+# Per-question difficulty, discrimination, distractors and KR-20 (services/item_analysis.py);
+# ?version= picks an older quiz version
+@admin_bp.route('/quiz_analysis/<int:quiz_id>', methods=['GET'])
+def quiz_analysis(quiz_id):
+    quiz = Quiz.query.get_or_404(quiz_id)
+    analysis = item_analysis.analyse(quiz_id, request.args.get('version', type=int))
+    return render_template('item_analysis.html', quiz=quiz, analysis=analysis,
+                           versions=item_analysis.versions(quiz_id))
+
+@admin_bp.route('/api/quiz_analysis/<int:quiz_id>', methods=['GET'])
+def quiz_analysis_json(quiz_id):
+    Quiz.query.get_or_404(quiz_id)
+    analysis = item_analysis.analyse(quiz_id, request.args.get('version', type=int))
+    if analysis is None:
+        return jsonify({'error': 'No graded attempts for this quiz'}), 404
+    return jsonify(dict(analysis._asdict(), items=[item._asdict() for item in analysis.items],
+                        updated_at=analysis.updated_at.isoformat() if analysis.updated_at else None))
+
 # View Quiz Scores
 @admin_bp.route('/quiz_scores')
 def quiz_scores():
-    scores = UserScore.query.all()
-    for score in scores:
-        print(f"User ID: {score.user_id}, Quiz ID: {score.quiz_id}, Score: {score.score}, Date: {score.date_taken}")
-    return render_template('admin_dashboard.html', quiz_scores=scores)
+    # The scores table is paginated on the dashboard itself
+    return redirect(url_for('admin.dashboard') + '#scores')
 
 # Edit Quiz Score
 @admin_bp.route('/edit_quiz_score/<int:score_id>', methods=['GET', 'POST'])
@@ -189,6 +287,9 @@ def edit_quiz_score(score_id):
         
         if new_score.isdigit():
             score.score = int(new_score)
+            score_stats.refresh_quiz(score.quiz_id)
+            score_rollups.refresh(score.user_id, score.quiz_id, score.date_taken)
+            leaderboards.refresh(score.user_id, score.quiz_id)
             db.session.commit()
             flash('Quiz score updated successfully!', 'success')
             return redirect(url_for('admin.dashboard'))
@@ -202,10 +303,84 @@ def edit_quiz_score(score_id):
 def delete_quiz_score(score_id):
     score = UserScore.query.get_or_404(score_id)
     db.session.delete(score)
+    score_stats.refresh_quiz(score.quiz_id)
+    score_rollups.refresh(score.user_id, score.quiz_id, score.date_taken)
+    leaderboards.refresh(score.user_id, score.quiz_id)
     db.session.commit()
     flash('Quiz score deleted!', 'success')
     return redirect(url_for('admin.dashboard'))
 
+# Quiz snapshot cache counters
+@admin_bp.route('/cache_stats', methods=['GET'])
+def cache_stats():
+    return jsonify(quiz_cache.stats())
+
+# Score write queue depth, batch sizes and commit latency
+@admin_bp.route('/score_queue_stats', methods=['GET'])
+def score_queue_stats():
+    return jsonify(score_writer.stats())
+
+# Metrics are readable by a logged-in admin or a scraper presenting METRICS_TOKEN
+def metrics_authorized():
+    if current_user.is_authenticated and current_user.role == "admin":
+        return True
+    token = current_app.config.get('METRICS_TOKEN')
+    supplied = request.headers.get('Authorization', '')
+    return bool(token) and hmac.compare_digest(supplied, f'Bearer {token}')
+
+# Prometheus text exposition of request/SQL/template metrics
+@admin_bp.route('/metrics', methods=['GET'])
+def metrics():
+    if not metrics_authorized():
+        abort(403)
+    return Response(instrumentation.render(), mimetype='text/plain; version=0.0.4')
+
+# Toggle the sampling profiler for slow requests (enabled=1/0)
+@admin_bp.route('/metrics/profiler', methods=['POST'])
+def toggle_profiler():
+    if not metrics_authorized():
+        abort(403)
+    instrumentation.set_profiler(request.values.get('enabled') in ('1', 'true', 'on'))
+    return jsonify({'profiler_enabled': instrumentation.profiler_enabled})
+
+# Bulk question-bank import (CSV or JSON Lines); runs in the background, poll the job for progress
+@admin_bp.route('/question_bank/import', methods=['POST'])
+def import_question_bank():
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        flash('Choose a CSV or JSONL file to import.', 'danger')
+        return redirect(url_for('admin.dashboard'))
+    fmt = request.form.get('format') or question_bank.detect_format(upload.filename)
+    if fmt not in question_bank.FORMATS:
+        flash(f'Unsupported format: {fmt}', 'danger')
+        return redirect(url_for('admin.dashboard'))
+    job_id = question_bank.import_jobs.start(current_app._get_current_object(), upload, fmt)
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify({'job_id': job_id}), 202
+    flash('Import started.', 'info')
+    return redirect(url_for('admin.dashboard', import_job=job_id) + '#question-bank')
+
+@admin_bp.route('/question_bank/import/<job_id>', methods=['GET'])
+def import_question_bank_status(job_id):
+    report = question_bank.import_jobs.get(job_id)
+    if report is None:
+        return jsonify({'error': 'Unknown import job'}), 404
+    return jsonify(report)
+
+# Streamed export of the whole bank, or of one subject with ?subject_id=
+@admin_bp.route('/question_bank/export', methods=['GET'])
+def export_question_bank():
+    fmt = request.args.get('format', 'csv')
+    if fmt not in question_bank.FORMATS:
+        return jsonify({'error': f'Unsupported format: {fmt}'}), 400
+    rows = question_bank.export_rows(request.args.get('subject_id', type=int))
+    if fmt == 'csv':
+        body, mimetype = question_bank.stream_csv(rows), 'text/csv'
+    else:
+        body, mimetype = question_bank.stream_jsonl(rows), 'application/x-ndjson'
+    return Response(stream_with_context(body), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename=question_bank.{fmt}'})
+
 # Route to Add Questions
 @admin_bp.route('/add_questions/<int:quiz_id>', methods=['GET', 'POST'])
 def add_questions(quiz_id):
@@ -230,6 +405,7 @@ def add_questions(quiz_id):
         )
 
         db.session.add(new_question)
+        quiz_cache.invalidate(quiz.id)
         db.session.commit()
         flash('Question added successfully!', 'success')
         return redirect(url_for('admin.add_questions', quiz_id=quiz.id))
@@ -241,60 +417,78 @@ def add_questions(quiz_id):
 @admin_bp.route('/edit_questions/<int:quiz_id>', methods=['GET', 'POST'])
 def edit_questions(quiz_id):
     quiz = Quiz.query.get_or_404(quiz_id)
-    questions = Question.query.filter_by(quiz_id=quiz_id).all()
+    questions = Question.query.filter_by(quiz_id=quiz_id).order_by(*QUESTION_ORDER).all()
 
     if request.method == 'POST':
-        for question in questions:
-            question_text = request.form.get(f'question_text_{question.id}')
-            option_1 = request.form.get(f'option_1_{question.id}')
-            option_2 = request.form.get(f'option_2_{question.id}')
-            option_3 = request.form.get(f'option_3_{question.id}')
-            option_4 = request.form.get(f'option_4_{question.id}')
-            correct_answer = request.form.get(f'correct_answer_{question.id}')
-
-            question.question_text = question_text
-            question.option_1 = option_1
-            question.option_2 = option_2
-            question.option_3 = option_3
-            question.option_4 = option_4
-            question.correct_answer = correct_answer
-
+        # The form posts every field; apply_patch diffs them so only edited rows are written
+        patch = {'base_version': request.form.get('base_version', type=int), 'update': {}, 'delete': []}
+        kept = []
+        for index, question in enumerate(questions):
+            if request.form.get(f'delete_{question.id}'):
+                patch['delete'].append(question.id)
+                continue
+            patch['update'][question.id] = {
+                field: request.form.get(f'{field}_{question.id}') for field in EDITABLE
+                if f'{field}_{question.id}' in request.form
+            }
+            kept.append((request.form.get(f'position_{question.id}', index + 1, type=int), index, question.id))
+        order = [question_id for _, _, question_id in sorted(kept)]
+        if order != [question.id for question in questions if question.id not in patch['delete']]:
+            patch['order'] = order
+
+        try:
+            result = apply_patch(quiz.id, patch)
+        except VersionConflict:
+            db.session.rollback()
+            flash('These questions were changed by someone else. Review the latest version and try again.', 'danger')
+            return redirect(url_for('admin.edit_questions', quiz_id=quiz.id))
+        except PatchError as e:
+            db.session.rollback()
+            flash(str(e), 'danger')
+            return redirect(url_for('admin.edit_questions', quiz_id=quiz.id))
         db.session.commit()
-        flash('Questions updated successfully!', 'success')
+        flash(f"Questions saved: {result['updated']} edited, {result['deleted']} deleted, "
+              f"{result['reordered']} moved.", 'success')
         return redirect(url_for('admin.edit_questions', quiz_id=quiz.id))
 
     return render_template('edit_questions.html', quiz=quiz, questions=questions)
 
+# JSON patch of a quiz's questions: changed fields by id, plus add/delete/order (see services/question_edits.py)
+@admin_bp.route('/edit_questions/<int:quiz_id>/patch', methods=['PATCH', 'POST'])
+def patch_questions(quiz_id):
+    Quiz.query.get_or_404(quiz_id)
+    try:
+        result = apply_patch(quiz_id, request.get_json(silent=True))
+    except VersionConflict as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 409
+    except PatchError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    db.session.commit()
+    return jsonify(result)
+
 @admin_bp.route("/search", methods=["GET"])
 def search():
     query = request.args.get("query", "").strip()
     category = request.args.get("category", "").strip()
+    page = max(request.args.get("page", 1, type=int), 1)
 
     if not query:
         return render_template("admin_dashboard.html", error="Please enter a search query.")
 
-    results = []
-    
-    if category == "users":
-        results = User.query.filter(User.full_name.ilike(f"%{query}%") | User.email.ilike(f"%{query}%")).all()
-    elif category == "subjects":
-        results = Subject.query.filter(Subject.name.ilike(f"%{query}%")).all()
-    elif category == "quizzes":
-        results = Quiz.query.filter(Quiz.title.ilike(f"%{query}%")).all()
-    elif category == "questions":
-        results = Question.query.filter(Question.text.ilike(f"%{query}%")).all()
-    
+    # Ranked prefix search over the FTS5 indexes (services/search.py)
+    results = search_index.search(query, category=category, page=page)
+
     return render_template("admin_search_results.html", results=results, category=category, query=query)
+# The whole subject -> chapter -> quiz tree, versioned; the dashboard forms load it once
+@admin_bp.route('/catalog', methods=['GET'])
+def catalog_tree():
+    return catalog.response()
+
 @admin_bp.route('/get_chapters/<int:subject_id>', methods=['GET'])
 def get_chapters(subject_id):
-    print(f"📌 DEBUG: Received request for subject_id: {subject_id}")  # Debug log
-
-    chapters = Chapter.query.filter_by(subject_id=subject_id).all()
-
-    if not chapters:
-        print(f"⚠️ No chapters found for subject_id: {subject_id}")  # Debug log
-
-    return jsonify([{'id': chapter.id, 'name': chapter.name} for chapter in chapters])
+    return jsonify(catalog.chapters(subject_id))
 
 
 
@@ -0,0 +1,265 @@
+from datetime import date, datetime, timedelta
+from functools import wraps
+
+from flask import Blueprint, jsonify, request, make_response
+from flask_login import current_user
+from sqlalchemy import func
+
+from models import db, Quiz, Question, Chapter, Subject, UserScore
+from models.rollup import SCOPES as TREND_SCOPES
+from services import score_rollups
+from services.attempts import attempts, AttemptClosed, AttemptExpired, AttemptNotFound
+from services.answer_log import answer_log, AutosaveTimeout
+from services.database import read_session
+from services.pagination import keyset_page, page_size
+from services.quiz_cache import quiz_cache
+from services.quiz_payloads import quiz_payloads, quiz_etag
+from services.score_writer import record_result
+
+# JSON API for taking quizzes, independent of the server-rendered pages.
+# Read endpoints do no template work and hand out precomputed bytes, so each one holds
+# a worker thread only briefly (see asgi.py).
+#
+# Taking a quiz: POST /quizzes/<id>/attempts, then GET /attempts/<id>/questions (the
+# questions of the version the attempt is graded against), autosave, submit.
+# GET /quizzes/<id> is the current version, for browsing.
+api_bp = Blueprint('api', __name__)
+
+
+def api_login_required(view):
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        if not current_user.is_authenticated:
+            return jsonify({'error': 'Authentication required'}), 401
+        return view(*args, **kwargs)
+    return wrapped
+
+
+def error(message, status):
+    return jsonify({'error': message}), status
+
+
+def attempt_json(attempt):
+    return {
+        'attempt_id': attempt.id,
+        'quiz_id': attempt.quiz_id,
+        'quiz_version': attempt.quiz_version,
+        'question_ids': [int(qid) for qid in attempt.answer_key.question_ids],
+        'deadline': attempt.deadline.isoformat() + 'Z' if attempt.deadline else None,
+        'remaining_seconds': attempts.remaining_seconds(attempt),
+        'answers': answer_log.saved_options(attempt),
+    }
+
+
+# Every quiz with its chapter, subject and size
+@api_bp.route('/quizzes')
+@api_login_required
+def list_quizzes():
+    session = read_session()
+    counts = dict(session.query(Question.quiz_id, func.count()).group_by(Question.quiz_id))
+    rows = (
+        session.query(Quiz.id, Quiz.title, Quiz.date_of_quiz, Quiz.time_duration, Quiz.content_version,
+                      Chapter.id, Chapter.name, Subject.id, Subject.name)
+        .outerjoin(Chapter, Chapter.id == Quiz.chapter_id)
+        .outerjoin(Subject, Subject.id == Chapter.subject_id)
+        .order_by(Quiz.id)
+    )
+    quizzes = [{
+        'id': quiz_id, 'title': title, 'version': version,
+        'date': quiz_date.isoformat() if quiz_date else None,
+        'duration_seconds': duration.hour * 3600 + duration.minute * 60 if duration else None,
+        'question_count': counts.get(quiz_id, 0),
+        'chapter': {'id': chapter_id, 'name': chapter_name},
+        'subject': {'id': subject_id, 'name': subject_name},
+    } for quiz_id, title, quiz_date, duration, version, chapter_id, chapter_name, subject_id, subject_name in rows]
+
+    response = jsonify({'quizzes': quizzes})
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.add_etag()
+    return response.make_conditional(request)
+
+
+# The questions of a quiz (never the answers). Encoded and gzipped once per quiz version;
+# If-None-Match is answered from the version alone.
+@api_bp.route('/quizzes/<int:quiz_id>')
+@api_login_required
+def quiz_payload(quiz_id):
+    version = quiz_cache.version(quiz_id)
+    if version is None:
+        return error('Unknown quiz', 404)
+    gzipped = request.accept_encodings['gzip'] > 0
+    etag = quiz_etag_for(quiz_id, version, gzipped)
+    if request.if_none_match.contains(etag):
+        return not_modified(etag)
+
+    payload = quiz_payloads.get(quiz_id, version)
+    if payload is None:
+        return error('Unknown quiz', 404)
+    return payload_response(payload, gzipped)
+
+
+# The questions of the quiz version an open attempt was frozen at, in its grading order:
+# an admin edit mid-exam changes GET /quizzes/<id>, never this
+@api_bp.route('/attempts/<attempt_id>/questions')
+@api_login_required
+def attempt_questions(attempt_id):
+    try:
+        attempt = attempts.active(attempt_id, current_user.id)
+    except AttemptNotFound:
+        return error('Unknown attempt', 404)
+    except (AttemptClosed, AttemptExpired):
+        return error('This attempt is closed', 409)
+    gzipped = request.accept_encodings['gzip'] > 0
+    etag = quiz_etag_for(attempt.quiz_id, attempt.quiz_version, gzipped)
+    if request.if_none_match.contains(etag):
+        return not_modified(etag)
+
+    payload = quiz_payloads.frozen(attempt.quiz_id, attempt.quiz_version)
+    if payload is None:
+        return error('The questions of this attempt are no longer available', 410)
+    return payload_response(payload, gzipped)
+
+
+def payload_response(payload, gzipped):
+    response = make_response(payload.gzipped if gzipped else payload.body)
+    response.content_type = 'application/json'
+    if gzipped:
+        response.content_encoding = 'gzip'
+    cache_headers(response, quiz_etag_for(payload.quiz_id, payload.version, gzipped))
+    return response
+
+
+# Each encoding is a separate representation, so it gets its own strong ETag
+def quiz_etag_for(quiz_id, version, gzipped):
+    etag = quiz_etag(quiz_id, version)
+    return etag + '-gzip' if gzipped else etag
+
+
+def cache_headers(response, etag):
+    response.set_etag(etag)
+    response.vary.add('Accept-Encoding')
+    response.cache_control.private = True
+    response.cache_control.no_cache = True  # Always revalidate: a new version must show up at once
+
+
+def not_modified(etag):
+    response = make_response('', 304)
+    cache_headers(response, etag)
+    return response
+
+
+# Opens an attempt (or resumes the open one): the server-side clock starts here
+@api_bp.route('/quizzes/<int:quiz_id>/attempts', methods=['POST'])
+@api_login_required
+def open_attempt(quiz_id):
+    snapshot = quiz_cache.get(quiz_id)
+    if snapshot is None:
+        return error('Unknown quiz', 404)
+    attempt = attempts.open(current_user.id, snapshot)
+    db.session.commit()
+    return jsonify(attempt_json(attempt)), 201
+
+
+@api_bp.route('/attempts/<attempt_id>')
+@api_login_required
+def get_attempt(attempt_id):
+    try:
+        attempt = attempts.active(attempt_id, current_user.id)
+    except AttemptNotFound:
+        return error('Unknown attempt', 404)
+    except (AttemptClosed, AttemptExpired):
+        return error('This attempt is closed', 409)
+    return jsonify(attempt_json(attempt))
+
+
+# Autosave: {"answers": {"<question_id>": <option 1-4 or null>, ...}} for an open attempt
+@api_bp.route('/attempts/<attempt_id>/answers', methods=['POST', 'PATCH'])
+@api_login_required
+def save_answers(attempt_id):
+    answers = (request.get_json(silent=True) or {}).get('answers')
+    if not isinstance(answers, dict):
+        return error('answers must be an object of question id to option', 400)
+    try:
+        attempt = attempts.active(attempt_id, current_user.id)
+        saved = answer_log.record(attempt, answers.items())
+    except AttemptNotFound:
+        return error('Unknown attempt', 404)
+    except (AttemptClosed, AttemptExpired):
+        return error('This attempt is closed', 409)
+    except ValueError as e:
+        return error(str(e), 400)
+    except AutosaveTimeout:
+        return error('Answers not saved yet, please resend them', 503)
+    return jsonify({'saved': saved, 'remaining_seconds': attempts.remaining_seconds(attempt)})
+
+
+# Grades the attempt: autosaved answers overlaid with any sent here ({"answers": {...}})
+@api_bp.route('/attempts/<attempt_id>/submit', methods=['POST'])
+@api_login_required
+def submit_attempt(attempt_id):
+    answers = (request.get_json(silent=True) or {}).get('answers') or {}
+    if not isinstance(answers, dict):
+        return error('answers must be an object of question id to option', 400)
+    form = {f'question_{question_id}': value for question_id, value in answers.items()}
+    try:
+        attempt, result = attempts.submit(attempt_id, current_user.id, form)
+    except AttemptExpired:
+        db.session.commit()
+        return error('Time is up: this attempt closed at its deadline and was not graded', 409)
+    except AttemptClosed:
+        return error('This attempt has already been submitted', 409)
+    except AttemptNotFound:
+        return error('Unknown attempt', 404)
+
+    submission_id, status = record_result(current_user.id, attempt.quiz_id, result.score)
+    return jsonify({'submission_id': submission_id, 'status': status, 'quiz_id': attempt.quiz_id,
+                    'score': result.score, 'total': result.total})
+
+
+# The user's results, newest first; `after` is the `next` cursor of the previous page
+@api_bp.route('/results')
+@api_login_required
+def results():
+    query = (
+        read_session().query(UserScore.id, UserScore.submission_id, UserScore.quiz_id, Quiz.title,
+                             UserScore.score, UserScore.date_taken)
+        .join(Quiz, Quiz.id == UserScore.quiz_id)
+        .filter(UserScore.user_id == current_user.id)
+    )
+    quiz_id = request.args.get('quiz_id', type=int)
+    if quiz_id is not None:
+        query = query.filter(UserScore.quiz_id == quiz_id)
+    try:
+        rows, next_cursor = keyset_page(query, (UserScore.date_taken, UserScore.id),
+                                        after=request.args.get('after'),
+                                        limit=page_size(request.args.get('limit')), descending=True)
+    except ValueError as e:
+        return error(str(e), 400)
+    return jsonify({'items': [{
+        'submission_id': row.submission_id, 'quiz_id': row.quiz_id, 'quiz_title': row.title,
+        'score': row.score, 'date_taken': row.date_taken.isoformat() if row.date_taken else None,
+    } for row in rows], 'next': next_cursor})
+
+
+# Score history of a quiz, chapter, subject or user (your own, unless admin) from the daily and
+# weekly rollups: ?start=&end= (ISO dates, default the last year), at most ?points= buckets
+@api_bp.route('/trends/<scope>/<int:scope_id>')
+@api_login_required
+def score_trend(scope, scope_id):
+    if scope not in TREND_SCOPES:
+        return error('Unknown scope', 404)
+    if scope == 'user' and scope_id != current_user.id and current_user.role != 'admin':
+        return error('Not allowed', 403)
+    try:
+        end = date.fromisoformat(request.args['end']) if 'end' in request.args else datetime.utcnow().date()
+        start = date.fromisoformat(request.args['start']) if 'start' in request.args else end - timedelta(days=365)
+        trend = score_rollups.trend(scope, scope_id, start, end,
+                                    request.args.get('points', score_rollups.DEFAULT_POINTS, type=int))
+    except ValueError as e:
+        return error(str(e), 400)
+    return jsonify({
+        'scope': scope, 'scope_id': scope_id, 'start': trend.start.isoformat(), 'end': trend.end.isoformat(),
+        'bucket_days': trend.bucket_days,
+        'points': [dict(point._asdict(), start=point.start.isoformat()) for point in trend.points],
+    })
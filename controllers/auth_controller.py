@@ -1,6 +1,6 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_user, logout_user, login_required,current_user
-from werkzeug.security import generate_password_hash, check_password_hash
+from services.credentials import credentials, CredentialsBusy
 from models.user import User 
 from models.quiz import Quiz  
 from models import db 
@@ -15,7 +15,11 @@ auth = Blueprint('auth', __name__)
 def signup():
     form = RegistrationForm()
     if form.validate_on_submit():
-        hashed_password = generate_password_hash(form.password.data, method='pbkdf2:sha256')
+        try:
+            hashed_password = credentials.hash_password(form.password.data)
+        except CredentialsBusy:
+            flash("Too many sign-ups right now, please try again in a moment.", "warning")
+            return render_template('signup.html', form=form), 503
         new_user = User(
             email=form.email.data,
             password=hashed_password,
@@ -43,24 +47,33 @@ def login():
         email = request.form.get('email')
         password = request.form.get('password')
 
-        print(f"Email Entered: {email}")  # Debugging
-        print(f"Password Entered: {password}")  # Debugging
+        # Throttled before the user lookup, so a guessing burst never reaches the hasher
+        wait = credentials.retry_after(email, request.remote_addr)
+        if wait:
+            flash(f"Too many failed login attempts. Try again in {wait} seconds.", "danger")
+            return render_template('login.html', form=form), 429
 
         user = User.query.filter_by(email=email).first()
 
         if not user:
+            credentials.login_failed(email, request.remote_addr)
             flash("User does not exist. Please sign up.", "danger")
             return redirect(url_for('auth.login'))
 
-        if not check_password_hash(user.password, password):
+        try:
+            valid = credentials.check(user, password)
+        except CredentialsBusy:
+            flash("The server is busy, please try again in a moment.", "warning")
+            return render_template('login.html', form=form), 503
+        if not valid:
+            credentials.login_failed(email, request.remote_addr)
             flash("Incorrect password. Please try again.", "danger")
             return redirect(url_for('auth.login'))
 
-        print("User found, trying to log in...")  # Debugging
+        credentials.login_succeeded(email)
+        db.session.commit()  # Stores the hash if check() upgraded it
         login_user(user)  
 
-        print("User logged in!")  # Debugging
-
         flash("Login successful!", "success")
         return redirect(url_for('user.user_dashboard'))  
 
@@ -70,15 +83,29 @@ def login():
 def admin_login():
     form = LoginForm()
     if form.validate_on_submit():
+        wait = credentials.retry_after(form.email.data, request.remote_addr)
+        if wait:
+            flash(f"Too many failed login attempts. Try again in {wait} seconds.", "danger")
+            return render_template('admin_login.html', form=form), 429
+
         user = User.query.filter_by(email=form.email.data).first()
 
         if not user:
+            credentials.login_failed(form.email.data, request.remote_addr)
             flash("User does not exist.", "danger")
             return redirect(url_for('auth.admin_login'))
 
-        if not check_password_hash(user.password, form.password.data):
+        try:
+            valid = credentials.check(user, form.password.data)
+        except CredentialsBusy:
+            flash("The server is busy, please try again in a moment.", "warning")
+            return render_template('admin_login.html', form=form), 503
+        if not valid:
+            credentials.login_failed(form.email.data, request.remote_addr)
             flash("Incorrect password.", "danger")
             return redirect(url_for('auth.admin_login'))
+        credentials.login_succeeded(form.email.data)
+        db.session.commit()
 
         if user.role != "admin":
             flash("Access denied! You are not an admin.", "danger")
@@ -1,10 +1,12 @@
 from flask import Blueprint, render_template
 from flask_login import login_required, current_user
 from models.user_score import UserScore
+from services.page_cache import page_cache
 
 main = Blueprint('main', __name__)
 
 @main.route('/')
+@page_cache.cached
 def home():
     return render_template('home.html')
 
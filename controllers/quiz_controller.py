@@ -1,7 +1,9 @@
 from flask import Blueprint, render_template
+from services.page_cache import page_cache
 
 quiz = Blueprint('quiz', __name__) 
 
 @quiz.route('/start')
+@page_cache.cached
 def start_quiz():
     return render_template('quiz.html')
@@ -1,10 +1,17 @@
-from flask import render_template, request, redirect, url_for, flash
+from flask import render_template, request, redirect, url_for, flash, abort
 from flask_login import login_required, current_user
-from models import Quiz, Question, UserScore, db
-from datetime import datetime
+from models import Quiz, UserScore, User, Subject, Chapter, db
+from models.leaderboard import SCOPES
 from flask import Blueprint
 from flask import jsonify
-from sqlalchemy.sql import func
+from services import performance
+from services.quiz_cache import quiz_cache
+from services.quiz_payloads import quiz_payloads, payload_questions
+from services.score_writer import score_writer, record_result
+from services.database import read_session
+from services.leaderboard import leaderboards
+from services.attempts import attempts, AttemptClosed, AttemptExpired, AttemptNotFound
+from services.answer_log import answer_log
 
 user_bp = Blueprint('user', __name__)
 
@@ -12,36 +19,11 @@ user_bp = Blueprint('user', __name__)
 @user_bp.route('/user_dashboard')
 @login_required
 def user_dashboard():
-    quizzes = Quiz.query.all()
-    scores = UserScore.query.filter_by(user_id=current_user.id).all()
+    session = read_session()
+    quizzes = session.query(Quiz).all()
+    scores = session.query(UserScore).filter_by(user_id=current_user.id).all()
 
-    # Fetch performance data for each quiz
-    performance_data = []
-    for quiz in quizzes:
-        highest_user_score = (
-            db.session.query(func.max(UserScore.score))
-            .filter(UserScore.user_id == current_user.id, UserScore.quiz_id == quiz.id)
-            .scalar()
-        ) or 0
-
-        highest_score = (
-            db.session.query(func.max(UserScore.score))
-            .filter(UserScore.quiz_id == quiz.id)
-            .scalar()
-        ) or 0
-
-        average_score = (
-            db.session.query(func.avg(UserScore.score))
-            .filter(UserScore.quiz_id == quiz.id)
-            .scalar()
-        ) or 0
-
-        performance_data.append({
-            "quiz_title": quiz.title,
-            "user_highest": highest_user_score,
-            "highest_score": highest_score,
-            "average_score": round(average_score, 2)
-        })
+    performance_data = performance.performance_summary(current_user.id)
 
     return render_template("user_dashboard.html", quizzes=quizzes, scores=scores, performance_data=performance_data)
 
@@ -50,34 +32,96 @@ def user_dashboard():
 @user_bp.route('/start_quiz/<int:quiz_id>', methods=['GET', 'POST'])
 @login_required
 def start_quiz(quiz_id):
-    quiz = Quiz.query.get_or_404(quiz_id)
-    questions = Question.query.filter_by(quiz_id=quiz_id).all()
-
-    # Convert `hh:mm` (time_duration) to total seconds
-    time_parts = str(quiz.time_duration).split(':')  # Convert `hh:mm` to list [hh, mm]
-    total_seconds = int(time_parts[0]) * 3600 + int(time_parts[1]) * 60  # Convert to seconds
-
     if request.method == 'POST':
-        score = 0
-        for question in questions:
-            user_answer = request.form.get(f'question_{question.id}')
-            correct_answer = getattr(question, question.correct_answer)  # Get the actual answer text
-
-            print(f"User Answer: {user_answer}, Correct Answer: {correct_answer}")  # Debugging
-
-            if user_answer and user_answer.strip().lower() == correct_answer.strip().lower():
-                score += 1
-
-        # Save score in database
-        new_score = UserScore(user_id=current_user.id, quiz_id=quiz_id, score=score, date_taken=datetime.utcnow())
-        db.session.add(new_score)
-        db.session.commit()
-
-        flash(f'Quiz Completed! Your Score: {score}/{len(questions)}', 'success')
-        return redirect(url_for('user.user_dashboard'))
-
-    return render_template('start_quiz.html', quiz=quiz, questions=questions, total_seconds=total_seconds)
-
+        # Graded against the key frozen into the attempt when the quiz was opened; the
+        # deadline is checked against the server clock, not the browser's timer
+        try:
+            attempt, result = attempts.submit(request.form.get('attempt_id', ''), current_user.id, request.form,
+                                              quiz_id=quiz_id)
+        except AttemptExpired:
+            db.session.commit()
+            flash('Time is up: this attempt closed at its deadline and was not graded.', 'danger')
+            return redirect(url_for('user.user_dashboard'))
+        except AttemptClosed:
+            flash('This attempt has already been submitted.', 'warning')
+            return redirect(url_for('user.user_dashboard'))
+        except AttemptNotFound:
+            abort(404)
+
+        # Save score in database (group-committed in the background when the score queue is on)
+        submission_id, _ = record_result(current_user.id, quiz_id, result.score)
+
+        flash(f'Quiz Completed! Your Score: {result.score}/{result.total}', 'success')
+        return redirect(url_for('user.user_dashboard', submission=submission_id))
+
+    # Cached, immutable snapshot of the quiz and its questions
+    quiz = quiz_cache.get(quiz_id)
+    if quiz is None:
+        abort(404)
+    # Opening (or resuming) the attempt starts the server-side clock
+    attempt = attempts.open(current_user.id, quiz)
+    db.session.commit()
+    if attempt.quiz_version == quiz.version:
+        questions = quiz.questions
+    else:
+        # Resumed after an edit: show the version the attempt is graded against
+        payload = quiz_payloads.frozen(quiz_id, attempt.quiz_version)
+        if payload is not None:
+            questions = payload_questions(payload)
+        else:  # Opened before payloads were stored: the current text of its questions
+            by_id = {question.id: question for question in quiz.questions}
+            questions = [by_id[int(qid)] for qid in attempt.answer_key.question_ids if int(qid) in by_id]
+
+    return render_template('start_quiz.html', quiz=quiz, questions=questions, attempt_id=attempt.id,
+                           remaining_seconds=attempts.remaining_seconds(attempt),
+                           saved_answers=answer_log.saved_options(attempt))
+
+
+
+# Lets the client confirm a queued score has reached the database
+@user_bp.route('/submissions/<submission_id>')
+@login_required
+def submission_status(submission_id):
+    row = score_writer.pending(submission_id)
+    if row is None and score_writer.enabled:
+        row = score_writer.spooled(submission_id)  # Accepted by another worker
+    if row and row['user_id'] == current_user.id:
+        return jsonify({'submission_id': submission_id, 'status': 'queued', 'score': row['score']})
+
+    # After the spools: a writer commits before it truncates its spool
+    score = UserScore.query.filter_by(submission_id=submission_id, user_id=current_user.id).first()
+    if not score:
+        return jsonify({'submission_id': submission_id, 'status': 'unknown'}), 404
+    return jsonify({'submission_id': submission_id, 'status': 'persisted', 'score': score.score})
+
+# Leaderboard for a quiz, chapter or subject: top K, the current user's standing and neighbours
+@user_bp.route('/leaderboard/<scope>/<int:scope_id>')
+@login_required
+def leaderboard(scope, scope_id):
+    if scope not in SCOPES:
+        abort(404)
+    model, label = {'quiz': (Quiz, 'title'), 'chapter': (Chapter, 'name'), 'subject': (Subject, 'name')}[scope]
+    session = read_session()
+    name = session.query(getattr(model, label)).filter(model.id == scope_id).scalar()
+    if name is None:
+        abort(404)
+
+    k = min(max(request.args.get('k', 10, type=int), 1), 100)
+    top = leaderboards.top(scope, scope_id, k)
+    me = leaderboards.standing(scope, scope_id, current_user.id)
+    around = leaderboards.neighbours(scope, scope_id, current_user.id)
+    user_ids = {s.user_id for s in top + around}
+    names = dict(session.query(User.id, User.full_name).filter(User.id.in_(user_ids))) if user_ids else {}
+
+    def entry(standing):
+        return dict(standing._asdict(), name=names.get(standing.user_id))
+
+    if request.args.get('format') == 'json':
+        return jsonify({'scope': scope, 'scope_id': scope_id, 'name': name,
+                        'top': [entry(s) for s in top], 'me': me._asdict() if me else None,
+                        'neighbours': [entry(s) for s in around]})
+    return render_template('leaderboard.html', scope=scope, name=name, top=[entry(s) for s in top], me=me,
+                           neighbours=[entry(s) for s in around])
 
 
 @user_bp.route('/scores')
@@ -97,6 +97,14 @@ def run_migrations_online():
     connectable = get_engine()
 
     with connectable.connect() as connection:
+        # Batch migrations rebuild SQLite tables (copy, DROP, rename); with foreign keys
+        # enforced the DROP would cascade into every child table. The pragma is a no-op
+        # inside a transaction, so it is set before Alembic opens one.
+        sqlite = connection.dialect.name == 'sqlite'
+        if sqlite:
+            connection.exec_driver_sql('PRAGMA foreign_keys = OFF')
+            connection.commit()  # End the autobegun transaction so Alembic manages its own
+
         context.configure(
             connection=connection,
             target_metadata=get_metadata(),
@@ -106,6 +114,9 @@ def run_migrations_online():
         with context.begin_transaction():
             context.run_migrations()
 
+        if sqlite:
+            connection.exec_driver_sql('PRAGMA foreign_keys = ON')
+
 
 if context.is_offline_mode():
     run_migrations_offline()
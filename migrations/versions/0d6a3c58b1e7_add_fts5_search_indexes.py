@@ -0,0 +1,56 @@
+"""Add FTS5 search indexes for users, subjects, quizzes and questions
+
+Revision ID: 0d6a3c58b1e7
+Revises: e93b4d17a6f2
+Create Date: 2026-10-18 13:05:12.660418
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0d6a3c58b1e7'
+down_revision = 'e93b4d17a6f2'
+branch_labels = None
+depends_on = None
+
+# fts table -> (content table, indexed columns)
+INDEXES = {
+    'search_users': ('user', ('full_name', 'email')),
+    'search_subjects': ('subject', ('name', 'description')),
+    'search_quizzes': ('quiz', ('title', 'remarks')),
+    'search_questions': ('question', ('question_text', 'option_1', 'option_2', 'option_3', 'option_4')),
+}
+
+
+def upgrade():
+    for fts, (table, columns) in INDEXES.items():
+        cols = ', '.join(columns)
+        new_values = ', '.join(f'new.{c}' for c in columns)
+        old_values = ', '.join(f'old.{c}' for c in columns)
+        op.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({cols}, content='{table}', content_rowid='id', "
+            f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON \"{table}\" BEGIN "
+            f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values}); END"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON \"{table}\" BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); END"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON \"{table}\" BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); "
+            f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values}); END"
+        )
+        op.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def downgrade():
+    for fts in INDEXES:
+        for suffix in ('ai', 'ad', 'au'):
+            op.execute(f"DROP TRIGGER IF EXISTS {fts}_{suffix}")
+        op.execute(f"DROP TABLE IF EXISTS {fts}")
@@ -0,0 +1,46 @@
+"""Add quiz_attempt table for server-side quiz sessions
+
+Revision ID: 1c5a7e93d2f4
+Revises: 8b4e1f6a2c70
+Create Date: 2026-10-18 22:15:41.907355
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1c5a7e93d2f4'
+down_revision = '8b4e1f6a2c70'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('quiz_attempt',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('quiz_id', sa.Integer(), nullable=False),
+    sa.Column('quiz_version', sa.Integer(), nullable=False),
+    sa.Column('question_ids', sa.LargeBinary(), nullable=False),
+    sa.Column('answer_key', sa.LargeBinary(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=False),
+    sa.Column('deadline', sa.DateTime(), nullable=True),
+    sa.Column('status', sa.String(length=10), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.Column('score', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['quiz_id'], ['quiz.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('quiz_attempt', schema=None) as batch_op:
+        batch_op.create_index('ix_quiz_attempt_status_deadline', ['status', 'deadline'], unique=False)
+        batch_op.create_index('ix_quiz_attempt_user_id_quiz_id_status', ['user_id', 'quiz_id', 'status'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('quiz_attempt', schema=None) as batch_op:
+        batch_op.drop_index('ix_quiz_attempt_user_id_quiz_id_status')
+        batch_op.drop_index('ix_quiz_attempt_status_deadline')
+
+    op.drop_table('quiz_attempt')
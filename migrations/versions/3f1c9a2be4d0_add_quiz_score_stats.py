@@ -0,0 +1,40 @@
+"""Add quiz_score_stats aggregate table
+
+Revision ID: 3f1c9a2be4d0
+Revises: 7d97a7690e97
+Create Date: 2026-10-18 09:12:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c9a2be4d0'
+down_revision = '7d97a7690e97'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('quiz_score_stats',
+    sa.Column('quiz_id', sa.Integer(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.Column('sum_squares', sa.Integer(), nullable=False),
+    sa.Column('min_score', sa.Integer(), nullable=True),
+    sa.Column('max_score', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['quiz_id'], ['quiz.id'], ),
+    sa.PrimaryKeyConstraint('quiz_id')
+    )
+
+    # Backfill from existing scores
+    op.execute(
+        "INSERT INTO quiz_score_stats (quiz_id, attempts, total, sum_squares, min_score, max_score) "
+        "SELECT quiz_id, COUNT(id), SUM(score), SUM(score * score), MIN(score), MAX(score) "
+        "FROM user_score GROUP BY quiz_id"
+    )
+
+
+def downgrade():
+    op.drop_table('quiz_score_stats')
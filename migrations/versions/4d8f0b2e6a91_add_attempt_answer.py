@@ -0,0 +1,30 @@
+"""Add attempt_answer table for autosaved answers
+
+Revision ID: 4d8f0b2e6a91
+Revises: 1c5a7e93d2f4
+Create Date: 2026-10-18 22:58:26.730114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4d8f0b2e6a91'
+down_revision = '1c5a7e93d2f4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('attempt_answer',
+    sa.Column('attempt_id', sa.String(length=32), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('option', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['attempt_id'], ['quiz_attempt.id'], ),
+    sa.PrimaryKeyConstraint('attempt_id', 'position')
+    )
+
+
+def downgrade():
+    op.drop_table('attempt_answer')
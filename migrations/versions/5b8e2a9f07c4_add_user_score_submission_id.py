@@ -0,0 +1,28 @@
+"""Add user_score submission_id for idempotent queued writes
+
+Revision ID: 5b8e2a9f07c4
+Revises: c27d5f81e3a9
+Create Date: 2026-10-18 11:36:09.447812
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b8e2a9f07c4'
+down_revision = 'c27d5f81e3a9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user_score', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('submission_id', sa.String(length=32), nullable=True))
+        batch_op.create_index(batch_op.f('ix_user_score_submission_id'), ['submission_id'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('user_score', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_user_score_submission_id'))
+        batch_op.drop_column('submission_id')
@@ -0,0 +1,26 @@
+"""Add question position for reordering
+
+Revision ID: 6f2d9c4e8a13
+Revises: 0d6a3c58b1e7
+Create Date: 2026-10-18 21:02:17.412906
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6f2d9c4e8a13'
+down_revision = '0d6a3c58b1e7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('question', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('position', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    # Native DROP COLUMN (SQLite 3.35+): a batch table rebuild would drop the FTS triggers on question
+    op.drop_column('question', 'position')
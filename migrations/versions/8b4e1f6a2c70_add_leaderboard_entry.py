@@ -0,0 +1,52 @@
+"""Add leaderboard_entry table
+
+Revision ID: 8b4e1f6a2c70
+Revises: 6f2d9c4e8a13
+Create Date: 2026-10-18 21:40:03.518227
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b4e1f6a2c70'
+down_revision = '6f2d9c4e8a13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('leaderboard_entry',
+    sa.Column('scope', sa.String(length=10), nullable=False),
+    sa.Column('scope_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('scope', 'scope_id', 'user_id')
+    )
+    with op.batch_alter_table('leaderboard_entry', schema=None) as batch_op:
+        batch_op.create_index('ix_leaderboard_entry_scope_score', ['scope', 'scope_id', 'score'], unique=False)
+
+    # Backfill: best score per quiz, then sums of those per chapter and per subject
+    op.execute(
+        "INSERT INTO leaderboard_entry (scope, scope_id, user_id, score) "
+        "SELECT 'quiz', quiz_id, user_id, MAX(score) FROM user_score GROUP BY quiz_id, user_id"
+    )
+    op.execute(
+        "INSERT INTO leaderboard_entry (scope, scope_id, user_id, score) "
+        "SELECT 'chapter', quiz.chapter_id, e.user_id, SUM(e.score) FROM leaderboard_entry e "
+        "JOIN quiz ON quiz.id = e.scope_id WHERE e.scope = 'quiz' GROUP BY quiz.chapter_id, e.user_id"
+    )
+    op.execute(
+        "INSERT INTO leaderboard_entry (scope, scope_id, user_id, score) "
+        "SELECT 'subject', chapter.subject_id, e.user_id, SUM(e.score) FROM leaderboard_entry e "
+        "JOIN chapter ON chapter.id = e.scope_id WHERE e.scope = 'chapter' GROUP BY chapter.subject_id, e.user_id"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('leaderboard_entry', schema=None) as batch_op:
+        batch_op.drop_index('ix_leaderboard_entry_scope_score')
+
+    op.drop_table('leaderboard_entry')
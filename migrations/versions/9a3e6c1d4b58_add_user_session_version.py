@@ -0,0 +1,26 @@
+"""Add user.session_version for revoking cached sessions
+
+Revision ID: 9a3e6c1d4b58
+Revises: 4d8f0b2e6a91
+Create Date: 2026-10-19 10:12:47.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a3e6c1d4b58'
+down_revision = '4d8f0b2e6a91'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('session_version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    # Native DROP COLUMN (SQLite 3.35+): a batch table rebuild would drop the FTS triggers on user
+    op.drop_column('user', 'session_version')
@@ -0,0 +1,26 @@
+"""Add keyset index for the admin scores table
+
+Revision ID: a41e7c0d92b5
+Revises: 3f1c9a2be4d0
+Create Date: 2026-10-18 10:02:17.554120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a41e7c0d92b5'
+down_revision = '3f1c9a2be4d0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user_score', schema=None) as batch_op:
+        batch_op.create_index('ix_user_score_date_taken_id', ['date_taken', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('user_score', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_score_date_taken_id')
@@ -0,0 +1,99 @@
+"""Cascade deletes through foreign keys; add subject, chapter and quiz tombstones
+
+Revision ID: b7c2e4f91a36
+Revises: 9a3e6c1d4b58
+Create Date: 2026-10-19 14:36:08.552170
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7c2e4f91a36'
+down_revision = '9a3e6c1d4b58'
+branch_labels = None
+depends_on = None
+
+# The existing foreign keys are unnamed; batch mode names them by this convention
+NAMING = {'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s'}
+
+# child table -> (column, parent table) for each of its foreign keys
+FOREIGN_KEYS = {
+    'chapter': [('subject_id', 'subject')],
+    'quiz': [('chapter_id', 'chapter')],
+    'question': [('quiz_id', 'quiz')],
+    'score': [('quiz_id', 'quiz'), ('user_id', 'user')],
+    'user_score': [('user_id', 'user'), ('quiz_id', 'quiz')],
+    'quiz_score_stats': [('quiz_id', 'quiz')],
+    'leaderboard_entry': [('user_id', 'user')],
+    'quiz_attempt': [('user_id', 'user'), ('quiz_id', 'quiz')],
+    'attempt_answer': [('attempt_id', 'quiz_attempt')],
+}
+
+TOMBSTONED = ('subject', 'chapter', 'quiz')
+
+# Child columns without an index: every parent row deleted would scan the child table
+# for its foreign key check
+INDEXES = {
+    'ix_quiz_attempt_quiz_id': ('quiz_attempt', ['quiz_id']),
+    'ix_leaderboard_entry_user_id': ('leaderboard_entry', ['user_id']),
+    'ix_score_quiz_id': ('score', ['quiz_id']),
+    'ix_score_user_id': ('score', ['user_id']),
+}
+
+# A table rebuild drops the table's triggers, so the FTS5 sync triggers on quiz and
+# question (see 0d6a3c58b1e7) are created again afterwards
+SEARCH_TRIGGERS = {
+    'quiz': ('search_quizzes', ('title', 'remarks')),
+    'question': ('search_questions', ('question_text', 'option_1', 'option_2', 'option_3', 'option_4')),
+}
+
+
+def create_search_triggers():
+    for table, (fts, columns) in SEARCH_TRIGGERS.items():
+        cols = ', '.join(columns)
+        new_values = ', '.join(f'new.{c}' for c in columns)
+        old_values = ', '.join(f'old.{c}' for c in columns)
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON \"{table}\" BEGIN "
+            f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values}); END"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON \"{table}\" BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); END"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON \"{table}\" BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); "
+            f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values}); END"
+        )
+
+
+# SQLite can't alter a foreign key in place: every child table is rebuilt. migrations/env.py
+# turns foreign key enforcement off first, so dropping the old tables cascades nowhere.
+def recreate_foreign_keys(ondelete):
+    for table, keys in FOREIGN_KEYS.items():
+        with op.batch_alter_table(table, recreate='always', naming_convention=NAMING) as batch_op:
+            for column, parent in keys:
+                name = f'fk_{table}_{column}_{parent}'
+                batch_op.drop_constraint(name, type_='foreignkey')
+                batch_op.create_foreign_key(name, parent, [column], ['id'], ondelete=ondelete)
+    create_search_triggers()
+
+
+def upgrade():
+    recreate_foreign_keys('CASCADE')
+    for table in TOMBSTONED:
+        op.add_column(table, sa.Column('deleted_at', sa.DateTime(), nullable=True))
+    for name, (table, columns) in INDEXES.items():
+        op.create_index(name, table, columns, unique=False)
+
+
+def downgrade():
+    for name, (table, columns) in INDEXES.items():
+        op.drop_index(name, table_name=table)
+    # Native DROP COLUMN (SQLite 3.35+) before the rebuild, which recreates the triggers
+    for table in TOMBSTONED:
+        op.drop_column(table, 'deleted_at')
+    recreate_foreign_keys(None)
@@ -0,0 +1,26 @@
+"""Add quiz content_version for cache invalidation
+
+Revision ID: c27d5f81e3a9
+Revises: a41e7c0d92b5
+Create Date: 2026-10-18 10:48:55.102937
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c27d5f81e3a9'
+down_revision = 'a41e7c0d92b5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('quiz', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('content_version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('quiz', schema=None) as batch_op:
+        batch_op.drop_column('content_version')
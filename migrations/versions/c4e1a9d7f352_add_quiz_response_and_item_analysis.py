@@ -0,0 +1,59 @@
+"""Add quiz_response and item_analysis tables
+
+Revision ID: c4e1a9d7f352
+Revises: b7c2e4f91a36
+Create Date: 2026-10-19 17:21:44.906318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e1a9d7f352'
+down_revision = 'b7c2e4f91a36'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('quiz_response',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('quiz_id', sa.Integer(), nullable=False),
+    sa.Column('quiz_version', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('options', sa.LargeBinary(), nullable=False),
+    sa.Column('score', sa.Integer(), nullable=False),
+    sa.Column('submitted_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['quiz_id'], ['quiz.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('quiz_response', schema=None) as batch_op:
+        batch_op.create_index('ix_quiz_response_quiz_id_quiz_version_id', ['quiz_id', 'quiz_version', 'id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_quiz_response_user_id'), ['user_id'], unique=False)
+
+    op.create_table('item_analysis',
+    sa.Column('quiz_id', sa.Integer(), nullable=False),
+    sa.Column('quiz_version', sa.Integer(), nullable=False),
+    sa.Column('question_ids', sa.LargeBinary(), nullable=False),
+    sa.Column('answer_key', sa.LargeBinary(), nullable=False),
+    sa.Column('responses', sa.Integer(), nullable=False),
+    sa.Column('last_response_id', sa.Integer(), nullable=False),
+    sa.Column('total_sum', sa.Integer(), nullable=False),
+    sa.Column('total_squares', sa.Integer(), nullable=False),
+    sa.Column('choice_counts', sa.LargeBinary(), nullable=True),
+    sa.Column('correct_totals', sa.LargeBinary(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['quiz_id'], ['quiz.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('quiz_id', 'quiz_version')
+    )
+
+
+def downgrade():
+    op.drop_table('item_analysis')
+    with op.batch_alter_table('quiz_response', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_quiz_response_user_id'))
+        batch_op.drop_index('ix_quiz_response_quiz_id_quiz_version_id')
+
+    op.drop_table('quiz_response')
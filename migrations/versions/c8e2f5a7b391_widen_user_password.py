@@ -0,0 +1,54 @@
+"""Widen user.password for scrypt and high-iteration pbkdf2 hashes
+
+Revision ID: c8e2f5a7b391
+Revises: a7c3e9f15d62
+Create Date: 2026-10-20 14:26:51.407318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8e2f5a7b391'
+down_revision = 'a7c3e9f15d62'
+branch_labels = None
+depends_on = None
+
+# The SQLite rebuild drops the table's triggers: the FTS5 sync triggers on user
+# (see 0d6a3c58b1e7) are created again afterwards
+FTS = 'search_users'
+COLUMNS = ('full_name', 'email')
+
+
+def create_search_triggers():
+    cols = ', '.join(COLUMNS)
+    new_values = ', '.join(f'new.{c}' for c in COLUMNS)
+    old_values = ', '.join(f'old.{c}' for c in COLUMNS)
+    op.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {FTS}_ai AFTER INSERT ON \"user\" BEGIN "
+        f"INSERT INTO {FTS}(rowid, {cols}) VALUES (new.id, {new_values}); END"
+    )
+    op.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {FTS}_ad AFTER DELETE ON \"user\" BEGIN "
+        f"INSERT INTO {FTS}({FTS}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); END"
+    )
+    op.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {FTS}_au AFTER UPDATE OF {cols} ON \"user\" BEGIN "
+        f"INSERT INTO {FTS}({FTS}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {FTS}(rowid, {cols}) VALUES (new.id, {new_values}); END"
+    )
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.alter_column('password', existing_type=sa.String(length=150), type_=sa.String(length=255),
+                              existing_nullable=False)
+    create_search_triggers()
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.alter_column('password', existing_type=sa.String(length=255), type_=sa.String(length=150),
+                              existing_nullable=False)
+    create_search_triggers()
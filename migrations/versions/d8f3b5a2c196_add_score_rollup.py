@@ -0,0 +1,60 @@
+"""Add score_rollup table
+
+Revision ID: d8f3b5a2c196
+Revises: c4e1a9d7f352
+Create Date: 2026-10-19 20:05:12.331847
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8f3b5a2c196'
+down_revision = 'c4e1a9d7f352'
+branch_labels = None
+depends_on = None
+
+SCOPE_COLUMNS = {
+    'quiz': 'user_score.quiz_id',
+    'chapter': 'quiz.chapter_id',
+    'subject': 'chapter.subject_id',
+    'user': 'user_score.user_id',
+}
+# UTC day, and the Monday of its week
+BUCKETS = {
+    'day': "date(user_score.date_taken)",
+    'week': "date(user_score.date_taken, 'weekday 0', '-6 days')",
+}
+
+
+def upgrade():
+    op.create_table('score_rollup',
+    sa.Column('scope', sa.String(length=10), nullable=False),
+    sa.Column('scope_id', sa.Integer(), nullable=False),
+    sa.Column('period', sa.String(length=4), nullable=False),
+    sa.Column('bucket', sa.Date(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.Column('sum_squares', sa.Integer(), nullable=False),
+    sa.Column('min_score', sa.Integer(), nullable=True),
+    sa.Column('max_score', sa.Integer(), nullable=True),
+    sa.PrimaryKeyConstraint('scope', 'scope_id', 'period', 'bucket')
+    )
+
+    # Backfill from the existing scores, one pass per scope and period
+    for scope, column in SCOPE_COLUMNS.items():
+        for period, bucket in BUCKETS.items():
+            op.execute(
+                "INSERT INTO score_rollup (scope, scope_id, period, bucket, attempts, total, sum_squares, "
+                "min_score, max_score) "
+                f"SELECT '{scope}', {column}, '{period}', {bucket}, COUNT(*), SUM(user_score.score), "
+                "SUM(user_score.score * user_score.score), MIN(user_score.score), MAX(user_score.score) "
+                "FROM user_score JOIN quiz ON quiz.id = user_score.quiz_id "
+                "JOIN chapter ON chapter.id = quiz.chapter_id "
+                f"WHERE user_score.date_taken IS NOT NULL GROUP BY {column}, {bucket}"
+            )
+
+
+def downgrade():
+    op.drop_table('score_rollup')
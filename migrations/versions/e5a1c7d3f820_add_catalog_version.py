@@ -0,0 +1,29 @@
+"""Add catalog_version table
+
+Revision ID: e5a1c7d3f820
+Revises: d8f3b5a2c196
+Create Date: 2026-10-19 22:48:30.174502
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a1c7d3f820'
+down_revision = 'd8f3b5a2c196'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('catalog_version',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute("INSERT INTO catalog_version (id, version) VALUES (1, 1)")
+
+
+def downgrade():
+    op.drop_table('catalog_version')
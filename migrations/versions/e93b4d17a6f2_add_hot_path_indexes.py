@@ -0,0 +1,50 @@
+"""Add indexes for hot foreign-key lookups
+
+Revision ID: e93b4d17a6f2
+Revises: 5b8e2a9f07c4
+Create Date: 2026-10-18 12:20:44.871305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e93b4d17a6f2'
+down_revision = '5b8e2a9f07c4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user_score', schema=None) as batch_op:
+        batch_op.create_index('ix_user_score_quiz_id_score', ['quiz_id', 'score'], unique=False)
+        batch_op.create_index('ix_user_score_user_id_quiz_id_score', ['user_id', 'quiz_id', 'score'], unique=False)
+        batch_op.create_index('ix_user_score_user_id_date_taken', ['user_id', 'date_taken'], unique=False)
+
+    with op.batch_alter_table('question', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_question_quiz_id'), ['quiz_id'], unique=False)
+
+    with op.batch_alter_table('chapter', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_chapter_subject_id'), ['subject_id'], unique=False)
+
+    with op.batch_alter_table('quiz', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_quiz_chapter_id'), ['chapter_id'], unique=False)
+
+    op.execute('ANALYZE')
+
+
+def downgrade():
+    with op.batch_alter_table('quiz', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_quiz_chapter_id'))
+
+    with op.batch_alter_table('chapter', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_chapter_subject_id'))
+
+    with op.batch_alter_table('question', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_question_quiz_id'))
+
+    with op.batch_alter_table('user_score', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_score_user_id_date_taken')
+        batch_op.drop_index('ix_user_score_user_id_quiz_id_score')
+        batch_op.drop_index('ix_user_score_quiz_id_score')
@@ -0,0 +1,30 @@
+"""Add quiz_payload table
+
+Revision ID: f2b8d4c6a913
+Revises: e5a1c7d3f820
+Create Date: 2026-10-20 09:12:44.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2b8d4c6a913'
+down_revision = 'e5a1c7d3f820'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('quiz_payload',
+    sa.Column('quiz_id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('body', sa.LargeBinary(), nullable=False),
+    sa.ForeignKeyConstraint(['quiz_id'], ['quiz.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('quiz_id', 'version')
+    )
+
+
+def downgrade():
+    op.drop_table('quiz_payload')
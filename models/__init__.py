@@ -8,4 +8,11 @@ from .user import User
 from .quiz import Subject
 from .quiz import Chapter
 from .quiz import Quiz
-from .quiz import Question
\ No newline at end of file
+from .quiz import Question
+from .quiz_stats import QuizScoreStats
+from .leaderboard import LeaderboardEntry
+from .attempt import QuizAttempt, AttemptAnswer, QuizPayload
+from .analysis import QuizResponse, ItemAnalysis
+from .rollup import ScoreRollup
+from .catalog import CatalogVersion
+from .import_job import ImportJob
@@ -0,0 +1,42 @@
+from models import db
+
+class QuizResponse(db.Model):
+    # The answers of one graded attempt (see services/item_analysis.py): one int8 option
+    # index per question, in the frozen order of ItemAnalysis.question_ids for that version
+    __tablename__ = 'quiz_response'
+
+    id = db.Column(db.Integer, primary_key=True)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id', ondelete='CASCADE'), nullable=False)
+    quiz_version = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False, index=True)
+    options = db.Column(db.LargeBinary, nullable=False)  # Packed int8, -1 when unanswered
+    score = db.Column(db.Integer, nullable=False)
+    submitted_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_quiz_response_quiz_id_quiz_version_id', 'quiz_id', 'quiz_version', 'id'),  # Incremental refresh
+    )
+
+    def __repr__(self):
+        return f"<QuizResponse {self.id} quiz={self.quiz_id} v{self.quiz_version} user={self.user_id}>"
+
+
+class ItemAnalysis(db.Model):
+    # Answer key and running sums of one quiz version's responses; every item statistic
+    # is derived from these, so new responses are folded in without rereading old ones
+    __tablename__ = 'item_analysis'
+
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id', ondelete='CASCADE'), primary_key=True)
+    quiz_version = db.Column(db.Integer, primary_key=True)
+    question_ids = db.Column(db.LargeBinary, nullable=False)  # Frozen order, packed int64
+    answer_key = db.Column(db.LargeBinary, nullable=False)  # Correct option index per question, packed int8
+    responses = db.Column(db.Integer, nullable=False, default=0)
+    last_response_id = db.Column(db.Integer, nullable=False, default=0)  # Highest QuizResponse.id folded in
+    total_sum = db.Column(db.Integer, nullable=False, default=0)  # Sum of scores
+    total_squares = db.Column(db.Integer, nullable=False, default=0)  # Sum of score^2
+    choice_counts = db.Column(db.LargeBinary)  # int64 (questions x 5): unanswered, then options 1-4
+    correct_totals = db.Column(db.LargeBinary)  # int64 per question: sum of scores of responses that got it right
+    updated_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f"<ItemAnalysis quiz={self.quiz_id} v{self.quiz_version} responses={self.responses}>"
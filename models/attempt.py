@@ -0,0 +1,48 @@
+from models import db
+
+class QuizAttempt(db.Model):
+    # Server-side quiz session, opened when a student starts a quiz (see services/attempts.py)
+    __tablename__ = 'quiz_attempt'
+
+    id = db.Column(db.String(32), primary_key=True)  # Unguessable token posted back with the answers
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id', ondelete='CASCADE'), nullable=False)
+    quiz_version = db.Column(db.Integer, nullable=False)  # Quiz.content_version the key was frozen at
+    question_ids = db.Column(db.LargeBinary, nullable=False)  # Frozen order, packed int64
+    answer_key = db.Column(db.LargeBinary, nullable=False)  # Correct option index per question, packed int8
+    started_at = db.Column(db.DateTime, nullable=False)
+    deadline = db.Column(db.DateTime)  # NULL when the quiz has no time limit
+    status = db.Column(db.String(10), nullable=False, default='open')  # "open", "submitted" or "expired"
+    finished_at = db.Column(db.DateTime)
+    score = db.Column(db.Integer)
+
+    __table_args__ = (
+        db.Index('ix_quiz_attempt_user_id_quiz_id_status', 'user_id', 'quiz_id', 'status'),  # Resume lookup
+        db.Index('ix_quiz_attempt_status_deadline', 'status', 'deadline'),  # Sweeper
+        db.Index('ix_quiz_attempt_quiz_id', 'quiz_id'),  # Quiz deletes and their foreign key checks
+    )
+
+    def __repr__(self):
+        return f"<QuizAttempt {self.id} user={self.user_id} quiz={self.quiz_id} {self.status}>"
+
+
+class QuizPayload(db.Model):
+    # Exam-taker view (questions and options, no answers) of one quiz version, frozen when the
+    # first attempt at that version opens, so attempts keep showing what they are graded against
+    __tablename__ = 'quiz_payload'
+
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id', ondelete='CASCADE'), primary_key=True)
+    version = db.Column(db.Integer, primary_key=True)
+    body = db.Column(db.LargeBinary, nullable=False)  # UTF-8 JSON, see services/quiz_payloads.py
+
+    def __repr__(self):
+        return f"<QuizPayload quiz={self.quiz_id} v{self.version}>"
+
+
+class AttemptAnswer(db.Model):
+    # Autosaved answer for one question of an open attempt (see services/answer_log.py)
+    __tablename__ = 'attempt_answer'
+
+    attempt_id = db.Column(db.String(32), db.ForeignKey('quiz_attempt.id', ondelete='CASCADE'), primary_key=True)
+    position = db.Column(db.Integer, primary_key=True)  # Index into the attempt's frozen question order
+    option = db.Column(db.Integer, nullable=False)  # 0-based option index, -1 when cleared
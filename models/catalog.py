@@ -0,0 +1,12 @@
+from models import db
+
+class CatalogVersion(db.Model):
+    # Single row (id 1): bumped in the same transaction as every subject, chapter or quiz
+    # change, so each worker knows when its cached catalog is stale (see services/catalog.py)
+    __tablename__ = 'catalog_version'
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=1)
+
+    def __repr__(self):
+        return f"<CatalogVersion {self.version}>"
@@ -0,0 +1,15 @@
+from models import db
+
+class ImportJob(db.Model):
+    # Progress of a background question-bank import (see services/question_bank.py), kept in
+    # the database so any worker can answer the poll
+    __tablename__ = 'import_job'
+
+    id = db.Column(db.String(32), primary_key=True)
+    status = db.Column(db.String(10), nullable=False)  # "running", "finished" or "failed"
+    report = db.Column(db.Text, nullable=False)  # ImportReport.to_dict() as JSON
+    created_at = db.Column(db.DateTime, nullable=False, index=True)
+    updated_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<ImportJob {self.id} {self.status}>"
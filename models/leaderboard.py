@@ -0,0 +1,21 @@
+from models import db
+
+SCOPES = ('quiz', 'chapter', 'subject')
+
+class LeaderboardEntry(db.Model):
+    # A user's standing in one leaderboard (see services/leaderboard.py): their best score
+    # for a quiz, or the sum of their best quiz scores across a chapter or subject
+    __tablename__ = 'leaderboard_entry'
+
+    scope = db.Column(db.String(10), primary_key=True)  # "quiz", "chapter" or "subject"
+    scope_id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    score = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_leaderboard_entry_scope_score', 'scope', 'scope_id', 'score'),  # Board load in rank order
+        db.Index('ix_leaderboard_entry_user_id', 'user_id'),  # User deletes and their foreign key checks
+    )
+
+    def __repr__(self):
+        return f"<LeaderboardEntry {self.scope}:{self.scope_id} user={self.user_id} score={self.score}>"
@@ -4,37 +4,45 @@ class Subject(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False, unique=True)
     description = db.Column(db.Text)  # New field
-    chapters = db.relationship('Chapter', backref='subject', lazy=True)  # Relationship
+    deleted_at = db.Column(db.DateTime)  # Tombstone, set by a soft delete (see services/deletion.py)
+    chapters = db.relationship('Chapter', backref='subject', lazy=True, passive_deletes=True)  # Relationship
 
 class Chapter(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text)  # New field
-    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'), nullable=False)
-    quizzes = db.relationship('Quiz', backref='chapter', lazy=True)  # Relationship
+    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id', ondelete='CASCADE'), nullable=False, index=True)
+    deleted_at = db.Column(db.DateTime)
+    quizzes = db.relationship('Quiz', backref='chapter', lazy=True, passive_deletes=True)  # Relationship
 
 class Quiz(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
-    chapter_id = db.Column(db.Integer, db.ForeignKey('chapter.id'), nullable=False)
+    chapter_id = db.Column(db.Integer, db.ForeignKey('chapter.id', ondelete='CASCADE'), nullable=False, index=True)
     date_of_quiz = db.Column(db.Date)  # New field
     time_duration = db.Column(db.Time, nullable=True)  # Time in minutes
     remarks = db.Column(db.Text)  # New field
-    questions = db.relationship('Question', backref='quiz', lazy=True)  # Relationship
+    content_version = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # Bumped on every content edit
+    deleted_at = db.Column(db.DateTime)
+    questions = db.relationship('Question', backref='quiz', lazy=True, passive_deletes=True)  # Relationship
 
 class Question(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), nullable=False)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id', ondelete='CASCADE'), nullable=False, index=True)
     question_text = db.Column(db.Text, nullable=False)
     option_1 = db.Column(db.String(200), nullable=False)
     option_2 = db.Column(db.String(200), nullable=False)
     option_3 = db.Column(db.String(200), nullable=False)
     option_4 = db.Column(db.String(200), nullable=False)
     correct_answer = db.Column(db.Integer, nullable=False) 
+    position = db.Column(db.Integer)  # Display order within the quiz; NULL until the quiz is reordered
+
+# Display order: explicitly positioned questions first, then the rest in insertion order
+QUESTION_ORDER = (Question.position.asc().nullslast(), Question.id)
 
 class Score(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id', ondelete='CASCADE'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False, index=True)
     time_stamp = db.Column(db.DateTime, default=db.func.current_timestamp())
     total_score = db.Column(db.Integer, nullable=False)
@@ -0,0 +1,28 @@
+from models import db
+
+class QuizScoreStats(db.Model):
+    # One row per quiz, maintained alongside UserScore writes (see services/score_stats.py)
+    __tablename__ = 'quiz_score_stats'
+
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id', ondelete='CASCADE'), primary_key=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    sum_squares = db.Column(db.Integer, nullable=False, default=0)  # Running sum of score^2
+    min_score = db.Column(db.Integer)
+    max_score = db.Column(db.Integer)
+
+    quiz = db.relationship('Quiz', backref=db.backref('score_stats', uselist=False, passive_deletes=True))
+
+    @property
+    def average(self):
+        return self.total / self.attempts if self.attempts else 0
+
+    @property
+    def variance(self):
+        if not self.attempts:
+            return 0
+        mean = self.average
+        return max(self.sum_squares / self.attempts - mean * mean, 0)
+
+    def __repr__(self):
+        return f"<QuizScoreStats quiz={self.quiz_id} attempts={self.attempts}>"
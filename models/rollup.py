@@ -0,0 +1,22 @@
+from models import db
+
+SCOPES = ('quiz', 'chapter', 'subject', 'user')
+PERIODS = ('day', 'week')
+
+class ScoreRollup(db.Model):
+    # Score aggregates of one quiz, chapter, subject or user over one UTC day or week
+    # (Monday to Sunday), maintained alongside UserScore writes (see services/score_rollups.py)
+    __tablename__ = 'score_rollup'
+
+    scope = db.Column(db.String(10), primary_key=True)  # "quiz", "chapter", "subject" or "user"
+    scope_id = db.Column(db.Integer, primary_key=True)
+    period = db.Column(db.String(4), primary_key=True)  # "day" or "week"
+    bucket = db.Column(db.Date, primary_key=True)  # The day, or the Monday of the week
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    sum_squares = db.Column(db.Integer, nullable=False, default=0)  # Running sum of score^2
+    min_score = db.Column(db.Integer)
+    max_score = db.Column(db.Integer)
+
+    def __repr__(self):
+        return f"<ScoreRollup {self.scope}:{self.scope_id} {self.period} {self.bucket} attempts={self.attempts}>"
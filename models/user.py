@@ -4,11 +4,12 @@ from flask_login import UserMixin
 class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(150), unique=True, nullable=False)
-    password = db.Column(db.String(150), nullable=False)
+    password = db.Column(db.String(255), nullable=False)  # Hash; scrypt ones run to ~160 characters
     full_name = db.Column(db.String(150), nullable=False)
     qualification = db.Column(db.String(150))
     dob = db.Column(db.Date)
     role = db.Column(db.String(10), nullable=False, default="user")  # "user" or "admin"
+    session_version = db.Column(db.Integer, nullable=False, default=1, server_default="1")  # Bumped to revoke sessions
 
 
     def __repr__(self):
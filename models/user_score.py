@@ -2,10 +2,18 @@ from models import db
 
 class UserScore(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), nullable=False)  # Added Quiz reference
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id', ondelete='CASCADE'), nullable=False)  # Added Quiz reference
     score = db.Column(db.Integer, nullable=False)
     date_taken = db.Column(db.DateTime, default=db.func.current_timestamp())
+    submission_id = db.Column(db.String(32), unique=True, index=True)  # Idempotency key for queued writes
 
-    user = db.relationship('User', backref='scores')
-    quiz = db.relationship('Quiz', backref='scores')  # Establish relationship with Quiz
+    user = db.relationship('User', backref=db.backref('scores', passive_deletes=True))
+    quiz = db.relationship('Quiz', backref=db.backref('scores', passive_deletes=True))  # Establish relationship with Quiz
+
+    __table_args__ = (
+        db.Index('ix_user_score_date_taken_id', 'date_taken', 'id'),  # Admin scores table sort key
+        db.Index('ix_user_score_quiz_id_score', 'quiz_id', 'score'),  # Per-quiz aggregates
+        db.Index('ix_user_score_user_id_quiz_id_score', 'user_id', 'quiz_id', 'score'),  # User's best per quiz
+        db.Index('ix_user_score_user_id_date_taken', 'user_id', 'date_taken'),  # User score history
+    )
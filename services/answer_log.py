@@ -0,0 +1,192 @@
+import atexit
+import logging
+import threading
+import time
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.exc import IntegrityError
+
+from models import db, AttemptAnswer, QuizAttempt
+from services.grading import option_index, UNANSWERED
+
+logger = logging.getLogger(__name__)
+
+
+class AutosaveTimeout(Exception):
+    """The deltas were not committed within AUTOSAVE_ACK_TIMEOUT; the client should resend them."""
+
+
+class AnswerLog:
+    """Group commit for autosaved answers.
+
+    Each autosave is a handful of (question, option) deltas. They are folded into
+    an in-memory map keyed by (attempt, position), so repeated changes to the same
+    question collapse to the latest value, and a background thread writes every
+    dirty entry as one executemany upsert, at most once per AUTOSAVE_FLUSH_INTERVAL.
+    record() returns only once its deltas are committed, so an acknowledged
+    autosave is visible to every worker (a submit may land on any of them). With
+    1,000 students saving every few seconds that is a few short write transactions
+    a second instead of hundreds. AUTOSAVE_FLUSH_INTERVAL = 0 writes each autosave
+    in its own request instead.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.flush_interval = 0.05
+        self.ack_timeout = 5.0
+        self._dirty = {}  # (attempt_id, position) -> option index
+        self._inflight = {}  # The batch being written, still visible to answers() until committed
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)  # New deltas, or a batch committed
+        self._writing = threading.Lock()  # One flush at a time, so batches commit in order
+        self._generation = 0  # Batch that _dirty will be written in
+        self._committed = -1  # Last batch written; rows of a failed batch move to the next one
+        self._thread = None
+        self.metrics = {'deltas': 0, 'flushes': 0, 'rows_flushed': 0, 'failures': 0, 'timeouts': 0,
+                        'last_flush_ms': 0.0, 'max_flush_ms': 0.0}
+
+    def init_app(self, app):
+        self.app = app
+        self.flush_interval = app.config.get('AUTOSAVE_FLUSH_INTERVAL', self.flush_interval)
+        self.ack_timeout = app.config.get('AUTOSAVE_ACK_TIMEOUT', self.ack_timeout)
+        app.extensions['answer_log'] = self
+
+    # answers: iterable of (question_id, option) with option "1".."4"/"option_N", or None to clear.
+    # Returns the number of deltas saved once they are committed; unknown questions raise
+    # ValueError, a write that does not go through in time AutosaveTimeout.
+    def record(self, attempt, answers):
+        deltas = {}
+        for question_id, value in answers:
+            try:
+                position = attempt.answer_key.positions[int(question_id)]
+            except (KeyError, TypeError, ValueError):
+                raise ValueError(f'Question {question_id!r} is not part of this attempt')
+            deltas[(attempt.id, position)] = UNANSWERED if value is None else option_index(value)
+        with self._lock:
+            self._dirty.update(deltas)
+            self.metrics['deltas'] += len(deltas)
+            ticket = self._generation
+            self._changed.notify_all()
+        if not self.flush_interval:
+            self.flush()
+        else:
+            self._start()
+        with self._lock:
+            if not self._changed.wait_for(lambda: self._committed >= ticket, self.ack_timeout):
+                self.metrics['timeouts'] += 1
+                raise AutosaveTimeout()
+        return len(deltas)
+
+    def _start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='answer-log', daemon=True)
+            self._thread.start()
+            atexit.register(self._flush_on_exit)
+
+    def _flush_on_exit(self):
+        with self.app.app_context():
+            self.flush()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                self._changed.wait_for(lambda: self._dirty)
+            time.sleep(self.flush_interval)  # Let the batch fill up
+            failures = self.metrics['failures']
+            with self.app.app_context():
+                self.flush()
+            if self.metrics['failures'] > failures:
+                time.sleep(1)
+
+    def flush(self):
+        with self._writing:
+            return self._flush()
+
+    def _flush(self):
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            self._inflight = dirty
+            generation = self._generation
+            self._generation += 1
+        if not dirty:
+            with self._lock:
+                self._committed = max(self._committed, generation)
+                self._changed.notify_all()
+            return 0
+        start = time.perf_counter()
+        try:
+            stmt = insert(AttemptAnswer)
+            db.session.execute(
+                stmt.on_conflict_do_update(index_elements=['attempt_id', 'position'],
+                                           set_={'option': stmt.excluded.option}),
+                [{'attempt_id': attempt_id, 'position': position, 'option': option}
+                 for (attempt_id, position), option in dirty.items()]
+            )
+            db.session.commit()
+        except Exception as exc:
+            db.session.rollback()
+            if isinstance(exc, IntegrityError):
+                # Attempts deleted along with their quiz or user: their answers can't be written
+                live = set(db.session.scalars(
+                    select(QuizAttempt.id).where(QuizAttempt.id.in_({attempt_id for attempt_id, _ in dirty}))))
+                dirty = {key: option for key, option in dirty.items() if key[0] in live}
+            logger.exception("Flushing %d autosaved answers failed; will retry", len(dirty))
+            with self._lock:
+                # Keep anything newer that arrived while the flush was failing
+                self._dirty = {**dirty, **self._dirty}
+                self._inflight = {}
+                self.metrics['failures'] += 1
+            return 0
+        elapsed = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self._inflight = {}
+            self._committed = max(self._committed, generation)
+            self._changed.notify_all()
+            self.metrics['flushes'] += 1
+            self.metrics['rows_flushed'] += len(dirty)
+            self.metrics['last_flush_ms'] = elapsed
+            self.metrics['max_flush_ms'] = max(self.metrics['max_flush_ms'], elapsed)
+        return len(dirty)
+
+    # The attempt's answers in frozen question order: flushed rows overlaid with buffered deltas
+    def answers(self, attempt):
+        row = np.full(len(attempt.answer_key.correct), UNANSWERED, dtype=np.int8)
+        for position, option in db.session.execute(
+                select(AttemptAnswer.position, AttemptAnswer.option).where(AttemptAnswer.attempt_id == attempt.id)):
+            if 0 <= position < len(row):
+                row[position] = option
+        with self._lock:
+            for pending in (self._inflight, self._dirty):
+                for (attempt_id, position), option in pending.items():
+                    if attempt_id == attempt.id and 0 <= position < len(row):
+                        row[position] = option
+        return row
+
+    # Saved answers as {question_id: option number} for re-rendering a resumed attempt
+    def saved_options(self, attempt):
+        row = self.answers(attempt)
+        return {int(question_id): int(option) + 1
+                for question_id, option in zip(attempt.answer_key.question_ids, row) if option != UNANSWERED}
+
+    # Drops the buffered deltas of closed attempts
+    def discard(self, attempt_ids):
+        attempt_ids = set(attempt_ids)
+        if not attempt_ids:
+            return
+        with self._lock:
+            self._dirty = {key: option for key, option in self._dirty.items() if key[0] not in attempt_ids}
+
+    def stats(self):
+        with self._lock:
+            metrics = dict(self.metrics)
+            metrics['buffered'] = len(self._dirty)
+        return metrics
+
+
+answer_log = AnswerLog()
@@ -0,0 +1,175 @@
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+
+from flask import abort, request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:  # Optional: without it only gzip variants are built
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+ONE_YEAR = 365 * 24 * 3600
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt', '.map')
+MIN_COMPRESS_BYTES = 512
+
+# Third-party files served from static/ so pages work without internet access.
+# Fetch (or update) them with `flask --app app vendor-assets` and commit the result.
+# name -> (pinned release URL, sha256 of its content). Until a file is committed under
+# static/, asset_url() links the CDN copy instead, and where that doesn't load either the
+# dashboards fall back to static/js/chart-lite.js, which draws their bar and line charts.
+# A None digest is not checked: pin the one `vendor-assets` prints when committing the file.
+VENDORED = {
+    'vendor/chart.umd.js': ('https://cdn.jsdelivr.net/npm/chart.js@4.4.4/dist/chart.umd.js', None),
+}
+
+CSS_URL = re.compile(r'''url\(\s*(['"]?)(?!data:|https?:|//|/)([^'")]+)\1\s*\)''')
+
+
+def fingerprinted(name, content):
+    root, ext = os.path.splitext(name)
+    return f'{root}.{hashlib.sha256(content).hexdigest()[:12]}{ext}'
+
+
+class AssetPipeline:
+    """Fingerprinted static files.
+
+    At startup every file under static/ is copied to ASSETS_DIR as
+    name.<content hash>.ext (CSS url() references are rewritten to the hashed
+    names first), with .gz and, when the brotli package is installed, .br
+    variants next to it. Templates link them through asset_url(), and since a
+    hashed URL never changes content they are served with a one-year immutable
+    Cache-Control. Unknown names fall back to the plain /static URL.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.output_dir = None
+        self.max_age = ONE_YEAR
+        self.manifest = {}  # logical name -> fingerprinted name
+        self.encodings = {}  # fingerprinted name -> precompressed variants, best first
+        self.version = None  # Digest of the manifest; changes whenever any asset does
+
+    def init_app(self, app):
+        self.app = app
+        self.output_dir = app.config.get('ASSETS_DIR') or os.path.join(app.instance_path, 'assets')
+        self.max_age = app.config.get('ASSETS_MAX_AGE', self.max_age)
+        app.extensions['assets'] = self
+        app.add_url_rule('/assets/<path:filename>', 'assets', self.serve)
+        app.add_template_global(self.url, 'asset_url')
+        self.build()
+
+    def build(self):
+        static = self.app.static_folder
+        names = sorted(
+            os.path.relpath(os.path.join(root, filename), static).replace(os.sep, '/')
+            for root, _, files in os.walk(static) for filename in files if not filename.startswith('.')
+        )
+        for name in VENDORED:
+            if name not in names:
+                logger.info("Vendored asset %s is not in static/; linking %s", name, VENDORED[name][0])
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        manifest, encodings = {}, {}
+        # Stylesheets last, so the files they reference already have their hashed names
+        for name in sorted(names, key=lambda n: n.endswith('.css')):
+            with open(os.path.join(static, name), 'rb') as f:
+                content = f.read()
+            if name.endswith('.css'):
+                content = self._rewrite_css(name, content, manifest)
+            manifest[name] = fingerprinted(name, content)
+            encodings[manifest[name]] = self._write(manifest[name], content)
+
+        self.manifest = manifest
+        self.encodings = encodings
+        self.version = hashlib.sha256(repr(sorted(manifest.items())).encode()).hexdigest()[:12]
+        return manifest
+
+    def _rewrite_css(self, name, content, manifest):
+        base = os.path.dirname(name)
+
+        def replace(match):
+            target = os.path.normpath(os.path.join(base, match.group(2))).replace(os.sep, '/')
+            if target not in manifest:
+                return match.group(0)
+            # Hashed files share one flat tree, so the relative path stays valid
+            relative = os.path.relpath(manifest[target], base or '.').replace(os.sep, '/')
+            return f'url("{relative}")'
+
+        return CSS_URL.sub(replace, content.decode('utf-8')).encode('utf-8')
+
+    def _write(self, hashed, content):
+        path = os.path.join(self.output_dir, hashed)
+        variants = [(path, lambda: content)]
+        encodings = ()
+        if hashed.endswith(COMPRESSIBLE) and len(content) >= MIN_COMPRESS_BYTES:
+            variants.append((path + '.gz', lambda: gzip.compress(content, compresslevel=9, mtime=0)))
+            encodings = ('gzip',)
+            if brotli is not None:
+                variants.append((path + '.br', lambda: brotli.compress(content, quality=11)))
+                encodings = ('br', 'gzip')
+        for target, encode in variants:
+            if os.path.exists(target):
+                continue  # Same name means same content, so a restart compresses nothing
+            data = encode()
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            tmp = f'{target}.{os.getpid()}.tmp'
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, target)  # Atomic, so concurrent workers never see a torn file
+        return encodings
+
+    def url(self, name):
+        hashed = self.manifest.get(name)
+        if hashed is None:
+            if name in VENDORED:
+                return VENDORED[name][0]
+            return url_for('static', filename=name)
+        return url_for('assets', filename=hashed)
+
+    def serve(self, filename):
+        if filename not in self.encodings:
+            abort(404)
+        for encoding in self.encodings[filename]:
+            if request.accept_encodings[encoding] > 0:
+                suffix = '.br' if encoding == 'br' else '.gz'
+                response = send_from_directory(self.output_dir, filename + suffix, max_age=self.max_age)
+                response.content_encoding = encoding
+                # Type of the original file, not of the .br/.gz wrapper
+                response.mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+                break
+        else:
+            response = send_from_directory(self.output_dir, filename, max_age=self.max_age)
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        response.vary.add('Accept-Encoding')
+        return response
+
+    # Downloads vendored files that are missing from static/ and checks their pinned digests;
+    # returns the names fetched
+    def vendor(self, force=False):
+        import urllib.request  # Only this command needs it (it pulls in http.client and ssl)
+
+        fetched = []
+        for name, (source, sha256) in VENDORED.items():
+            path = os.path.join(self.app.static_folder, name)
+            if os.path.exists(path) and not force:
+                continue
+            with urllib.request.urlopen(source, timeout=30) as response:
+                content = response.read()
+            digest = hashlib.sha256(content).hexdigest()
+            if sha256 is not None and digest != sha256:
+                raise ValueError(f'{source} has sha256 {digest}, expected {sha256}')
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(content)
+            fetched.append((name, digest))
+        return fetched
+
+
+assets = AssetPipeline()
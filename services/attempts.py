@@ -0,0 +1,230 @@
+import logging
+import threading
+import time
+import uuid
+
+import numpy as np
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update, delete, or_, and_
+
+from models import db, Quiz, QuizAttempt, AttemptAnswer, QuizPayload
+from services import grading, item_analysis
+from services.answer_log import answer_log
+from services.quiz_payloads import quiz_payloads
+
+logger = logging.getLogger(__name__)
+
+Attempt = namedtuple('Attempt', 'id user_id quiz_id quiz_version answer_key started_at deadline')
+
+
+class AttemptError(Exception):
+    pass
+
+
+class AttemptNotFound(AttemptError):
+    pass
+
+
+class AttemptClosed(AttemptError):
+    pass
+
+
+class AttemptExpired(AttemptError):
+    pass
+
+
+class AttemptStore:
+    """Server-side quiz sessions.
+
+    Opening a quiz freezes its question order and answer key into a QuizAttempt
+    row (and a small in-process cache), so grading never touches the Question
+    table and the deadline is enforced from the server clock. Reloading the
+    page resumes the open attempt instead of restarting the timer. A sweeper
+    thread expires abandoned attempts and deletes finished ones after
+    ATTEMPT_RETENTION_HOURS.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.grace = timedelta(seconds=10)  # Network slack for the browser's auto-submit
+        self.untimed_max_age = timedelta(hours=24)
+        self.retention = timedelta(hours=24)
+        self.sweep_interval = 60
+        self.cache_size = 10000
+        self._cache = OrderedDict()  # attempt id -> Attempt, open attempts only
+        self._lock = threading.Lock()
+        self._sweeper = None
+
+    def init_app(self, app):
+        self.app = app
+        self.grace = timedelta(seconds=app.config.get('ATTEMPT_GRACE_SECONDS', 10))
+        self.untimed_max_age = timedelta(hours=app.config.get('ATTEMPT_UNTIMED_MAX_HOURS', 24))
+        self.retention = timedelta(hours=app.config.get('ATTEMPT_RETENTION_HOURS', 24))
+        self.sweep_interval = app.config.get('ATTEMPT_SWEEP_INTERVAL', self.sweep_interval)
+        self.cache_size = app.config.get('ATTEMPT_CACHE_SIZE', self.cache_size)
+        app.extensions['attempts'] = self
+
+    # Resumes the user's open attempt at this quiz, or starts one from the quiz snapshot.
+    # Caller commits.
+    def open(self, user_id, snapshot):
+        self._start_sweeper()
+        now = datetime.utcnow()
+        row = db.session.execute(
+            select(QuizAttempt).where(QuizAttempt.user_id == user_id, QuizAttempt.quiz_id == snapshot.id,
+                                      QuizAttempt.status == 'open')
+            .order_by(QuizAttempt.started_at.desc()).limit(1)
+        ).scalar()
+        if row is not None and not self._expired(row.started_at, row.deadline, now):
+            return self._remember(self._from_row(row))
+
+        question_ids, correct = grading.pack_key(snapshot.answer_key)
+        quiz_payloads.freeze(snapshot)  # The questions this key grades, whatever edits come later
+        deadline = now + timedelta(seconds=snapshot.total_seconds) if snapshot.total_seconds else None
+        attempt = Attempt(uuid.uuid4().hex, user_id, snapshot.id, snapshot.version,
+                          snapshot.answer_key, now, deadline)
+        db.session.execute(QuizAttempt.__table__.insert().values(
+            id=attempt.id, user_id=user_id, quiz_id=snapshot.id, quiz_version=snapshot.version,
+            question_ids=question_ids, answer_key=correct, started_at=now, deadline=deadline, status='open'
+        ))
+        return self._remember(attempt)
+
+    def get(self, attempt_id):
+        with self._lock:
+            attempt = self._cache.get(attempt_id)
+            if attempt is not None:
+                self._cache.move_to_end(attempt_id)
+                return attempt
+        row = db.session.get(QuizAttempt, attempt_id)
+        if row is None or row.status != 'open':
+            return None
+        return self._remember(self._from_row(row))
+
+    def remaining_seconds(self, attempt):
+        if attempt.deadline is None:
+            return None
+        return max(int((attempt.deadline - datetime.utcnow()).total_seconds()), 0)
+
+    # The user's open, unexpired attempt (of quiz_id, when given), or an AttemptError
+    def active(self, attempt_id, user_id, quiz_id=None):
+        attempt = self.get(attempt_id)
+        if attempt is None:
+            if db.session.get(QuizAttempt, attempt_id) is None:
+                raise AttemptNotFound(attempt_id)
+            raise AttemptClosed(attempt_id)
+        if attempt.user_id != user_id or (quiz_id is not None and attempt.quiz_id != quiz_id):
+            raise AttemptNotFound(attempt_id)
+        if self._expired(attempt.started_at, attempt.deadline, datetime.utcnow()):
+            raise AttemptExpired(attempt_id)
+        return attempt
+
+    # Grades the autosaved answer log, overlaid with the answers in the final form, against
+    # the frozen key, closes the attempt and stores the answers for item analysis.
+    # Caller commits (together with the score rows).
+    # Raises AttemptError subclasses for rejected submissions; an attempt of another quiz
+    # than quiz_id (when given) is not found and left untouched.
+    def submit(self, attempt_id, user_id, form, quiz_id=None):
+        now = datetime.utcnow()
+        try:
+            attempt = self.active(attempt_id, user_id, quiz_id)
+        except AttemptExpired:
+            self._close(attempt_id, 'expired', now)
+            self.forget(attempt_id)
+            answer_log.discard([attempt_id])
+            raise
+
+        submitted = grading.encode_form(attempt.answer_key, form)
+        answers = np.where(submitted != grading.UNANSWERED, submitted, answer_log.answers(attempt))
+        result = grading.grade(attempt.answer_key, answers)
+        # Conditional update, so a double submit (or a race with the sweeper) grades only once
+        closed = self._close(attempt.id, 'submitted', now, score=result.score)
+        self.forget(attempt.id)
+        answer_log.discard([attempt.id])
+        if not closed:
+            raise AttemptClosed(attempt_id)
+        item_analysis.record_response(attempt, answers, result.score, now)
+        return attempt, result
+
+    def _close(self, attempt_id, status, now, score=None):
+        closed = db.session.execute(
+            update(QuizAttempt).where(QuizAttempt.id == attempt_id, QuizAttempt.status == 'open')
+            .values(status=status, finished_at=now, score=score)
+            .execution_options(synchronize_session=False)
+        )
+        return closed.rowcount == 1
+
+    def _expired(self, started_at, deadline, now):
+        if deadline is None:
+            return now > started_at + self.untimed_max_age
+        return now > deadline + self.grace
+
+    def _from_row(self, row):
+        return Attempt(row.id, row.user_id, row.quiz_id, row.quiz_version,
+                       grading.unpack_key(row.question_ids, row.answer_key), row.started_at, row.deadline)
+
+    def _remember(self, attempt):
+        with self._lock:
+            self._cache[attempt.id] = attempt
+            self._cache.move_to_end(attempt.id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return attempt
+
+    def forget(self, attempt_id):
+        with self._lock:
+            self._cache.pop(attempt_id, None)
+
+    # Expires attempts past their deadline and deletes finished ones past retention; commits
+    def sweep(self):
+        now = datetime.utcnow()
+        expired = db.session.execute(
+            update(QuizAttempt).where(QuizAttempt.status == 'open', or_(
+                and_(QuizAttempt.deadline.isnot(None), QuizAttempt.deadline < now - self.grace),
+                and_(QuizAttempt.deadline.is_(None), QuizAttempt.started_at < now - self.untimed_max_age),
+            )).values(status='expired', finished_at=now).execution_options(synchronize_session=False)
+        ).rowcount
+        finished = and_(QuizAttempt.status != 'open', QuizAttempt.finished_at < now - self.retention)
+        db.session.execute(delete(AttemptAnswer).where(
+            AttemptAnswer.attempt_id.in_(select(QuizAttempt.id).where(finished))))
+        deleted = db.session.execute(
+            delete(QuizAttempt).where(finished).execution_options(synchronize_session=False)
+        ).rowcount
+        # Frozen payloads of superseded versions that no open attempt still shows
+        db.session.execute(delete(QuizPayload).where(
+            QuizPayload.version < select(Quiz.content_version).where(Quiz.id == QuizPayload.quiz_id)
+            .correlate(QuizPayload).scalar_subquery(),
+            ~select(QuizAttempt.id).where(QuizAttempt.quiz_id == QuizPayload.quiz_id,
+                                          QuizAttempt.quiz_version == QuizPayload.version,
+                                          QuizAttempt.status == 'open').correlate(QuizPayload).exists(),
+        ))
+        db.session.commit()
+        with self._lock:
+            stale = [a.id for a in self._cache.values() if self._expired(a.started_at, a.deadline, now)]
+            for attempt_id in stale:
+                del self._cache[attempt_id]
+        answer_log.discard(stale)
+        return expired, deleted
+
+    def _start_sweeper(self):
+        if not self.sweep_interval or (self._sweeper and self._sweeper.is_alive()):
+            return
+        with self._lock:
+            if self._sweeper and self._sweeper.is_alive():
+                return
+            self._sweeper = threading.Thread(target=self._sweep_loop, name='attempt-sweeper', daemon=True)
+            self._sweeper.start()
+
+    def _sweep_loop(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                with self.app.app_context():
+                    expired, deleted = self.sweep()
+                if expired or deleted:
+                    logger.info("Attempt sweep: %d expired, %d deleted", expired, deleted)
+            except Exception:
+                logger.exception("Attempt sweep failed")
+
+
+attempts = AttemptStore()
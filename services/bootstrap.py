@@ -0,0 +1,23 @@
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+
+from models import db, User
+from services import search
+from services.credentials import credentials
+
+
+# One-time setup of a database: tables, full-text indexes and the admin account.
+# Run by `flask --app app bootstrap` (or setup_db.py), never on import or app creation;
+# safe to rerun, and concurrent runs can't create two admins (email is unique).
+# Returns True if the admin account was created.
+def bootstrap(admin_email, admin_password):
+    db.create_all()
+    search.create_search_index()
+    if db.session.execute(select(User.id).where(User.email == admin_email)).first() is not None:
+        return False
+    created = db.session.execute(insert(User).values(
+        full_name='Admin', email=admin_email, role='admin',
+        password=credentials.hash_password(admin_password, offload=False),
+    ).on_conflict_do_nothing(index_elements=['email'])).rowcount
+    db.session.commit()
+    return bool(created)
@@ -0,0 +1,121 @@
+import gzip
+import json
+import threading
+from collections import namedtuple
+
+from flask import request, make_response
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+
+from models import db, Subject, Chapter, Quiz, CatalogVersion
+from services.database import read_session
+
+Document = namedtuple('Document', 'version chapters body gzipped')  # chapters: subject id -> list
+
+
+def catalog_etag(version, gzipped):
+    etag = f'catalog-v{version}'
+    return etag + '-gzip' if gzipped else etag
+
+
+def build_document(version):
+    session = read_session()
+    quizzes = {}
+    for chapter_id, quiz_id, title in session.execute(
+            select(Quiz.chapter_id, Quiz.id, Quiz.title).order_by(Quiz.title, Quiz.id)):
+        quizzes.setdefault(chapter_id, []).append({'id': quiz_id, 'title': title})
+    chapters = {}
+    for subject_id, chapter_id, name in session.execute(
+            select(Chapter.subject_id, Chapter.id, Chapter.name).order_by(Chapter.name, Chapter.id)):
+        chapters.setdefault(subject_id, []).append({'id': chapter_id, 'name': name,
+                                                    'quizzes': quizzes.get(chapter_id, [])})
+    subjects = [
+        {'id': subject_id, 'name': name, 'chapters': chapters.get(subject_id, [])}
+        for subject_id, name in session.execute(select(Subject.id, Subject.name).order_by(Subject.name, Subject.id))
+    ]
+    body = json.dumps({'version': version, 'subjects': subjects},
+                      separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    # mtime=0 keeps the compressed bytes identical across workers and rebuilds
+    return Document(version, chapters, body, gzip.compress(body, compresslevel=9, mtime=0))
+
+
+class Catalog:
+    """The subject -> chapter -> quiz tree behind the admin forms, as one JSON document.
+
+    The document is encoded (and gzipped) once per catalog version and served as
+    bytes; every subject, chapter or quiz change calls bump() before committing,
+    so workers rebuild it only after a change, wherever it was made. A browser
+    revalidation (If-None-Match) is answered from the version alone, i.e. one
+    primary-key lookup.
+    """
+
+    def __init__(self):
+        self._document = None
+        self._lock = threading.Lock()
+        self.metrics = {'hits': 0, 'builds': 0, 'not_modified': 0, 'bumps': 0}
+
+    def init_app(self, app):
+        app.extensions['catalog'] = self
+
+    def version(self):
+        return read_session().execute(select(CatalogVersion.version).where(CatalogVersion.id == 1)).scalar() or 0
+
+    # Call before committing any change to subjects, chapters or quizzes
+    def bump(self):
+        table = CatalogVersion.__table__
+        db.session.execute(insert(table).values(id=1, version=1).on_conflict_do_update(
+            index_elements=['id'], set_={'version': table.c.version + 1}))
+        with self._lock:
+            self.metrics['bumps'] += 1
+
+    def get(self, version=None):
+        version = self.version() if version is None else version
+        with self._lock:
+            document = self._document
+            if document is not None and document.version == version:
+                self.metrics['hits'] += 1
+                return document
+        document = build_document(version)
+        with self._lock:
+            if self._document is None or self._document.version <= version:
+                self._document = document
+            self.metrics['builds'] += 1
+        return document
+
+    # A subject's chapters, in catalog order
+    def chapters(self, subject_id):
+        return [{'id': chapter['id'], 'name': chapter['name']}
+                for chapter in self.get().chapters.get(subject_id, [])]
+
+    # The document for the current request: 304 on a matching If-None-Match, gzip when accepted
+    def response(self):
+        version = self.version()
+        gzipped = request.accept_encodings['gzip'] > 0
+        if request.if_none_match.contains(catalog_etag(version, gzipped)):
+            with self._lock:
+                self.metrics['not_modified'] += 1
+            response = make_response('', 304)
+        else:
+            document = self.get(version)
+            response = make_response(document.gzipped if gzipped else document.body)
+            response.content_type = 'application/json'
+            if gzipped:
+                response.content_encoding = 'gzip'
+        response.set_etag(catalog_etag(version, gzipped))
+        response.vary.add('Accept-Encoding')
+        response.cache_control.private = True
+        response.cache_control.no_cache = True  # Always revalidate: a new version must show up at once
+        return response
+
+    def clear(self):
+        with self._lock:
+            self._document = None
+
+    def stats(self):
+        with self._lock:
+            metrics = dict(self.metrics)
+            metrics['version'] = self._document.version if self._document else None
+        return metrics
+
+
+catalog = Catalog()
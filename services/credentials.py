@@ -0,0 +1,229 @@
+import atexit
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_METHOD = 'pbkdf2:sha256'  # werkzeug's iteration count, which rises with werkzeug releases
+
+
+# A method string with werkzeug's defaults filled in, i.e. the prefix its hashes are stored with
+def canonical_method(method):
+    name, *params = method.split(':')
+    if name == 'pbkdf2':
+        params += ['sha256', str(DEFAULT_PBKDF2_ITERATIONS)][len(params):]
+    elif name == 'scrypt':
+        params += ['32768', '8', '1'][len(params):]
+    else:
+        raise ValueError(f'Unsupported password hash method: {method}')
+    return ':'.join([name, *params])
+
+
+# Relative work factor of a method string, comparable only within one algorithm
+def _cost(method):
+    name, *params = canonical_method(method).split(':')
+    if name == 'pbkdf2':
+        return name, int(params[1])
+    return name, int(params[0]) * int(params[1]) * int(params[2])  # scrypt: n * r * p
+
+
+class CredentialsBusy(Exception):
+    """More logins are waiting for a hashing worker than PASSWORD_POOL_MAX_PENDING allows."""
+
+
+class LoginThrottle:
+    """Failed-login counter per key (an email, a client address).
+
+    A key with `limit` failures inside `window` seconds is refused until the
+    oldest of them ages out. Checked before any hashing, so a password-guessing
+    burst costs a dict lookup rather than a key derivation.
+    """
+
+    def __init__(self, limit, window, max_keys=100000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._failures = OrderedDict()  # key -> deque of failure times
+        self._lock = threading.Lock()
+
+    # Seconds until the key may try again (0 if it is not throttled)
+    def retry_after(self, key, now=None):
+        now = now or time.monotonic()
+        with self._lock:
+            failures = self._failures.get(key)
+            if not failures:
+                return 0
+            while failures and failures[0] <= now - self.window:
+                failures.popleft()
+            if len(failures) < self.limit:
+                return 0
+            return int(failures[0] + self.window - now) + 1
+
+    def failed(self, key):
+        now = time.monotonic()
+        with self._lock:
+            failures = self._failures.pop(key, None) or deque(maxlen=self.limit)
+            failures.append(now)
+            self._failures[key] = failures
+            while len(self._failures) > self.max_keys:
+                self._failures.popitem(last=False)
+
+    def reset(self, key):
+        with self._lock:
+            self._failures.pop(key, None)
+
+
+class Credentials:
+    """Password hashing and verification.
+
+    PASSWORD_HASH_METHOD is any werkzeug method string (e.g. pbkdf2:sha256:1000000,
+    scrypt:32768:8:1); hashes stored with the same algorithm but a lower work
+    factor are upgraded on the user's next successful login. Stronger hashes and
+    hashes of another algorithm are left as they are. Key derivation runs in a pool of
+    PASSWORD_POOL_SIZE processes (0 = in the request thread), so a login storm
+    saturates a fixed number of cores instead of every web thread; at most
+    PASSWORD_POOL_MAX_PENDING hashes wait for it, beyond that CredentialsBusy is
+    raised after PASSWORD_POOL_TIMEOUT seconds.
+    """
+
+    def __init__(self):
+        self.method = DEFAULT_METHOD
+        self.prefix = None  # Method and parameters exactly as they appear in a stored hash
+        self.pool_size = os.cpu_count() or 1
+        self.max_pending = 4 * self.pool_size
+        self.timeout = 5.0
+        # Workers only run hashlib, so forking a threaded server is safe; spawn/forkserver
+        # would re-import the main module (i.e. build the whole app) in every worker
+        self.start_method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+        self.email_throttle = LoginThrottle(5, 300)
+        self.address_throttle = None  # Off by default: a whole exam hall can share one NAT address
+        self._pool = None
+        self._slots = None
+        self._lock = threading.Lock()
+        self.metrics = {'verified': 0, 'rejected': 0, 'rehashed': 0, 'throttled': 0, 'busy': 0,
+                        'hashes': 0, 'total_hash_ms': 0.0, 'max_hash_ms': 0.0}
+
+    def init_app(self, app):
+        self.method = app.config.get('PASSWORD_HASH_METHOD', self.method)
+        self.prefix = canonical_method(self.method)
+        self.pool_size = app.config.get('PASSWORD_POOL_SIZE', self.pool_size)
+        self.max_pending = app.config.get('PASSWORD_POOL_MAX_PENDING', 4 * max(self.pool_size, 1))
+        self.timeout = app.config.get('PASSWORD_POOL_TIMEOUT', self.timeout)
+        self.start_method = app.config.get('PASSWORD_POOL_START_METHOD', self.start_method)
+        self.email_throttle = LoginThrottle(app.config.get('LOGIN_MAX_FAILURES', 5),
+                                            app.config.get('LOGIN_FAILURE_WINDOW', 300))
+        per_address = app.config.get('LOGIN_MAX_FAILURES_PER_ADDRESS')
+        self.address_throttle = LoginThrottle(per_address, app.config.get('LOGIN_FAILURE_WINDOW', 300)) \
+            if per_address else None
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        app.extensions['credentials'] = self
+
+    def hash_password(self, password, offload=True):
+        return self._run(generate_password_hash, (password, self.method), offload)
+
+    def needs_rehash(self, stored):
+        stored_method = stored.split('$', 1)[0]
+        if stored_method == self.prefix:
+            return False
+        try:
+            name, cost = _cost(stored_method)
+        except (ValueError, IndexError):
+            return False  # Not a method we know how to compare; leave it alone
+        wanted_name, wanted_cost = _cost(self.prefix)
+        # pbkdf2 with a digest other than sha256/sha512 (e.g. sha1) is always upgraded
+        weak_digest = name == 'pbkdf2' and stored_method.split(':')[1] not in ('sha256', 'sha512')
+        return name == wanted_name and (cost < wanted_cost or weak_digest)
+
+    # Verifies the user's password and, when it was hashed with weaker parameters,
+    # replaces the stored hash (caller commits)
+    def check(self, user, password):
+        if not user.password or not self._run(check_password_hash, (user.password, password)):
+            with self._lock:
+                self.metrics['rejected'] += 1
+            return False
+        with self._lock:
+            self.metrics['verified'] += 1
+        if self.needs_rehash(user.password):
+            try:
+                user.password = self.hash_password(password)
+            except CredentialsBusy:
+                return True  # The login stands; the upgrade waits for a quieter one
+            with self._lock:
+                self.metrics['rehashed'] += 1
+        return True
+
+    # Throttling, by email and by client address; checked before any hashing work
+
+    def retry_after(self, email, address):
+        wait = self.email_throttle.retry_after((email or '').strip().lower())
+        if self.address_throttle is not None:
+            wait = max(wait, self.address_throttle.retry_after(address))
+        if wait:
+            with self._lock:
+                self.metrics['throttled'] += 1
+        return wait
+
+    def login_failed(self, email, address):
+        self.email_throttle.failed((email or '').strip().lower())
+        if self.address_throttle is not None:
+            self.address_throttle.failed(address)
+
+    def login_succeeded(self, email):
+        self.email_throttle.reset((email or '').strip().lower())
+
+    def _run(self, fn, args, offload=True):
+        start = time.perf_counter()
+        if not offload or not self.pool_size:
+            result = fn(*args)
+        else:
+            if not self._slots.acquire(timeout=self.timeout):
+                with self._lock:
+                    self.metrics['busy'] += 1
+                raise CredentialsBusy()
+            try:
+                result = self._executor().submit(fn, *args).result()
+            except BrokenProcessPool:
+                logger.exception("Password hashing pool died; restarting it")
+                self.shutdown()
+                result = fn(*args)
+            finally:
+                self._slots.release()
+        elapsed = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.metrics['hashes'] += 1
+            self.metrics['total_hash_ms'] += elapsed
+            self.metrics['max_hash_ms'] = max(self.metrics['max_hash_ms'], elapsed)
+        return result
+
+    def _executor(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(self.pool_size,
+                                                     mp_context=multiprocessing.get_context(self.start_method))
+                    atexit.register(self.shutdown)
+        return self._pool
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        with self._lock:
+            metrics = dict(self.metrics)
+        metrics['avg_hash_ms'] = round(metrics['total_hash_ms'] / metrics['hashes'], 3) if metrics['hashes'] else 0
+        metrics['pool_size'] = self.pool_size
+        return metrics
+
+
+credentials = Credentials()
@@ -0,0 +1,97 @@
+from flask import g, has_app_context
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from models import db
+
+READONLY_BIND = 'readonly'
+
+# Production SQLite profile; every key can be overridden in app.config
+DEFAULTS = {
+    'SQLITE_JOURNAL_MODE': 'WAL',            # Readers no longer block behind writers
+    'SQLITE_SYNCHRONOUS': 'NORMAL',          # Durable across app crashes; fsync at checkpoints under WAL
+    'SQLITE_BUSY_TIMEOUT_MS': 5000,          # Wait for the write lock instead of failing immediately
+    'SQLITE_MMAP_SIZE': 256 * 1024 * 1024,
+    'SQLITE_CACHE_SIZE_KB': 64 * 1024,       # Per connection page cache
+    'SQLITE_FOREIGN_KEYS': True,             # Enforce FOREIGN KEY ... ON DELETE CASCADE (off by default in SQLite)
+    'DATABASE_POOL_SIZE': 10,
+    'DATABASE_MAX_OVERFLOW': 20,
+    'DATABASE_POOL_TIMEOUT': 30,
+    'DATABASE_READONLY_BIND': True,          # Separate read-only pool for dashboards and search
+}
+
+
+def is_sqlite_file(uri):
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+
+def readonly_uri(uri):
+    url = make_url(uri)
+    if url.query.get('uri'):
+        return url.update_query_dict({'mode': 'ro'}).render_as_string(hide_password=False)
+    return url.set(database=f'file:{url.database}', query={'mode': 'ro', 'uri': 'true'}) \
+        .render_as_string(hide_password=False)
+
+
+def init_database(app):
+    for key, value in DEFAULTS.items():
+        app.config.setdefault(key, value)
+
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    sqlite_file = is_sqlite_file(uri)
+    if sqlite_file:
+        options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+        options.setdefault('pool_size', app.config['DATABASE_POOL_SIZE'])
+        options.setdefault('max_overflow', app.config['DATABASE_MAX_OVERFLOW'])
+        options.setdefault('pool_timeout', app.config['DATABASE_POOL_TIMEOUT'])
+        options.setdefault('connect_args', {}).setdefault('check_same_thread', False)
+        if app.config['DATABASE_READONLY_BIND']:
+            binds = app.config.setdefault('SQLALCHEMY_BINDS', {})
+            binds.setdefault(READONLY_BIND, dict(options, url=readonly_uri(uri)))
+
+    db.init_app(app)
+    app.teardown_appcontext(close_readonly_session)
+
+    if sqlite_file:
+        with app.app_context():
+            for bind_key, engine in db.engines.items():
+                event.listen(engine, 'connect', pragma_listener(app.config, readonly=bind_key == READONLY_BIND))
+
+
+def pragma_listener(config, readonly=False):
+    pragmas = [
+        f"PRAGMA busy_timeout = {int(config['SQLITE_BUSY_TIMEOUT_MS'])}",
+        f"PRAGMA mmap_size = {int(config['SQLITE_MMAP_SIZE'])}",
+        f"PRAGMA cache_size = -{int(config['SQLITE_CACHE_SIZE_KB'])}",
+    ]
+    if not readonly:
+        # journal_mode is persistent in the file, so only the writable engine sets it
+        pragmas.insert(0, f"PRAGMA journal_mode = {config['SQLITE_JOURNAL_MODE']}")
+        pragmas.append(f"PRAGMA synchronous = {config['SQLITE_SYNCHRONOUS']}")
+        pragmas.append(f"PRAGMA foreign_keys = {'ON' if config['SQLITE_FOREIGN_KEYS'] else 'OFF'}")
+
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+    return set_pragmas
+
+
+# Session on the read-only pool, one per app context; falls back to db.session
+# when no read-only bind is configured (e.g. non-SQLite databases).
+def read_session():
+    if READONLY_BIND not in db.engines:
+        return db.session
+    if 'readonly_session' not in g:
+        g.readonly_session = Session(bind=db.engines[READONLY_BIND], autoflush=False)
+    return g.readonly_session
+
+
+def close_readonly_session(exc=None):
+    if has_app_context():
+        session = g.pop('readonly_session', None)
+        if session is not None:
+            session.close()
@@ -0,0 +1,294 @@
+import logging
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, select, delete, update, exists, cast, String
+from sqlalchemy.orm import Session, with_loader_criteria
+
+from models import db, User, Subject, Chapter, Quiz, Question, UserScore, QuizScoreStats, QuizAttempt, AttemptAnswer, \
+    QuizResponse, ItemAnalysis, QuizPayload
+from models.quiz import Score
+from services import score_stats, score_rollups, item_analysis
+from services.leaderboard import leaderboards
+from services.quiz_cache import quiz_cache
+from services.attempts import attempts
+from services.answer_log import answer_log
+from services.identity import identity_cache
+from services.page_cache import page_cache
+from services.catalog import catalog
+
+logger = logging.getLogger(__name__)
+
+MODES = ('hard', 'soft')
+TOMBSTONED = (Subject, Chapter, Quiz)
+
+
+# Soft mode: tombstoned subjects, chapters and quizzes are left out of every ORM SELECT
+# (lazy loads included); .execution_options(include_deleted=True) still sees them.
+# Registered on the Session class, so it checks the mode of the app it runs under.
+def hide_tombstones(state):
+    if not has_app_context() or current_app.config.get('DELETE_MODE', 'hard') != 'soft':
+        return
+    if state.is_select and not state.is_column_load and not state.is_relationship_load \
+            and not state.execution_options.get('include_deleted'):
+        state.statement = state.statement.options(*[
+            with_loader_criteria(model, lambda cls: cls.deleted_at.is_(None), include_aliases=True)
+            for model in TOMBSTONED
+        ])
+
+
+class Deletion:
+    """Deletes subjects, chapters, quizzes and users with everything that hangs off them.
+
+    A subtree goes in one transaction of set-based DELETEs, children first (answers,
+    attempts, scores, aggregates, leaderboard entries, questions, then the quiz,
+    chapter and subject rows), so nothing is loaded into the session. Every foreign
+    key is also ON DELETE CASCADE (enforced with SQLITE_FOREIGN_KEYS) for rows that
+    race in, e.g. a score committed by another worker mid-delete.
+
+    With DELETE_MODE = 'soft', subjects, chapters and quizzes are only tombstoned:
+    deleted_at is set on a handful of rows, so the write lock is held for
+    milliseconds, and they vanish from every ORM query at once. A background purger
+    then removes them PURGE_BATCH_SIZE rows per transaction, so dropping a subject
+    with 100k questions never stalls quiz submissions. Users are always deleted
+    outright; their subtree is small.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.mode = 'hard'
+        self.batch_size = 2000
+        self.purge_interval = 30
+        self._purger = None
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self.metrics = {'quizzes_deleted': 0, 'users_deleted': 0, 'tombstoned': 0, 'purges': 0,
+                        'rows_purged': 0, 'last_purge_ms': 0.0}
+
+    def init_app(self, app):
+        self.app = app
+        self.mode = app.config.get('DELETE_MODE', self.mode)
+        if self.mode not in MODES:
+            raise ValueError(f'DELETE_MODE must be one of {MODES}, not {self.mode!r}')
+        self.batch_size = app.config.get('PURGE_BATCH_SIZE', self.batch_size)
+        self.purge_interval = app.config.get('PURGE_INTERVAL', self.purge_interval)
+        app.extensions['deletion'] = self
+        if self.mode == 'soft' and not event.contains(Session, 'do_orm_execute', hide_tombstones):
+            event.listen(Session, 'do_orm_execute', hide_tombstones)
+
+    # Each delete commits and returns the number of rows removed (or tombstoned) per table
+
+    def delete_subject(self, subject_id):
+        quiz_ids = self._quiz_ids(Chapter.subject_id == subject_id)
+        return self._delete_tree(quiz_ids, [(Chapter, Chapter.subject_id == subject_id),
+                                            (Subject, Subject.id == subject_id)])
+
+    def delete_chapter(self, chapter_id):
+        quiz_ids = self._quiz_ids(Chapter.id == chapter_id)
+        return self._delete_tree(quiz_ids, [(Chapter, Chapter.id == chapter_id)])
+
+    def delete_quiz(self, quiz_id):
+        return self._delete_tree([quiz_id], [])
+
+    def delete_user(self, user_id):
+        quiz_ids = db.session.scalars(
+            select(UserScore.quiz_id).where(UserScore.user_id == user_id).distinct()).all()
+        answered = db.session.scalars(
+            select(QuizResponse.quiz_id).where(QuizResponse.user_id == user_id).distinct()).all()
+        open_attempts = self._open_attempts(QuizAttempt.user_id == user_id)
+        user_attempts = select(QuizAttempt.id).where(QuizAttempt.user_id == user_id)
+        try:
+            score_rollups.remove_user(user_id)  # Needs the user's scores to find their buckets
+            counts = {
+                'attempt_answer': self._execute(delete(AttemptAnswer).where(AttemptAnswer.attempt_id.in_(user_attempts))),
+                'quiz_attempt': self._execute(delete(QuizAttempt).where(QuizAttempt.user_id == user_id)),
+                'user_score': self._execute(delete(UserScore).where(UserScore.user_id == user_id)),
+                'score': self._execute(delete(Score).where(Score.user_id == user_id)),
+                'quiz_response': self._execute(delete(QuizResponse).where(QuizResponse.user_id == user_id)),
+            }
+            score_stats.refresh_quizzes(quiz_ids)
+            item_analysis.reset(answered)
+            leaderboards.remove_user(user_id)
+            counts['user'] = self._execute(delete(User).where(User.id == user_id))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        identity_cache.invalidate(user_id)
+        self._forget([], open_attempts)
+        with self._lock:
+            self.metrics['users_deleted'] += counts['user']
+        return counts
+
+    def _delete_tree(self, quiz_ids, parents):
+        if self.mode == 'soft':
+            return self._tombstone(quiz_ids, parents)
+        open_attempts = self._open_attempts(QuizAttempt.quiz_id.in_(quiz_ids))
+        try:
+            counts = self._delete_quizzes(quiz_ids)
+            for model, condition in parents:
+                counts[model.__tablename__] = self._execute(delete(model).where(condition))
+            catalog.bump()
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        self._forget(quiz_ids, open_attempts)
+        with self._lock:
+            self.metrics['quizzes_deleted'] += counts['quiz']
+        return counts
+
+    # Everything under the quizzes, then the quizzes; caller commits
+    def _delete_quizzes(self, quiz_ids):
+        if not quiz_ids:
+            return {'quiz': 0}
+        in_quizzes = select(QuizAttempt.id).where(QuizAttempt.quiz_id.in_(quiz_ids))
+        leaderboards.remove_quizzes(quiz_ids)  # Needs the quiz rows to find their chapters
+        score_rollups.remove_quizzes(quiz_ids)  # And their scores, to find the buckets to recompute
+        return {
+            'attempt_answer': self._execute(delete(AttemptAnswer).where(AttemptAnswer.attempt_id.in_(in_quizzes))),
+            'quiz_attempt': self._execute(delete(QuizAttempt).where(QuizAttempt.quiz_id.in_(quiz_ids))),
+            'quiz_payload': self._execute(delete(QuizPayload).where(QuizPayload.quiz_id.in_(quiz_ids))),
+            'user_score': self._execute(delete(UserScore).where(UserScore.quiz_id.in_(quiz_ids))),
+            'score': self._execute(delete(Score).where(Score.quiz_id.in_(quiz_ids))),
+            'quiz_score_stats': self._execute(delete(QuizScoreStats).where(QuizScoreStats.quiz_id.in_(quiz_ids))),
+            'quiz_response': self._execute(delete(QuizResponse).where(QuizResponse.quiz_id.in_(quiz_ids))),
+            'item_analysis': self._execute(delete(ItemAnalysis).where(ItemAnalysis.quiz_id.in_(quiz_ids))),
+            'question': self._execute(delete(Question).where(Question.quiz_id.in_(quiz_ids))),
+            'quiz': self._execute(delete(Quiz).where(Quiz.id.in_(quiz_ids))),
+        }
+
+    def _tombstone(self, quiz_ids, parents):
+        now = datetime.utcnow()
+        try:
+            counts = {'quiz': self._execute(update(Quiz).where(Quiz.id.in_(quiz_ids)).values(deleted_at=now))}
+            for model, condition in parents:
+                values = {'deleted_at': now}
+                if model is Subject:
+                    # Subject names are unique: free the name at once rather than when the purger runs
+                    values['name'] = Subject.name + ' (deleted #' + cast(Subject.id, String) + ')'
+                counts[model.__tablename__] = self._execute(update(model).where(condition).values(**values))
+            catalog.bump()
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        self._forget(quiz_ids, [])
+        with self._lock:
+            self.metrics['tombstoned'] += sum(counts.values())
+        self._start_purger()
+        self._wake.set()
+        return counts
+
+    # Hard-deletes every tombstoned row: the bulk tables PURGE_BATCH_SIZE rows per
+    # transaction, then the small remainder in one. Returns the number of rows purged.
+    def purge(self):
+        start = time.perf_counter()
+        quiz_ids = db.session.scalars(
+            select(Quiz.id).where(Quiz.deleted_at.isnot(None)).execution_options(include_deleted=True)).all()
+        purged = self._purge_attempts(quiz_ids) if quiz_ids else 0
+        if quiz_ids:
+            # Before the batches below take the scores its recompute reads
+            score_rollups.remove_quizzes(quiz_ids)
+            db.session.commit()
+        for model in (Question, UserScore, Score, QuizResponse):
+            if quiz_ids:
+                purged += self._purge_batches(model, model.quiz_id.in_(quiz_ids))
+        try:
+            counts = self._delete_quizzes(quiz_ids)
+            # Parents tombstoned after quiz_ids was read still have quizzes: next purge
+            counts['chapter'] = self._execute(delete(Chapter).where(
+                Chapter.deleted_at.isnot(None), ~exists().where(Quiz.chapter_id == Chapter.id)))
+            counts['subject'] = self._execute(delete(Subject).where(
+                Subject.deleted_at.isnot(None), ~exists().where(Chapter.subject_id == Subject.id)))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        purged += sum(counts.values())
+        self._forget(quiz_ids, [])
+        with self._lock:
+            self.metrics['purges'] += 1
+            self.metrics['rows_purged'] += purged
+            self.metrics['last_purge_ms'] = (time.perf_counter() - start) * 1000
+        return purged
+
+    def _purge_batches(self, model, condition):
+        table = model.__table__
+        purged = 0
+        while True:
+            batch = select(table.c.id).where(condition).limit(self.batch_size).scalar_subquery()
+            deleted = db.session.execute(table.delete().where(table.c.id.in_(batch))).rowcount
+            db.session.commit()
+            purged += deleted
+            if deleted < self.batch_size:
+                return purged
+
+    # Attempts go a batch at a time together with their autosaved answers
+    def _purge_attempts(self, quiz_ids):
+        purged = 0
+        while True:
+            attempt_ids = db.session.scalars(
+                select(QuizAttempt.id).where(QuizAttempt.quiz_id.in_(quiz_ids)).limit(self.batch_size)).all()
+            if attempt_ids:
+                purged += self._execute(delete(AttemptAnswer).where(AttemptAnswer.attempt_id.in_(attempt_ids)))
+                purged += self._execute(delete(QuizAttempt).where(QuizAttempt.id.in_(attempt_ids)))
+                db.session.commit()
+                self._forget([], attempt_ids)
+            if len(attempt_ids) < self.batch_size:
+                return purged
+
+    def _start_purger(self):
+        if self._purger and self._purger.is_alive():
+            return
+        with self._lock:
+            if self._purger and self._purger.is_alive():
+                return
+            self._purger = threading.Thread(target=self._purge_loop, name='tombstone-purger', daemon=True)
+            self._purger.start()
+
+    def _purge_loop(self):
+        while True:
+            self._wake.wait(self.purge_interval)
+            self._wake.clear()
+            try:
+                with self.app.app_context():
+                    purged = self.purge()
+                if purged:
+                    logger.info("Purged %d soft-deleted rows", purged)
+            except Exception:
+                logger.exception("Tombstone purge failed")
+
+    def _quiz_ids(self, condition):
+        return db.session.scalars(
+            select(Quiz.id).join(Chapter, Chapter.id == Quiz.chapter_id).where(condition)
+            .execution_options(include_deleted=True)
+        ).all()
+
+    def _open_attempts(self, condition):
+        return db.session.scalars(select(QuizAttempt.id).where(condition, QuizAttempt.status == 'open')).all()
+
+    @staticmethod
+    def _execute(statement):
+        return db.session.execute(statement.execution_options(synchronize_session=False)).rowcount
+
+    # In-process caches that may still hold the deleted rows (after commit)
+    def _forget(self, quiz_ids, attempt_ids):
+        for quiz_id in quiz_ids:
+            quiz_cache.discard(quiz_id)
+        for attempt_id in attempt_ids:
+            attempts.forget(attempt_id)
+        answer_log.discard(attempt_ids)
+        if quiz_ids:
+            page_cache.clear()
+
+    def stats(self):
+        with self._lock:
+            metrics = dict(self.metrics)
+        metrics['mode'] = self.mode
+        return metrics
+
+
+deletion = Deletion()
@@ -0,0 +1,97 @@
+from collections import namedtuple
+
+import numpy as np
+
+UNANSWERED = -1
+OPTION_COUNT = 4
+
+AnswerKey = namedtuple('AnswerKey', 'question_ids correct positions')
+GradeResult = namedtuple('GradeResult', 'score total correct')
+BatchResult = namedtuple('BatchResult', 'scores total correct')
+
+
+def option_index(value):
+    # correct_answer is stored as "option_N" (legacy rows may hold a bare N); returns 0-based index
+    value = str(value).strip()
+    if value.startswith('option_'):
+        value = value[len('option_'):]
+    try:
+        index = int(value) - 1
+    except ValueError:
+        return UNANSWERED
+    return index if 0 <= index < OPTION_COUNT else UNANSWERED
+
+
+# Compile questions (ORM rows or quiz snapshots) into a flat array of correct option indices
+def compile_key(questions):
+    questions = list(questions)
+    question_ids = np.fromiter((q.id for q in questions), dtype=np.int64)
+    correct = np.fromiter((option_index(q.correct_answer) for q in questions), dtype=np.int8)
+    return make_key(question_ids, correct)
+
+
+def make_key(question_ids, correct):
+    question_ids = np.array(question_ids, dtype=np.int64)
+    correct = np.array(correct, dtype=np.int8)
+    correct.setflags(write=False)
+    question_ids.setflags(write=False)
+    positions = {int(qid): i for i, qid in enumerate(question_ids)}
+    return AnswerKey(question_ids, correct, positions)
+
+
+# Keys are stored with attempts as raw bytes (int64 ids, int8 options) so they grade without the Question table
+def pack_key(key):
+    return key.question_ids.tobytes(), key.correct.tobytes()
+
+
+def unpack_key(question_ids, correct):
+    return make_key(np.frombuffer(question_ids, dtype=np.int64), np.frombuffer(correct, dtype=np.int8))
+
+
+def encode_answers(key, answers):
+    # answers: {question_id: option value ("1".."4" or "option_N")}; anything else is unanswered
+    row = np.full(len(key.correct), UNANSWERED, dtype=np.int8)
+    for question_id, value in answers.items():
+        position = key.positions.get(int(question_id))
+        if position is not None and value is not None:
+            row[position] = option_index(value)
+    return row
+
+
+def encode_form(key, form):
+    return encode_answers(key, {
+        question_id: form.get(f'question_{question_id}') for question_id in key.positions
+    })
+
+
+def encode_batch(key, submissions):
+    # submissions: iterable of {question_id: option} dicts, e.g. scanned answer sheets
+    submissions = list(submissions)
+    matrix = np.full((len(submissions), len(key.correct)), UNANSWERED, dtype=np.int8)
+    for i, answers in enumerate(submissions):
+        matrix[i] = encode_answers(key, answers)
+    return matrix
+
+
+def grade(key, row):
+    correct = (row == key.correct) & (row != UNANSWERED)
+    return GradeResult(int(correct.sum()), len(key.correct), correct)
+
+
+# Grades an (n_submissions x n_questions) int8 matrix. `correct` is the per-question
+# bitmap packed 8 questions per byte (np.unpackbits(..., axis=1, count=total) restores it).
+def grade_batch(key, matrix, chunk_size=100_000):
+    matrix = np.asarray(matrix, dtype=np.int8)
+    total = len(key.correct)
+    scores = np.empty(len(matrix), dtype=np.int32)
+    packed = np.empty((len(matrix), (total + 7) // 8), dtype=np.uint8)
+
+    # Chunked so the boolean intermediate stays bounded for million-row batches
+    for start in range(0, len(matrix), chunk_size):
+        stop = start + chunk_size
+        block = matrix[start:stop]
+        correct = (block == key.correct) & (block != UNANSWERED)
+        scores[start:stop] = correct.sum(axis=1, dtype=np.int32)
+        packed[start:stop] = np.packbits(correct, axis=1)
+
+    return BatchResult(scores, total, packed)
@@ -0,0 +1,116 @@
+import threading
+import time
+from collections import OrderedDict
+
+from flask import session
+from flask_login import UserMixin, user_logged_in
+from sqlalchemy import select
+
+from models import db, User
+
+SESSION_KEY = '_identity_version'
+FIELDS = ('id', 'email', 'full_name', 'qualification', 'dob', 'role', 'session_version')
+
+
+class Identity(UserMixin):
+    """Read-only snapshot of a User, served as current_user.
+
+    Load the User row (db.session.get(User, current_user.id)) to change anything.
+    """
+
+    def __init__(self, row):
+        for field, value in zip(FIELDS, row):
+            setattr(self, field, value)
+
+    def __repr__(self):
+        return f"<Identity {self.email} - Role: {self.role}>"
+
+
+class IdentityCache:
+    """Flask-Login user loader with an in-process TTL + LRU cache.
+
+    Authenticated requests are answered without touching the user table. The
+    session records the user's session_version at login; bumping the column
+    (role change, deletion) logs every existing session out the next time it
+    is loaded. Admin identities are never served from the cache, so a demotion
+    takes effect at once in every worker; other changes made in another process
+    show up within IDENTITY_CACHE_TTL, and at once in the process that calls
+    invalidate().
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.ttl = 30
+        self.max_entries = 10000
+        self._entries = OrderedDict()  # user id -> (Identity, loaded_at)
+        self._lock = threading.Lock()
+        self.metrics = {'hits': 0, 'misses': 0, 'bypassed': 0, 'revoked': 0, 'invalidations': 0}
+
+    def init_app(self, app):
+        self.enabled = app.config.get('IDENTITY_CACHE_ENABLED', self.enabled)
+        self.ttl = app.config.get('IDENTITY_CACHE_TTL', self.ttl)
+        self.max_entries = app.config.get('IDENTITY_CACHE_SIZE', self.max_entries)
+        app.extensions['identity_cache'] = self
+        user_logged_in.connect(self._logged_in, app)
+
+    def _logged_in(self, app, user, **extra):
+        session[SESSION_KEY] = user.session_version
+
+    # The user_loader: None (i.e. anonymous) for unknown users and revoked sessions
+    def load(self, user_id):
+        version = session.get(SESSION_KEY)  # None for sessions from before versioning
+        identity = self._cached(user_id)
+        if identity is None:
+            row = db.session.execute(select(*[getattr(User, f) for f in FIELDS]).where(User.id == user_id)).first()
+            if row is None:
+                return None
+            identity = Identity(row)
+            if identity.role == 'admin':
+                with self._lock:
+                    self.metrics['bypassed'] += 1
+            elif self.enabled:
+                self._store(identity)
+        if version is not None and version != identity.session_version:
+            with self._lock:
+                self.metrics['revoked'] += 1
+            return None
+        return identity
+
+    def _cached(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and now - entry[1] < self.ttl:
+                self._entries.move_to_end(user_id)
+                self.metrics['hits'] += 1
+                return entry[0]
+            self._entries.pop(user_id, None)
+            self.metrics['misses'] += 1
+        return None
+
+    def _store(self, identity):
+        with self._lock:
+            self._entries[identity.id] = (identity, time.monotonic())
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    # Call after committing a change to the user
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self.metrics['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            metrics = dict(self.metrics)
+            metrics['entries'] = len(self._entries)
+        lookups = metrics['hits'] + metrics['misses']
+        metrics['hit_rate'] = round(metrics['hits'] / lookups, 4) if lookups else 0
+        return metrics
+
+
+identity_cache = IdentityCache()
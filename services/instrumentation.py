@@ -0,0 +1,253 @@
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from flask import g, request, has_request_context, before_render_template, template_rendered
+from sqlalchemy import event
+
+from models import db
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250)
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Histogram:
+    def __init__(self, name, help_text, label, buckets):
+        self.name, self.help_text, self.label, self.buckets = name, help_text, label, buckets
+        self.counts = defaultdict(lambda: [0] * (len(buckets) + 1))
+        self.sums = defaultdict(float)
+
+    def observe(self, label_value, value):
+        counts = self.counts[label_value]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        else:
+            counts[-1] += 1
+        self.sums[label_value] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for label_value in sorted(self.counts):
+            counts, label = self.counts[label_value], f'{self.label}="{escape_label(label_value)}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{label}}} {self.sums[label_value]:.6f}')
+            lines.append(f'{self.name}_count{{{label}}} {cumulative}')
+        return lines
+
+
+class LabeledCounter:
+    def __init__(self, name, help_text, labels, kind='counter'):
+        self.name, self.help_text, self.labels, self.kind = name, help_text, labels, kind
+        self.values = Counter()
+
+    def inc(self, label_values, amount=1):
+        self.values[label_values] += amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        for label_values in sorted(self.values):
+            labels = ','.join(f'{k}="{escape_label(v)}"' for k, v in zip(self.labels, label_values))
+            lines.append(f'{self.name}{{{labels}}} {self.values[label_values]}')
+        return lines
+
+
+class SamplingProfiler:
+    """Samples the stacks of in-flight request threads into folded (flame graph) format."""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self._active = {}  # thread id -> Counter of folded stacks
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def begin(self):
+        with self._lock:
+            self._active[threading.get_ident()] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+                self._thread.start()
+
+    def end(self):
+        with self._lock:
+            return self._active.pop(threading.get_ident(), Counter())
+
+    # Runs only while some request is being profiled; begin() starts it again
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                if not self._active:
+                    self._thread = None
+                    return
+                for thread_id, stacks in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stacks[self.fold(frame)] += 1
+
+    @staticmethod
+    def fold(frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+
+class Instrumentation:
+    """Opt-in request instrumentation: endpoint latency, SQL count/time per request
+    (flagging likely N+1 patterns), template render time and slow-request profiles.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.n_plus_one_threshold = 10
+        self.profile_slow_ms = 500
+        self.profile_dir = None
+        self.profiler = SamplingProfiler()
+        self.profiler_enabled = False
+        self.collectors = []  # callables returning {metric_name: value} gauges
+        self._lock = threading.Lock()
+        self.request_latency = Histogram('quiz_request_duration_seconds', 'Request latency by endpoint.',
+                                         'endpoint', LATENCY_BUCKETS)
+        self.sql_count = Histogram('quiz_request_sql_statements', 'SQL statements per request by endpoint.',
+                                   'endpoint', QUERY_COUNT_BUCKETS)
+        self.sql_time = Histogram('quiz_request_sql_seconds', 'Time spent in SQL per request by endpoint.',
+                                  'endpoint', LATENCY_BUCKETS)
+        self.template_time = Histogram('quiz_template_render_seconds', 'Template render time by template.',
+                                       'template', LATENCY_BUCKETS)
+        self.responses = LabeledCounter('quiz_responses_total', 'Responses by endpoint and status.',
+                                        ('endpoint', 'status'))
+        self.n_plus_one = LabeledCounter('quiz_n_plus_one_total',
+                                         'Requests repeating one SQL statement past the N+1 threshold.',
+                                         ('endpoint',))
+
+    def init_app(self, app):
+        app.extensions['instrumentation'] = self
+        self.enabled = app.config.get('INSTRUMENTATION_ENABLED', False)
+        self.n_plus_one_threshold = app.config.get('N_PLUS_ONE_THRESHOLD', self.n_plus_one_threshold)
+        self.profiler_enabled = app.config.get('PROFILER_ENABLED', False)
+        self.profile_slow_ms = app.config.get('PROFILER_SLOW_MS', self.profile_slow_ms)
+        self.profiler.interval = app.config.get('PROFILER_INTERVAL_MS', 5) / 1000
+        self.profile_dir = app.config.get('PROFILER_DIR') or os.path.join(app.instance_path, 'profiles')
+        if not self.enabled:
+            return
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+        with app.app_context():
+            for engine in db.engines.values():
+                event.listen(engine, 'before_cursor_execute', self._before_cursor)
+                event.listen(engine, 'after_cursor_execute', self._after_cursor)
+
+    def _before_request(self):
+        g.instrumentation = {'start': time.perf_counter(), 'sql': Counter(), 'sql_time': 0.0, 'templates': [],
+                             'profiling': self.profiler_enabled}
+        if self.profiler_enabled:
+            self.profiler.begin()
+
+    def _after_request(self, response):
+        state = g.pop('instrumentation', None)
+        if state is None:
+            return response
+        elapsed = time.perf_counter() - state['start']
+        endpoint = request.endpoint or 'unmatched'
+        statements = sum(state['sql'].values())
+        repeated, repeats = state['sql'].most_common(1)[0] if state['sql'] else (None, 0)
+
+        with self._lock:
+            self.request_latency.observe(endpoint, elapsed)
+            self.sql_count.observe(endpoint, statements)
+            self.sql_time.observe(endpoint, state['sql_time'])
+            self.responses.inc((endpoint, response.status_code))
+            if repeats >= self.n_plus_one_threshold:
+                self.n_plus_one.inc((endpoint,))
+
+        if repeats >= self.n_plus_one_threshold:
+            logger.warning("Possible N+1 in %s: statement ran %d times: %s",
+                           endpoint, repeats, ' '.join(repeated.split())[:200])
+
+        response.headers['Server-Timing'] = (
+            f'app;dur={elapsed * 1000:.1f}, db;dur={state["sql_time"] * 1000:.1f};desc="{statements} queries"'
+        )
+
+        if state['profiling']:
+            stacks = self.profiler.end()
+            if elapsed * 1000 >= self.profile_slow_ms and stacks:
+                self.dump_profile(endpoint, elapsed, stacks)
+        return response
+
+    def dump_profile(self, endpoint, elapsed, stacks):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        name = f"{datetime.utcnow():%Y%m%dT%H%M%S%f}_{endpoint.replace('.', '-')}_{int(elapsed * 1000)}ms.folded"
+        path = os.path.join(self.profile_dir, name)
+        with open(path, 'w', encoding='utf-8') as profile:
+            for stack, count in stacks.most_common():
+                profile.write(f"{stack} {count}\n")
+        logger.info("Slow request %s (%.0f ms) profiled to %s", endpoint, elapsed * 1000, path)
+
+    def _before_cursor(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('instrumentation_start', []).append(time.perf_counter())
+
+    def _after_cursor(self, conn, cursor, statement, parameters, context, executemany):
+        start = conn.info['instrumentation_start'].pop()
+        if has_request_context() and 'instrumentation' in g:
+            g.instrumentation['sql'][statement] += 1
+            g.instrumentation['sql_time'] += time.perf_counter() - start
+
+    def _before_render(self, sender, template, context, **extra):
+        if has_request_context() and 'instrumentation' in g:
+            g.instrumentation['templates'].append(time.perf_counter())
+
+    def _after_render(self, sender, template, context, **extra):
+        if has_request_context() and 'instrumentation' in g and g.instrumentation['templates']:
+            elapsed = time.perf_counter() - g.instrumentation['templates'].pop()
+            with self._lock:
+                self.template_time.observe(template.name or 'string', elapsed)
+
+    def set_profiler(self, enabled):
+        self.profiler_enabled = enabled
+
+    def render(self):
+        with self._lock:
+            lines = []
+            for metric in (self.request_latency, self.sql_count, self.sql_time, self.template_time,
+                           self.responses, self.n_plus_one):
+                lines.extend(metric.render())
+        for collect in self.collectors:
+            for name, value in collect().items():
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {value}")
+        lines.append("# TYPE quiz_profiler_enabled gauge")
+        lines.append(f"quiz_profiler_enabled {int(self.profiler_enabled)}")
+        return '\n'.join(lines) + '\n'
+
+
+# Expose the numeric fields of a stats() dict as gauges, e.g. quiz_cache.stats -> quiz_cache_hits;
+# flags become 0/1 (Prometheus has no boolean values)
+def gauges(prefix, stats):
+    return lambda: {f'{prefix}_{key}': int(value) if isinstance(value, bool) else value
+                    for key, value in stats().items() if isinstance(value, (int, float))}
+
+
+instrumentation = Instrumentation()
@@ -0,0 +1,221 @@
+from collections import namedtuple
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import select, update
+from sqlalchemy.dialects.sqlite import insert
+
+from models import db, Question, QuizResponse, ItemAnalysis
+from services import grading
+
+CHUNK = 5000  # Responses decoded per NumPy pass
+CHOICES = np.arange(grading.UNANSWERED, grading.OPTION_COUNT, dtype=np.int8)  # Column order of choice_counts
+
+# Flags are only raised once a version has this many responses
+MIN_RESPONSES = 20
+TOO_HARD, TOO_EASY = 0.2, 0.95  # Proportion correct
+LOW_DISCRIMINATION = 0.2  # Item-rest correlation
+UNUSED_DISTRACTOR = 0.02  # Share of responses
+
+ItemStats = namedtuple('ItemStats', 'position question_id question_text correct_option difficulty discrimination '
+                                    'choices unanswered flags')
+Analysis = namedtuple('Analysis', 'quiz_id version responses questions mean sd kr20 items updated_at')
+
+
+# Stores the answers of a graded attempt; called by attempts.submit, caller commits.
+# The version's answer key is written once, by its first response.
+def record_response(attempt, answers, score, submitted_at):
+    question_ids, correct = grading.pack_key(attempt.answer_key)
+    db.session.execute(insert(ItemAnalysis).values(
+        quiz_id=attempt.quiz_id, quiz_version=attempt.quiz_version, question_ids=question_ids, answer_key=correct,
+        responses=0, last_response_id=0, total_sum=0, total_squares=0,
+    ).on_conflict_do_nothing(index_elements=['quiz_id', 'quiz_version']))
+    db.session.execute(QuizResponse.__table__.insert().values(
+        quiz_id=attempt.quiz_id, quiz_version=attempt.quiz_version, user_id=attempt.user_id,
+        options=np.asarray(answers, dtype=np.int8).tobytes(), score=score, submitted_at=submitted_at,
+    ))
+
+
+class Tally:
+    """Sufficient statistics of a set of responses to one quiz version.
+
+    Everything is a sum over responses (count, score, score^2, per-question choice
+    counts and score of those answering correctly), so folding in a new batch is
+    a handful of vectorized passes and never needs the earlier responses.
+    """
+
+    def __init__(self, row):
+        self.key = grading.unpack_key(row.question_ids, row.answer_key)
+        k = len(self.key.correct)
+        self.responses = row.responses
+        self.total_sum = row.total_sum
+        self.total_squares = row.total_squares
+        self.choices = np.frombuffer(row.choice_counts, dtype=np.int64).reshape(k, len(CHOICES)).copy() \
+            if row.choice_counts else np.zeros((k, len(CHOICES)), dtype=np.int64)
+        self.correct_totals = np.frombuffer(row.correct_totals, dtype=np.int64).copy() \
+            if row.correct_totals else np.zeros(k, dtype=np.int64)
+
+    # options: (responses, questions) int8 matrix
+    def fold(self, options):
+        correct = ((options == self.key.correct) & (options != grading.UNANSWERED)).astype(np.int64)
+        totals = correct.sum(axis=1)
+        self.responses += len(options)
+        self.total_sum += int(totals.sum())
+        self.total_squares += int((totals * totals).sum())
+        self.choices += (options[:, :, None] == CHOICES).sum(axis=0)
+        self.correct_totals += totals @ correct
+
+    def values(self):
+        return {
+            'responses': self.responses, 'total_sum': self.total_sum, 'total_squares': self.total_squares,
+            'choice_counts': self.choices.tobytes(), 'correct_totals': self.correct_totals.tobytes(),
+        }
+
+    def correct_counts(self):
+        valid = self.key.correct != grading.UNANSWERED
+        counts = self.choices[np.arange(len(self.key.correct)), self.key.correct.astype(np.int64) + 1]
+        return np.where(valid, counts, 0)
+
+
+# Folds the version's responses newer than its watermark into the stored sums; commits.
+# Returns the up-to-date Tally, or None if the version has no responses.
+def refresh(quiz_id, version):
+    row = db.session.get(ItemAnalysis, (quiz_id, version), populate_existing=True)
+    if row is None:
+        return None
+    tally = Tally(row)
+    watermark = last_id = row.last_response_id
+    width = len(tally.key.correct)
+    while True:
+        rows = db.session.execute(
+            select(QuizResponse.id, QuizResponse.options)
+            .where(QuizResponse.quiz_id == quiz_id, QuizResponse.quiz_version == version,
+                   QuizResponse.id > last_id)
+            .order_by(QuizResponse.id).limit(CHUNK)
+        ).all()
+        if not rows:
+            break
+        blobs = [options for _, options in rows if len(options) == width]
+        if blobs:
+            tally.fold(np.frombuffer(b''.join(blobs), dtype=np.int8).reshape(len(blobs), width))
+        last_id = rows[-1].id
+        if len(rows) < CHUNK:
+            break
+    if last_id == watermark:
+        db.session.rollback()
+        return tally
+
+    # Conditional on the watermark, so two concurrent refreshes can't fold the same batch twice
+    stored = db.session.execute(
+        update(ItemAnalysis)
+        .where(ItemAnalysis.quiz_id == quiz_id, ItemAnalysis.quiz_version == version,
+               ItemAnalysis.last_response_id == watermark)
+        .values(last_response_id=last_id, updated_at=datetime.utcnow(), **tally.values())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not stored:
+        db.session.rollback()
+        return refresh(quiz_id, version)
+    db.session.commit()
+    return tally
+
+
+# Folds new responses into every quiz version (e.g. from cron after an exam); returns
+# the number of versions refreshed
+def refresh_all():
+    keys = db.session.execute(select(ItemAnalysis.quiz_id, ItemAnalysis.quiz_version)).all()
+    for quiz_id, version in keys:
+        refresh(quiz_id, version)
+    return len(keys)
+
+
+# Forget the sums of these quizzes (e.g. after responses were deleted); the next refresh
+# recomputes them from the remaining responses. Caller commits.
+def reset(quiz_ids):
+    quiz_ids = list(quiz_ids)
+    if not quiz_ids:
+        return
+    db.session.execute(
+        update(ItemAnalysis).where(ItemAnalysis.quiz_id.in_(quiz_ids))
+        .values(responses=0, last_response_id=0, total_sum=0, total_squares=0, choice_counts=None,
+                correct_totals=None, updated_at=None)
+        .execution_options(synchronize_session=False)
+    )
+
+
+# Versions of the quiz that have responses, newest first
+def versions(quiz_id):
+    return db.session.scalars(
+        select(ItemAnalysis.quiz_version).where(ItemAnalysis.quiz_id == quiz_id)
+        .order_by(ItemAnalysis.quiz_version.desc())
+    ).all()
+
+
+# Item analysis of a quiz version (default: the newest with responses), refreshed first
+def analyse(quiz_id, version=None):
+    if version is None:
+        known = versions(quiz_id)
+        if not known:
+            return None
+        version = known[0]
+    tally = refresh(quiz_id, version)
+    if tally is None:
+        return None
+    row = db.session.get(ItemAnalysis, (quiz_id, version))
+    n, k = tally.responses, len(tally.key.correct)
+    texts = dict(db.session.execute(
+        select(Question.id, Question.question_text).where(Question.id.in_(tally.key.question_ids.tolist()))
+    ).all())
+    if not n:
+        return Analysis(quiz_id, version, 0, k, None, None, None, [], row.updated_at)
+
+    # Classical test theory, all from the running sums (population moments)
+    p = tally.correct_counts() / n  # Difficulty: proportion answering correctly
+    mean = tally.total_sum / n
+    variance = tally.total_squares / n - mean * mean
+    item_variance = p * (1 - p)
+    covariance = tally.correct_totals / n - p * mean  # Item vs total score
+    rest_variance = variance - 2 * covariance + item_variance  # Total score without the item
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Discrimination: item-rest (corrected point-biserial) correlation
+        discrimination = (covariance - item_variance) / np.sqrt(item_variance * rest_variance)
+    kr20 = k / (k - 1) * (1 - item_variance.sum() / variance) if k > 1 and variance > 0 else None
+    shares = tally.choices / n
+
+    items = []
+    for j in range(k):
+        correct_option = int(tally.key.correct[j])
+        r = float(discrimination[j]) if np.isfinite(discrimination[j]) else None
+        items.append(ItemStats(
+            j + 1, int(tally.key.question_ids[j]), texts.get(int(tally.key.question_ids[j])),
+            correct_option + 1 if correct_option != grading.UNANSWERED else None,
+            round(float(p[j]), 4), round(r, 4) if r is not None else None,
+            [round(float(share), 4) for share in shares[j, 1:]], round(float(shares[j, 0]), 4),
+            flags(p[j], r, shares[j, 1:], correct_option, n),
+        ))
+    return Analysis(quiz_id, version, n, k, round(mean, 3), round(max(variance, 0) ** 0.5, 3),
+                    round(kr20, 4) if kr20 is not None else None, items, row.updated_at)
+
+
+def flags(p, r, shares, correct_option, n):
+    if n < MIN_RESPONSES:
+        return []
+    found = []
+    if correct_option == grading.UNANSWERED:
+        found.append('no valid answer key')
+        return found
+    if p < TOO_HARD:
+        found.append('too hard')
+    elif p > TOO_EASY:
+        found.append('too easy')
+    if r is not None and r < 0:
+        found.append('negative discrimination: check the key')
+    elif r is not None and r < LOW_DISCRIMINATION:
+        found.append('low discrimination')
+    distractors = [i for i in range(len(shares)) if i != correct_option]
+    if any(shares[i] > shares[correct_option] for i in distractors):
+        found.append('a distractor outdraws the key')
+    unused = [str(i + 1) for i in distractors if shares[i] < UNUSED_DISTRACTOR]
+    if unused:
+        found.append(f"option {', '.join(unused)} rarely chosen")
+    return found
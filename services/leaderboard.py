@@ -0,0 +1,322 @@
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict, namedtuple
+
+from sqlalchemy import event, select, func, tuple_, text, bindparam
+from sqlalchemy.dialects.sqlite import insert
+
+from models import db, Quiz, Chapter, UserScore, LeaderboardEntry
+from models.leaderboard import SCOPES
+from services.database import read_session
+
+Standing = namedtuple('Standing', 'rank user_id score percentile total')
+
+PENDING_KEY = 'leaderboard_pending'
+
+
+class Board:
+    """Order-statistics view of one leaderboard.
+
+    `keys` is kept sorted as (-score, user_id), so ranks, top-K and neighbours are
+    bisect lookups; ties share a rank (competition ranking: 1, 2, 2, 4).
+    """
+
+    def __init__(self, rows):
+        self.scores = dict(rows)
+        self.keys = sorted((-score, user_id) for user_id, score in self.scores.items())
+        self.loaded_at = time.monotonic()
+
+    def set(self, user_id, score):
+        old = self.scores.get(user_id)
+        if old is not None:
+            del self.keys[bisect_left(self.keys, (-old, user_id))]
+        if score is None:
+            self.scores.pop(user_id, None)
+            return
+        self.scores[user_id] = score
+        insort(self.keys, (-score, user_id))
+
+    def standing(self, user_id):
+        score = self.scores.get(user_id)
+        if score is None:
+            return None
+        total = len(self.keys)
+        rank = bisect_left(self.keys, (-score,)) + 1
+        below = total - bisect_right(self.keys, (-score, float('inf')))
+        percentile = round(100 * below / (total - 1), 1) if total > 1 else 100.0
+        return Standing(rank, user_id, score, percentile, total)
+
+    def top(self, k):
+        return [self.standing(user_id) for _, user_id in self.keys[:k]]
+
+    def around(self, user_id, radius):
+        score = self.scores.get(user_id)
+        if score is None:
+            return []
+        index = bisect_left(self.keys, (-score, user_id))
+        window = self.keys[max(index - radius, 0):index + radius + 1]
+        return [self.standing(neighbour) for _, neighbour in window]
+
+
+class Leaderboards:
+    """Per quiz, chapter and subject leaderboards.
+
+    The leaderboard_entry table is the source of truth and is updated in the same
+    transaction as every new UserScore (see score_writer.save_scores). Boards are
+    loaded into memory on first use, kept in an LRU, patched with the committed
+    values after each commit, and reloaded after LEADERBOARD_TTL seconds so writes
+    from other processes show up.
+    """
+
+    def __init__(self):
+        self.max_boards = 1000
+        self.ttl = 60
+        self._boards = OrderedDict()  # (scope, scope_id) -> Board
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.max_boards = app.config.get('LEADERBOARD_MAX_BOARDS', self.max_boards)
+        self.ttl = app.config.get('LEADERBOARD_TTL', self.ttl)
+        app.extensions['leaderboards'] = self
+        if not event.contains(db.session, 'after_commit', self._after_commit):
+            event.listen(db.session, 'after_commit', self._after_commit)
+            event.listen(db.session, 'after_soft_rollback', self._after_rollback)
+
+    # Writes (called inside the caller's transaction)
+
+    def record_scores(self, rows):
+        best = {}
+        for row in rows:
+            key = (row['user_id'], row['quiz_id'])
+            best[key] = max(best.get(key, row['score']), row['score'])
+        if not best:
+            return
+
+        quiz_ids = {quiz_id for _, quiz_id in best}
+        parents = {quiz_id: (chapter_id, subject_id) for quiz_id, chapter_id, subject_id in db.session.execute(
+            select(Quiz.id, Quiz.chapter_id, Chapter.subject_id)
+            .join(Chapter, Chapter.id == Quiz.chapter_id).where(Quiz.id.in_(quiz_ids))
+        )}
+        current = {(user_id, quiz_id): score for quiz_id, user_id, score in db.session.execute(
+            select(LeaderboardEntry.scope_id, LeaderboardEntry.user_id, LeaderboardEntry.score)
+            .where(LeaderboardEntry.scope == 'quiz')
+            .where(tuple_(LeaderboardEntry.scope_id, LeaderboardEntry.user_id).in_(
+                [(quiz_id, user_id) for user_id, quiz_id in best]))
+        )}
+
+        improved, deltas = [], {}
+        for (user_id, quiz_id), score in best.items():
+            old = current.get((user_id, quiz_id))
+            if (old is not None and score <= old) or quiz_id not in parents:
+                continue
+            improved.append({'scope': 'quiz', 'scope_id': quiz_id, 'user_id': user_id, 'score': score})
+            chapter_id, subject_id = parents[quiz_id]
+            for key in (('chapter', chapter_id, user_id), ('subject', subject_id, user_id)):
+                deltas[key] = deltas.get(key, 0) + score - (old or 0)
+        if not improved:
+            return
+
+        entry = LeaderboardEntry.__table__.c
+        columns = (entry.scope, entry.scope_id, entry.user_id, entry.score)
+        stmt = insert(LeaderboardEntry)
+        results = db.session.execute(
+            stmt.on_conflict_do_update(index_elements=['scope', 'scope_id', 'user_id'],
+                                       set_={'score': stmt.excluded.score}).returning(*columns),
+            improved
+        ).all()
+        results += db.session.execute(
+            stmt.on_conflict_do_update(index_elements=['scope', 'scope_id', 'user_id'],
+                                       set_={'score': entry.score + stmt.excluded.score}).returning(*columns),
+            [{'scope': scope, 'scope_id': scope_id, 'user_id': user_id, 'score': delta}
+             for (scope, scope_id, user_id), delta in deltas.items()]
+        ).all()
+        self._pending().extend(('set', tuple(row)) for row in results)
+
+    # Admin edits and deletes can lower a best score, so the user's entries are recomputed
+    def refresh(self, user_id, quiz_id):
+        db.session.flush()
+        chapter_id, subject_id = self._parents(quiz_id)
+        best = db.session.execute(
+            select(func.max(UserScore.score)).where(UserScore.user_id == user_id, UserScore.quiz_id == quiz_id)
+        ).scalar()
+        self._put('quiz', quiz_id, user_id, best)
+        for scope, scope_id, in_scope in (('chapter', chapter_id, Quiz.chapter_id == chapter_id),
+                                          ('subject', subject_id, Chapter.subject_id == subject_id)):
+            total = db.session.execute(
+                select(func.sum(LeaderboardEntry.score))
+                .join(Quiz, Quiz.id == LeaderboardEntry.scope_id).join(Chapter, Chapter.id == Quiz.chapter_id)
+                .where(LeaderboardEntry.scope == 'quiz', LeaderboardEntry.user_id == user_id, in_scope)
+            ).scalar()
+            self._put(scope, scope_id, user_id, total)
+
+    # Drops a quiz's board and recomputes its chapter and subject boards without it
+    def remove_quiz(self, quiz_id):
+        self.remove_quizzes([quiz_id])
+
+    # Same for a whole subtree; run before the quiz rows themselves are deleted
+    def remove_quizzes(self, quiz_ids):
+        quiz_ids = list(quiz_ids)
+        if not quiz_ids:
+            return
+        parents = db.session.execute(
+            select(Quiz.chapter_id, Chapter.subject_id).join(Chapter, Chapter.id == Quiz.chapter_id)
+            .where(Quiz.id.in_(quiz_ids)).distinct().execution_options(include_deleted=True)
+        ).all()
+        entry = LeaderboardEntry.__table__
+        db.session.execute(entry.delete().where(entry.c.scope == 'quiz', entry.c.scope_id.in_(quiz_ids)))
+        self._pending().extend(('evict', ('quiz', quiz_id)) for quiz_id in quiz_ids)
+        self._rebuild_parents({chapter_id for chapter_id, _ in parents}, {subject_id for _, subject_id in parents})
+
+    # A quiz moved to another chapter (already assigned): its scores leave the old chapter
+    # and subject boards and join the new ones
+    def quiz_moved(self, quiz_id, old_chapter_id):
+        db.session.flush()
+        chapter_ids = {old_chapter_id, self._parents(quiz_id)[0]}
+        subject_ids = set(db.session.scalars(
+            select(Chapter.subject_id).where(Chapter.id.in_(chapter_ids)).execution_options(include_deleted=True)))
+        self._rebuild_parents(chapter_ids, subject_ids)
+
+    # A chapter moved to another subject (already assigned); its own board is unchanged
+    def chapter_moved(self, chapter_id, old_subject_id):
+        db.session.flush()
+        new_subject_id = db.session.execute(select(Chapter.subject_id).where(Chapter.id == chapter_id)).scalar()
+        self._rebuild_parents((), {old_subject_id, new_subject_id})
+
+    # Recomputes whole chapter and subject boards from the quiz entries and the current tree
+    def _rebuild_parents(self, chapter_ids, subject_ids):
+        chapter_ids, subject_ids = sorted(chapter_ids), sorted(subject_ids)
+        entry = LeaderboardEntry.__table__
+        db.session.execute(entry.delete().where(
+            ((entry.c.scope == 'chapter') & entry.c.scope_id.in_(chapter_ids)) |
+            ((entry.c.scope == 'subject') & entry.c.scope_id.in_(subject_ids))
+        ))
+        if chapter_ids:
+            db.session.execute(text(REBUILD_SQL[1] + " HAVING quiz.chapter_id IN :chapter_ids")
+                               .bindparams(bindparam('chapter_ids', expanding=True)), {'chapter_ids': chapter_ids})
+        if subject_ids:
+            db.session.execute(text(REBUILD_SQL[2] + " HAVING chapter.subject_id IN :subject_ids")
+                               .bindparams(bindparam('subject_ids', expanding=True)), {'subject_ids': subject_ids})
+        self._pending().extend([('evict', ('chapter', chapter_id)) for chapter_id in chapter_ids] +
+                               [('evict', ('subject', subject_id)) for subject_id in subject_ids])
+
+    # Drops a user from every board; the other users' entries are unaffected
+    def remove_user(self, user_id):
+        entry = LeaderboardEntry.__table__
+        removed = db.session.execute(
+            entry.delete().where(entry.c.user_id == user_id).returning(entry.c.scope, entry.c.scope_id)
+        ).all()
+        self._pending().extend(('set', (scope, scope_id, user_id, None)) for scope, scope_id in removed)
+
+    def _parents(self, quiz_id):
+        return db.session.execute(
+            select(Quiz.chapter_id, Chapter.subject_id).join(Chapter, Chapter.id == Quiz.chapter_id)
+            .where(Quiz.id == quiz_id)
+        ).one()
+
+    def _put(self, scope, scope_id, user_id, score):
+        entry = LeaderboardEntry.__table__
+        db.session.execute(entry.delete().where(entry.c.scope == scope, entry.c.scope_id == scope_id,
+                                                entry.c.user_id == user_id))
+        if score is not None:
+            db.session.execute(entry.insert().values(scope=scope, scope_id=scope_id, user_id=user_id, score=score))
+        self._pending().append(('set', (scope, scope_id, user_id, score)))
+
+    def _pending(self):
+        return db.session.info.setdefault(PENDING_KEY, [])
+
+    def _after_commit(self, session):
+        pending = session.info.pop(PENDING_KEY, None)
+        if not pending:
+            return
+        with self._lock:
+            for action, value in pending:
+                if action == 'evict':
+                    self._boards.pop(value, None)
+                    continue
+                scope, scope_id, user_id, score = value
+                board = self._boards.get((scope, scope_id))
+                if board is not None:
+                    board.set(user_id, score)
+
+    def _after_rollback(self, session, previous_transaction):
+        if previous_transaction.parent is None:
+            session.info.pop(PENDING_KEY, None)
+
+    # Reads
+
+    def board(self, scope, scope_id):
+        if scope not in SCOPES:
+            raise ValueError(f'Unknown leaderboard scope: {scope}')
+        key = (scope, scope_id)
+        with self._lock:
+            board = self._boards.get(key)
+            if board is not None and time.monotonic() - board.loaded_at < self.ttl:
+                self._boards.move_to_end(key)
+                return board
+        board = Board(read_session().execute(
+            select(LeaderboardEntry.user_id, LeaderboardEntry.score)
+            .where(LeaderboardEntry.scope == scope, LeaderboardEntry.scope_id == scope_id)
+        ).all())
+        with self._lock:
+            self._boards[key] = board
+            self._boards.move_to_end(key)
+            while len(self._boards) > self.max_boards:
+                self._boards.popitem(last=False)
+        return board
+
+    def top(self, scope, scope_id, k=10):
+        with self._lock_for_read(scope, scope_id) as board:
+            return board.top(k)
+
+    def standing(self, scope, scope_id, user_id):
+        with self._lock_for_read(scope, scope_id) as board:
+            return board.standing(user_id)
+
+    def neighbours(self, scope, scope_id, user_id, radius=2):
+        with self._lock_for_read(scope, scope_id) as board:
+            return board.around(user_id, radius)
+
+    def _lock_for_read(self, scope, scope_id):
+        board = self.board(scope, scope_id)
+        return _Locked(self._lock, board)
+
+    def clear(self):
+        with self._lock:
+            self._boards.clear()
+
+    # Rebuilds every leaderboard from UserScore; commits and returns the number of entries
+    def rebuild(self):
+        db.session.execute(LeaderboardEntry.__table__.delete())
+        for statement in REBUILD_SQL:
+            db.session.execute(text(statement))
+        db.session.commit()
+        self.clear()
+        return db.session.query(func.count()).select_from(LeaderboardEntry).scalar()
+
+
+class _Locked:
+    def __init__(self, lock, board):
+        self.lock, self.board = lock, board
+
+    def __enter__(self):
+        self.lock.acquire()
+        return self.board
+
+    def __exit__(self, *exc):
+        self.lock.release()
+
+
+REBUILD_SQL = (
+    "INSERT INTO leaderboard_entry (scope, scope_id, user_id, score) "
+    "SELECT 'quiz', quiz_id, user_id, MAX(score) FROM user_score GROUP BY quiz_id, user_id",
+    "INSERT INTO leaderboard_entry (scope, scope_id, user_id, score) "
+    "SELECT 'chapter', quiz.chapter_id, e.user_id, SUM(e.score) FROM leaderboard_entry e "
+    "JOIN quiz ON quiz.id = e.scope_id WHERE e.scope = 'quiz' GROUP BY quiz.chapter_id, e.user_id",
+    "INSERT INTO leaderboard_entry (scope, scope_id, user_id, score) "
+    "SELECT 'subject', chapter.subject_id, e.user_id, SUM(e.score) FROM leaderboard_entry e "
+    "JOIN chapter ON chapter.id = e.scope_id WHERE e.scope = 'chapter' GROUP BY chapter.subject_id, e.user_id",
+)
+
+
+leaderboards = Leaderboards()
@@ -0,0 +1,93 @@
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+from functools import wraps
+
+from flask import request, session, make_response
+from flask_login import current_user
+
+CachedPage = namedtuple('CachedPage', 'body gzipped etag')
+
+
+class PageCache:
+    """Rendered HTML of pages that look the same to every anonymous visitor.
+
+    Decorate a view with @page_cache.cached: the first anonymous GET renders it,
+    later ones get the stored bytes (gzipped when accepted) and a content ETag,
+    so a browser revalidation is a 304 without touching Jinja. Logged-in users,
+    pending flash messages and non-200 responses always go to the view. The
+    cache lives in process memory, so a deploy (restart) starts it empty.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.max_entries = 256
+        self._pages = OrderedDict()  # (path, query string) -> CachedPage
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        self.enabled = app.config.get('PAGE_CACHE_ENABLED', self.enabled)
+        self.max_entries = app.config.get('PAGE_CACHE_MAX_ENTRIES', self.max_entries)
+        app.extensions['page_cache'] = self
+
+    def cached(self, view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            if not self.enabled or request.method != 'GET' or current_user.is_authenticated \
+                    or '_flashes' in session:
+                return view(*args, **kwargs)
+            key = (request.path, request.query_string)
+            with self._lock:
+                page = self._pages.get(key)
+                if page is not None:
+                    self._pages.move_to_end(key)
+                    self.hits += 1
+            if page is None:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.mimetype != 'text/html':
+                    return response
+                page = self._store(key, response.get_data())
+            return self._respond(page)
+        return wrapped
+
+    def _store(self, key, body):
+        page = CachedPage(body, gzip.compress(body, compresslevel=9, mtime=0),
+                          hashlib.sha256(body).hexdigest()[:20])
+        with self._lock:
+            self.misses += 1
+            self._pages[key] = page
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.max_entries:
+                self._pages.popitem(last=False)
+        return page
+
+    def _respond(self, page):
+        gzipped = request.accept_encodings['gzip'] > 0
+        response = make_response(page.gzipped if gzipped else page.body)
+        response.mimetype = 'text/html'
+        if gzipped:
+            response.content_encoding = 'gzip'
+        response.set_etag(page.etag + ('-gzip' if gzipped else ''))
+        response.vary.add('Accept-Encoding')
+        response.cache_control.no_cache = True  # Revalidate, so logging in shows the personalised page
+        return response.make_conditional(request)
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._pages),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0,
+            }
+
+
+page_cache = PageCache()
@@ -0,0 +1,58 @@
+import base64
+import json
+from datetime import datetime, date
+
+from sqlalchemy import tuple_
+from models import db
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(values):
+    values = [v.isoformat() if isinstance(v, (datetime, date)) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(token, keys):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(keys):
+        raise ValueError("Invalid cursor")
+
+    decoded = []
+    for key, value in zip(keys, values):
+        if value is not None and isinstance(key.type, db.DateTime):
+            value = datetime.fromisoformat(value)
+        elif value is not None and isinstance(key.type, db.Date):
+            value = date.fromisoformat(value)
+        decoded.append(value)
+    return decoded
+
+
+def page_size(value):
+    try:
+        return min(max(int(value), 1), MAX_PAGE_SIZE)
+    except (TypeError, ValueError):
+        return DEFAULT_PAGE_SIZE
+
+
+# Seek pagination: `keys` must form a unique, indexed sort key (end with the
+# primary key) so every page is a single index range scan, however deep it is.
+def keyset_page(query, keys, after=None, limit=DEFAULT_PAGE_SIZE, descending=False):
+    if after:
+        boundary = tuple_(*keys) < tuple_(*decode_cursor(after, keys)) if descending \
+            else tuple_(*keys) > tuple_(*decode_cursor(after, keys))
+        query = query.filter(boundary)
+
+    order = [key.desc() for key in keys] if descending else list(keys)
+    rows = query.order_by(*order).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, key.key) for key in keys])
+    return rows, next_cursor
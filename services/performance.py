@@ -0,0 +1,55 @@
+from sqlalchemy import func
+from models import Quiz, UserScore, QuizScoreStats
+from services.database import read_session
+
+
+# Builds user_dashboard's performance_data in at most three grouped queries,
+# regardless of how many quizzes exist.
+def performance_summary(user_id):
+    session = read_session()
+    quiz_rows = (
+        session.query(Quiz.id, Quiz.title, QuizScoreStats.max_score,
+                         QuizScoreStats.total, QuizScoreStats.attempts)
+        .outerjoin(QuizScoreStats, QuizScoreStats.quiz_id == Quiz.id)
+        .order_by(Quiz.id)
+        .all()
+    )
+
+    user_best = dict(
+        session.query(UserScore.quiz_id, func.max(UserScore.score))
+        .filter(UserScore.user_id == user_id)
+        .group_by(UserScore.quiz_id)
+        .all()
+    )
+
+    # Quizzes the user has attempted but which have no aggregate row yet
+    # (e.g. before `flask rebuild-quiz-stats` has run) fall back to a live aggregate.
+    missing = [quiz_id for quiz_id, _, _, _, attempts in quiz_rows
+               if not attempts and quiz_id in user_best]
+    fallback = {}
+    if missing:
+        fallback = {
+            quiz_id: (highest, average)
+            for quiz_id, highest, average in (
+                session.query(UserScore.quiz_id, func.max(UserScore.score), func.avg(UserScore.score))
+                .filter(UserScore.quiz_id.in_(missing))
+                .group_by(UserScore.quiz_id)
+                .all()
+            )
+        }
+
+    performance_data = []
+    for quiz_id, title, highest, total, attempts in quiz_rows:
+        if attempts:
+            average = total / attempts
+        else:
+            highest, average = fallback.get(quiz_id, (0, 0))
+
+        performance_data.append({
+            "quiz_title": title,
+            "user_highest": user_best.get(quiz_id) or 0,
+            "highest_score": highest or 0,
+            "average_score": round(average or 0, 2)
+        })
+
+    return performance_data
@@ -0,0 +1,381 @@
+import codecs
+import csv
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+import uuid
+from datetime import datetime
+from itertools import islice
+
+from sqlalchemy import select, delete, tuple_
+from sqlalchemy.dialects.sqlite import insert
+
+from models import db, Subject, Chapter, Quiz, Question, ImportJob
+from models.quiz import QUESTION_ORDER
+from services.database import read_session
+from services.grading import option_index, UNANSWERED
+from services.quiz_cache import quiz_cache
+from services.catalog import catalog
+
+logger = logging.getLogger(__name__)
+
+# One row per question; a row without question_text only declares its subject/chapter/quiz
+FIELDS = (
+    'subject', 'subject_description', 'chapter', 'chapter_description',
+    'quiz', 'quiz_date', 'quiz_duration', 'quiz_remarks',
+    'question_text', 'option_1', 'option_2', 'option_3', 'option_4', 'correct_answer',
+)
+OPTIONS = ('option_1', 'option_2', 'option_3', 'option_4')
+FORMATS = ('csv', 'jsonl')
+CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+NAME_LENGTH = 200
+
+
+class RowError(ValueError):
+    pass
+
+
+def detect_format(filename, default='csv'):
+    extension = os.path.splitext(filename or '')[1].lower().lstrip('.')
+    if extension in ('jsonl', 'ndjson', 'json'):
+        return 'jsonl'
+    return 'csv' if extension == 'csv' else default
+
+
+# Yields (line_number, record, error) from a binary stream without reading it all into memory
+def iter_records(stream, fmt):
+    text = codecs.getreader('utf-8-sig')(stream, errors='replace')
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for record in reader:
+            yield reader.line_num, record, None
+    else:
+        for line_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_number, None, f'Invalid JSON: {e}'
+                continue
+            if isinstance(record, dict):
+                yield line_number, record, None
+            else:
+                yield line_number, None, 'Each line must be a JSON object'
+
+
+def clean(record, field, required=False, max_length=None):
+    value = record.get(field)
+    value = '' if value is None else str(value).strip()
+    if required and not value:
+        raise RowError(f'{field} is required')
+    if max_length and len(value) > max_length:
+        raise RowError(f'{field} is longer than {max_length} characters')
+    return value or None
+
+
+def validate(record):
+    row = {
+        'subject': clean(record, 'subject', required=True, max_length=NAME_LENGTH),
+        'subject_description': clean(record, 'subject_description'),
+        'chapter': clean(record, 'chapter', required=True, max_length=NAME_LENGTH),
+        'chapter_description': clean(record, 'chapter_description'),
+        'quiz': clean(record, 'quiz', required=True, max_length=NAME_LENGTH),
+        'quiz_remarks': clean(record, 'quiz_remarks'),
+        'question': None,
+    }
+    try:
+        quiz_date = clean(record, 'quiz_date')
+        row['quiz_date'] = datetime.strptime(quiz_date, '%Y-%m-%d').date() if quiz_date else None
+        duration = clean(record, 'quiz_duration')
+        row['quiz_duration'] = datetime.strptime(duration[:5], '%H:%M').time() if duration else None
+    except ValueError as e:
+        raise RowError(str(e))
+
+    question_text = clean(record, 'question_text')
+    if question_text:
+        question = {'question_text': question_text}
+        for option in OPTIONS:
+            question[option] = clean(record, option, required=True, max_length=NAME_LENGTH)
+        correct = option_index(clean(record, 'correct_answer', required=True))
+        if correct == UNANSWERED:
+            raise RowError('correct_answer must be 1-4 or option_1..option_4')
+        question['correct_answer'] = f'option_{correct + 1}'  # Stored the way add_questions stores it
+        row['question'] = question
+    return row
+
+
+class ImportReport:
+    def __init__(self):
+        self.rows_read = 0
+        self.questions_imported = 0
+        self.subjects_created = 0
+        self.chapters_created = 0
+        self.quizzes_created = 0
+        self.error_count = 0
+        self.errors = []  # First MAX_REPORTED_ERRORS of {'line', 'error'}
+        self.status = 'running'
+
+    def add_error(self, line, error):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'error': error})
+
+    def to_dict(self):
+        return dict(vars(self), errors=list(self.errors))
+
+
+class HierarchyResolver:
+    """Maps subject/chapter/quiz names to ids, creating missing parents in bulk.
+
+    The maps only grow with the number of distinct subjects, chapters and quizzes,
+    never with the number of question rows.
+    """
+
+    def __init__(self, report):
+        self.report = report
+        self.subjects = {}  # name -> id
+        self.chapters = {}  # (subject_id, name) -> id
+        self.quizzes = {}   # (chapter_id, title) -> id
+
+    def reset(self):
+        self.subjects.clear()
+        self.chapters.clear()
+        self.quizzes.clear()
+
+    def resolve(self, rows):
+        self._resolve_subjects(rows)
+        self._resolve_chapters(rows)
+        self._resolve_quizzes(rows)
+
+    def _resolve_subjects(self, rows):
+        wanted = {row['subject']: row for row in rows if row['subject'] not in self.subjects}
+        if not wanted:
+            return
+        self.subjects.update(db.session.execute(
+            select(Subject.name, Subject.id).where(Subject.name.in_(wanted))
+        ).all())
+        missing = [{'name': name, 'description': row['subject_description']}
+                   for name, row in wanted.items() if name not in self.subjects]
+        if missing:
+            db.session.execute(Subject.__table__.insert(), missing)
+            catalog.bump()
+            self.report.subjects_created += len(missing)
+            self.subjects.update(db.session.execute(
+                select(Subject.name, Subject.id).where(Subject.name.in_([m['name'] for m in missing]))
+            ).all())
+
+    def _resolve_chapters(self, rows):
+        wanted = {}
+        for row in rows:
+            key = (self.subjects[row['subject']], row['chapter'])
+            if key not in self.chapters:
+                wanted.setdefault(key, row)
+        if not wanted:
+            return
+        lookup = select(Chapter.subject_id, Chapter.name, Chapter.id)
+        for subject_id, name, chapter_id in db.session.execute(
+                lookup.where(tuple_(Chapter.subject_id, Chapter.name).in_(list(wanted)))):
+            self.chapters.setdefault((subject_id, name), chapter_id)
+        missing = [{'subject_id': key[0], 'name': key[1], 'description': row['chapter_description']}
+                   for key, row in wanted.items() if key not in self.chapters]
+        if missing:
+            db.session.execute(Chapter.__table__.insert(), missing)
+            catalog.bump()
+            self.report.chapters_created += len(missing)
+            keys = [(m['subject_id'], m['name']) for m in missing]
+            for subject_id, name, chapter_id in db.session.execute(
+                    lookup.where(tuple_(Chapter.subject_id, Chapter.name).in_(keys))):
+                self.chapters.setdefault((subject_id, name), chapter_id)
+
+    def _resolve_quizzes(self, rows):
+        wanted = {}
+        for row in rows:
+            key = (self.chapter_id(row), row['quiz'])
+            if key not in self.quizzes:
+                wanted.setdefault(key, row)
+        if not wanted:
+            return
+        lookup = select(Quiz.chapter_id, Quiz.title, Quiz.id)
+        for chapter_id, title, quiz_id in db.session.execute(
+                lookup.where(tuple_(Quiz.chapter_id, Quiz.title).in_(list(wanted)))):
+            self.quizzes.setdefault((chapter_id, title), quiz_id)
+        missing = [{'chapter_id': key[0], 'title': key[1], 'date_of_quiz': row['quiz_date'],
+                    'time_duration': row['quiz_duration'], 'remarks': row['quiz_remarks']}
+                   for key, row in wanted.items() if key not in self.quizzes]
+        if missing:
+            db.session.execute(Quiz.__table__.insert(), missing)
+            catalog.bump()
+            self.report.quizzes_created += len(missing)
+            keys = [(m['chapter_id'], m['title']) for m in missing]
+            for chapter_id, title, quiz_id in db.session.execute(
+                    lookup.where(tuple_(Quiz.chapter_id, Quiz.title).in_(keys))):
+                self.quizzes.setdefault((chapter_id, title), quiz_id)
+
+    def chapter_id(self, row):
+        return self.chapters[(self.subjects[row['subject']], row['chapter'])]
+
+    def quiz_id(self, row):
+        return self.quizzes[(self.chapter_id(row), row['quiz'])]
+
+
+# Streams `stream` into the database, one transaction per `chunk_size` rows.
+# Invalid rows are reported and skipped; a chunk that fails to write is rolled back
+# and reported as a whole. `progress(report)` is called after every chunk.
+def import_stream(stream, fmt='csv', chunk_size=CHUNK_SIZE, progress=None):
+    report = ImportReport()
+    resolver = HierarchyResolver(report)
+    records = iter_records(stream, fmt)
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            break
+        rows = []
+        for line, record, error in chunk:
+            report.rows_read += 1
+            if error is None:
+                try:
+                    rows.append((line, validate(record)))
+                    continue
+                except RowError as e:
+                    error = str(e)
+            report.add_error(line, error)
+        if rows:
+            write_chunk(rows, resolver, report)
+        if progress:
+            progress(report)
+    report.status = 'finished'
+    if progress:
+        progress(report)
+    return report
+
+
+def write_chunk(rows, resolver, report):
+    created = (report.subjects_created, report.chapters_created, report.quizzes_created)
+    try:
+        resolver.resolve([row for _, row in rows])
+        questions = [dict(row['question'], quiz_id=resolver.quiz_id(row)) for _, row in rows if row['question']]
+        if questions:
+            db.session.execute(Question.__table__.insert(), questions)
+            quiz_cache.invalidate_many({question['quiz_id'] for question in questions})
+        db.session.commit()
+        report.questions_imported += len(questions)
+    except Exception as e:
+        db.session.rollback()
+        # Parents created in the failed transaction no longer exist
+        resolver.reset()
+        report.subjects_created, report.chapters_created, report.quizzes_created = created
+        logger.exception("Question import chunk failed")
+        report.add_error(f'{rows[0][0]}-{rows[-1][0]}', f'Chunk rolled back: {e.__class__.__name__}: {e}')
+
+
+def import_file(path, fmt=None, chunk_size=CHUNK_SIZE, progress=None):
+    with open(path, 'rb') as stream:
+        return import_stream(stream, fmt or detect_format(path), chunk_size, progress)
+
+
+# Export: rows are streamed from the read-only pool, ordered so a re-import recreates the hierarchy
+def export_rows(subject_id=None, batch_size=CHUNK_SIZE):
+    query = (
+        select(Subject.name, Subject.description, Chapter.name, Chapter.description,
+               Quiz.title, Quiz.date_of_quiz, Quiz.time_duration, Quiz.remarks,
+               Question.question_text, Question.option_1, Question.option_2, Question.option_3,
+               Question.option_4, Question.correct_answer)
+        .select_from(Subject)
+        .join(Chapter, Chapter.subject_id == Subject.id)
+        .join(Quiz, Quiz.chapter_id == Chapter.id)
+        .outerjoin(Question, Question.quiz_id == Quiz.id)
+        .order_by(Subject.id, Chapter.id, Quiz.id, *QUESTION_ORDER)
+        .execution_options(yield_per=batch_size)
+    )
+    if subject_id is not None:
+        query = query.where(Subject.id == subject_id)
+    for values in read_session().execute(query):
+        row = dict(zip(FIELDS, values))
+        row['quiz_date'] = row['quiz_date'].isoformat() if row['quiz_date'] else None
+        row['quiz_duration'] = row['quiz_duration'].strftime('%H:%M') if row['quiz_duration'] else None
+        if row['correct_answer'] is not None:
+            row['correct_answer'] = option_index(row['correct_answer']) + 1
+        yield row
+
+
+def stream_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(FIELDS)
+    for row in rows:
+        writer.writerow(['' if row[field] is None else row[field] for field in FIELDS])
+        if buffer.tell() > 64 * 1024:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def stream_jsonl(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+class ImportJobs:
+    """Runs uploaded imports in background threads and keeps their progress for polling.
+
+    Progress lives in the import_job table, written after every chunk, so a poll
+    can be answered by any worker, not just the one running the import. The
+    newest `keep` jobs are kept.
+    """
+
+    def __init__(self, keep=50):
+        self.keep = keep
+
+    # Commits the request's transaction (the new job row)
+    def start(self, app, upload, fmt):
+        job_id = uuid.uuid4().hex
+        # Spool the upload to disk in chunks so the worker can outlive the request
+        handle, path = tempfile.mkstemp(suffix=f'.{fmt}', prefix='question_import_')
+        with os.fdopen(handle, 'wb') as spool:
+            upload.save(spool)
+        self._update(job_id, ImportReport())
+        kept = select(ImportJob.id).order_by(ImportJob.created_at.desc()).limit(self.keep)
+        db.session.execute(delete(ImportJob).where(ImportJob.id.notin_(kept)))
+        db.session.commit()
+        threading.Thread(target=self._run, args=(app, job_id, path, fmt),
+                         name=f'question-import-{job_id[:8]}', daemon=True).start()
+        return job_id
+
+    def _run(self, app, job_id, path, fmt):
+        try:
+            with app.app_context():
+                import_file(path, fmt, progress=lambda report: self._progress(job_id, report))
+        except Exception as e:
+            logger.exception("Question import %s failed", job_id)
+            report = ImportReport()
+            report.status = 'failed'
+            report.add_error(None, str(e))
+            with app.app_context():
+                self._progress(job_id, report)
+        finally:
+            os.remove(path)
+
+    # Called between chunks, when the import has no transaction open
+    def _progress(self, job_id, report):
+        self._update(job_id, report)
+        db.session.commit()
+
+    def _update(self, job_id, report):
+        now = datetime.utcnow()
+        stmt = insert(ImportJob).values(id=job_id, status=report.status, report=json.dumps(report.to_dict()),
+                                        created_at=now, updated_at=now)
+        db.session.execute(stmt.on_conflict_do_update(index_elements=['id'], set_={
+            'status': stmt.excluded.status, 'report': stmt.excluded.report, 'updated_at': now}))
+
+    def get(self, job_id):
+        report = read_session().execute(select(ImportJob.report).where(ImportJob.id == job_id)).scalar()
+        return json.loads(report) if report is not None else None
+
+
+import_jobs = ImportJobs()
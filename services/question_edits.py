@@ -0,0 +1,124 @@
+from sqlalchemy import select, update, delete, insert
+
+from models import db, Quiz, Question
+from services.grading import option_index, UNANSWERED
+from services.question_bank import OPTIONS, NAME_LENGTH
+from services.quiz_cache import quiz_cache
+
+EDITABLE = ('question_text',) + OPTIONS + ('correct_answer',)
+NEW_PREFIX = 'new:'  # `order` entries naming added questions by their index in `add`
+
+
+class PatchError(ValueError):
+    pass
+
+
+class VersionConflict(PatchError):
+    pass
+
+
+def clean_field(field, value):
+    if field not in EDITABLE:
+        raise PatchError(f'Unknown field: {field}')
+    value = '' if value is None else str(value).strip()
+    if not value:
+        raise PatchError(f'{field} cannot be empty')
+    if field in OPTIONS and len(value) > NAME_LENGTH:
+        raise PatchError(f'{field} is longer than {NAME_LENGTH} characters')
+    if field == 'correct_answer':
+        index = option_index(value)
+        if index == UNANSWERED:
+            raise PatchError('correct_answer must be 1-4 or option_1..option_4')
+        value = f'option_{index + 1}'
+    return value
+
+
+def question_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise PatchError(f'Invalid question id: {value!r}')
+
+
+# Applies a patch to a quiz's questions inside the current transaction (caller commits):
+#   {"base_version": 7,                                   # optional, 409 if the quiz moved on
+#    "update": {"12": {"option_2": "Paris"}},             # only the changed fields
+#    "add": [{"question_text": ..., "option_1": ..., ..., "correct_answer": 2}],
+#    "delete": [13],
+#    "order": [15, "new:0", 12]}                          # every remaining question, in display order
+# Field edits and position changes go out as one bulk UPDATE keyed by primary key;
+# unchanged values are dropped so untouched rows are never written.
+def apply_patch(quiz_id, patch):
+    if not isinstance(patch, dict):
+        raise PatchError('Patch must be a JSON object')
+    quiz_version = db.session.execute(select(Quiz.content_version).where(Quiz.id == quiz_id)).scalar()
+    base_version = patch.get('base_version')
+    if base_version is not None and base_version != quiz_version:
+        raise VersionConflict(f'Quiz is at version {quiz_version}, patch was made against {base_version}')
+
+    updates = {question_id(k): v for k, v in (patch.get('update') or {}).items()}
+    deletes = {question_id(v) for v in patch.get('delete') or ()}
+    adds = patch.get('add') or []
+    order = patch.get('order')
+
+    positions = dict(db.session.execute(
+        select(Question.id, Question.position).where(Question.quiz_id == quiz_id)
+    ).all())
+    unknown = (set(updates) | deletes) - set(positions)
+    if unknown:
+        raise PatchError(f'Questions not in this quiz: {sorted(unknown)}')
+    if set(updates) & deletes:
+        raise PatchError('A question cannot be both updated and deleted')
+
+    # Diff against the stored values so only real changes are written
+    changes = {}
+    if updates:
+        columns = [getattr(Question, field) for field in EDITABLE]
+        current = {row[0]: dict(zip(EDITABLE, row[1:])) for row in db.session.execute(
+            select(Question.id, *columns).where(Question.id.in_(updates))
+        )}
+        for qid, fields in updates.items():
+            if not isinstance(fields, dict):
+                raise PatchError(f'Update for question {qid} must be an object')
+            for field, value in fields.items():
+                value = clean_field(field, value)
+                if value != current[qid][field]:
+                    changes.setdefault(qid, {})[field] = value
+
+    new_rows = []
+    for i, fields in enumerate(adds):
+        if not isinstance(fields, dict):
+            raise PatchError(f'add[{i}] must be an object')
+        new_rows.append({'quiz_id': quiz_id, 'position': None,
+                         **{field: clean_field(field, fields.get(field)) for field in EDITABLE}})
+
+    reordered = 0
+    if order is not None:
+        remaining = set(positions) - deletes
+        expected = {str(qid) for qid in remaining} | {f'{NEW_PREFIX}{i}' for i in range(len(new_rows))}
+        tokens = [str(entry) for entry in order]
+        if len(tokens) != len(expected) or set(tokens) != expected:
+            raise PatchError('order must list every remaining and added question exactly once')
+        for position, token in enumerate(tokens):
+            if token.startswith(NEW_PREFIX):
+                new_rows[int(token[len(NEW_PREFIX):])]['position'] = position
+            elif positions[int(token)] != position:
+                changes.setdefault(int(token), {})['position'] = position
+                reordered += 1
+
+    if deletes:
+        db.session.execute(delete(Question).where(Question.id.in_(deletes)))
+    if changes:
+        db.session.execute(update(Question), [{'id': qid, **fields} for qid, fields in changes.items()])
+    added = []
+    if new_rows:
+        added = list(db.session.scalars(
+            insert(Question).returning(Question.id, sort_by_parameter_order=True), new_rows
+        ))
+
+    edited = sum(1 for fields in changes.values() if set(fields) - {'position'})
+    if changes or deletes or added:
+        quiz_cache.invalidate(quiz_id)
+        quiz_version += 1
+    return {'version': quiz_version, 'updated': edited, 'added': added,
+            'deleted': len(deletes), 'reordered': reordered}
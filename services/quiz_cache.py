@@ -0,0 +1,153 @@
+import threading
+from collections import OrderedDict, namedtuple
+
+from models import db, Quiz, Question
+from models.quiz import QUESTION_ORDER
+from services.grading import compile_key
+
+QuizSnapshot = namedtuple('QuizSnapshot', 'id title time_duration total_seconds version questions answer_key')
+QuestionSnapshot = namedtuple('QuestionSnapshot', 'id question_text option_1 option_2 option_3 option_4 correct_answer')
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+
+def build_snapshot(quiz_id):
+    quiz = db.session.get(Quiz, quiz_id)
+    if quiz is None:
+        return None
+    rows = (
+        db.session.query(Question.id, Question.question_text, Question.option_1, Question.option_2,
+                         Question.option_3, Question.option_4, Question.correct_answer)
+        .filter(Question.quiz_id == quiz_id)
+        .order_by(*QUESTION_ORDER)
+        .all()
+    )
+
+    total_seconds = 0
+    if quiz.time_duration:
+        total_seconds = quiz.time_duration.hour * 3600 + quiz.time_duration.minute * 60
+
+    questions = tuple(QuestionSnapshot(*row) for row in rows)
+    return QuizSnapshot(
+        id=quiz.id,
+        title=quiz.title,
+        time_duration=quiz.time_duration,
+        total_seconds=total_seconds,
+        version=quiz.content_version,
+        questions=questions,
+        answer_key=compile_key(questions),
+    )
+
+
+def snapshot_size(snapshot):
+    # Rough footprint: text payload plus fixed per-object overhead (incl. the answer key)
+    size = 200 + len(snapshot.title or '')
+    for question in snapshot.questions:
+        size += 250 + sum(len(str(value)) for value in question[1:])
+    return size
+
+
+class QuizCache:
+    """Read-through LRU cache of immutable quiz snapshots.
+
+    Entries are stamped with Quiz.content_version, which every admin edit bumps
+    in the same transaction, so a stale entry is never served even when the
+    edit happened in another worker process.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # quiz_id -> (snapshot, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def init_app(self, app):
+        self.max_bytes = app.config.get('QUIZ_CACHE_MAX_BYTES', self.max_bytes)
+        app.extensions['quiz_cache'] = self
+
+    # Current content version (None if the quiz is gone): one primary-key lookup
+    def version(self, quiz_id):
+        return db.session.query(Quiz.content_version).filter(Quiz.id == quiz_id).scalar()
+
+    def get(self, quiz_id):
+        version = self.version(quiz_id)
+        if version is None:
+            self.discard(quiz_id)
+            return None
+
+        with self._lock:
+            entry = self._entries.get(quiz_id)
+            if entry and entry[0].version == version:
+                self._entries.move_to_end(quiz_id)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        snapshot = build_snapshot(quiz_id)
+        if snapshot is not None:
+            self._store(snapshot)
+        return snapshot
+
+    def _store(self, snapshot):
+        size = snapshot_size(snapshot)
+        with self._lock:
+            self._remove(snapshot.id)
+            if size > self.max_bytes:
+                return
+            self._entries[snapshot.id] = (snapshot, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def _remove(self, quiz_id):
+        entry = self._entries.pop(quiz_id, None)
+        if entry:
+            self._bytes -= entry[1]
+
+    def discard(self, quiz_id):
+        with self._lock:
+            self._remove(quiz_id)
+
+    # Call before committing any change to a quiz or its questions
+    def invalidate(self, quiz_id):
+        self.invalidate_many([quiz_id])
+
+    def invalidate_many(self, quiz_ids):
+        quiz_ids = list(quiz_ids)
+        if not quiz_ids:
+            return
+        Quiz.query.filter(Quiz.id.in_(quiz_ids)).update(
+            {Quiz.content_version: Quiz.content_version + 1}, synchronize_session=False
+        )
+        with self._lock:
+            for quiz_id in quiz_ids:
+                self._remove(quiz_id)
+            self.invalidations += len(quiz_ids)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0,
+            }
+
+
+quiz_cache = QuizCache()
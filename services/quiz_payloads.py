@@ -0,0 +1,152 @@
+import gzip
+import json
+import threading
+from collections import OrderedDict, namedtuple
+
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+
+from models import db, QuizPayload
+from services.grading import OPTION_COUNT
+from services.quiz_cache import quiz_cache, QuestionSnapshot
+
+Payload = namedtuple('Payload', 'quiz_id version body gzipped')
+
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+
+
+def quiz_etag(quiz_id, version):
+    return f'quiz-{quiz_id}-v{version}'
+
+
+# The exam-taker's view of a snapshot: no correct answers, no user-specific state
+def serialize(snapshot):
+    return {
+        'id': snapshot.id,
+        'title': snapshot.title,
+        'version': snapshot.version,
+        'duration_seconds': snapshot.total_seconds or None,
+        'questions': [
+            {'id': question.id, 'text': question.question_text,
+             'options': [getattr(question, f'option_{n}') for n in range(1, OPTION_COUNT + 1)]}
+            for question in snapshot.questions
+        ],
+    }
+
+
+def build_payload(snapshot):
+    body = json.dumps(serialize(snapshot), separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    return encode_payload(snapshot.id, snapshot.version, body)
+
+
+def encode_payload(quiz_id, version, body):
+    # mtime=0 keeps the compressed bytes identical across workers and rebuilds
+    return Payload(quiz_id, version, body, gzip.compress(body, compresslevel=9, mtime=0))
+
+
+# The questions of a payload as snapshots without answers, for rendering the quiz page
+def payload_questions(payload):
+    return tuple(QuestionSnapshot(question['id'], question['text'], *question['options'], None)
+                 for question in json.loads(payload.body)['questions'])
+
+
+class PayloadCache:
+    """Serialized quiz payloads for the JSON API.
+
+    Each quiz version is encoded (and gzip-compressed) once and the bytes are
+    served as-is to every exam-taker; the ETag is derived from the version, so
+    a revalidation costs one primary-key lookup and no serialization. Versions
+    that attempts were opened against are also stored (QuizPayload), so an
+    attempt is always shown the questions its frozen key grades.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # (quiz_id, version) -> Payload
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        self.max_bytes = app.config.get('QUIZ_PAYLOAD_CACHE_MAX_BYTES', self.max_bytes)
+        app.extensions['quiz_payloads'] = self
+
+    # The payload for the quiz at `version` (from quiz_cache.version), or None if it is gone
+    def get(self, quiz_id, version):
+        payload = self._cached(quiz_id, version)
+        if payload is not None:
+            return payload
+        snapshot = quiz_cache.get(quiz_id)
+        if snapshot is None:
+            return None
+        return self._store(build_payload(snapshot))
+
+    # Stores the snapshot's payload for the attempts about to be opened against it; a no-op
+    # once the version is stored. Runs in the attempt's transaction (caller commits).
+    def freeze(self, snapshot):
+        payload = self._cached(snapshot.id, snapshot.version) or self._store(build_payload(snapshot))
+        db.session.execute(insert(QuizPayload).values(quiz_id=payload.quiz_id, version=payload.version,
+                                                      body=payload.body).on_conflict_do_nothing())
+        return payload
+
+    # The payload an attempt was opened against; None if that version was never frozen
+    # (attempts opened before payloads were stored) and is no longer current
+    def frozen(self, quiz_id, version):
+        payload = self._cached(quiz_id, version)
+        if payload is not None:
+            return payload
+        body = db.session.execute(
+            select(QuizPayload.body).where(QuizPayload.quiz_id == quiz_id, QuizPayload.version == version)
+        ).scalar()
+        if body is not None:
+            return self._store(encode_payload(quiz_id, version, body))
+        snapshot = quiz_cache.get(quiz_id)
+        if snapshot is None or snapshot.version != version:
+            return None
+        return self._store(build_payload(snapshot))
+
+    def _cached(self, quiz_id, version):
+        with self._lock:
+            payload = self._entries.get((quiz_id, version))
+            if payload is not None:
+                self._entries.move_to_end((quiz_id, version))
+                self.hits += 1
+                return payload
+            self.misses += 1
+        return None
+
+    def _store(self, payload):
+        key = (payload.quiz_id, payload.version)
+        size = len(payload.body) + len(payload.gzipped)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old.body) + len(old.gzipped)
+            if size <= self.max_bytes:
+                self._entries[key] = payload
+                self._bytes += size
+                while self._bytes > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._bytes -= len(evicted.body) + len(evicted.gzipped)
+        return payload
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0,
+            }
+
+
+quiz_payloads = PayloadCache()
@@ -0,0 +1,246 @@
+import math
+from collections import namedtuple
+from datetime import datetime, time, timedelta
+
+from sqlalchemy import select, delete, func, literal
+from sqlalchemy.dialects.sqlite import insert
+
+from models import db, Quiz, Chapter, UserScore, ScoreRollup
+from models.rollup import SCOPES, PERIODS
+from services.database import read_session
+
+DEFAULT_POINTS = 200
+MAX_POINTS = 1000
+
+COLUMNS = ['scope', 'scope_id', 'period', 'bucket', 'attempts', 'total', 'sum_squares', 'min_score', 'max_score']
+
+Point = namedtuple('Point', 'start attempts average sd lowest highest')
+Trend = namedtuple('Trend', 'scope scope_id start end bucket_days points')
+
+
+def bucket_of(period, day):
+    return day if period == 'day' else day - timedelta(days=day.weekday())
+
+
+# bucket_of in SQL: 'weekday 0' moves to the coming Sunday (or stays on one), six days back is its Monday
+def _bucket_sql(period):
+    if period == 'day':
+        return func.date(UserScore.date_taken)
+    return func.date(UserScore.date_taken, 'weekday 0', '-6 days')
+
+
+def _scope_column(scope):
+    return {'quiz': UserScore.quiz_id, 'chapter': Quiz.chapter_id, 'subject': Chapter.subject_id,
+            'user': UserScore.user_id}[scope]
+
+
+def _parents(quiz_ids):
+    return {quiz_id: (chapter_id, subject_id) for quiz_id, chapter_id, subject_id in db.session.execute(
+        select(Quiz.id, Quiz.chapter_id, Chapter.subject_id)
+        .join(Chapter, Chapter.id == Quiz.chapter_id).where(Quiz.id.in_(quiz_ids))
+        .execution_options(include_deleted=True)
+    )}
+
+
+# Called with the UserScore rows being inserted (see score_writer.save_scores), so the
+# rollups commit together with them: one upsert per touched bucket
+def record_scores(rows):
+    parents = _parents({row['quiz_id'] for row in rows})
+    sums = {}
+    for row in rows:
+        if row['quiz_id'] not in parents:
+            continue
+        chapter_id, subject_id = parents[row['quiz_id']]
+        score = row['score']
+        day = (row.get('date_taken') or datetime.utcnow()).date()
+        for scope, scope_id in (('quiz', row['quiz_id']), ('chapter', chapter_id), ('subject', subject_id),
+                                ('user', row['user_id'])):
+            for period in PERIODS:
+                key = (scope, scope_id, period, bucket_of(period, day))
+                entry = sums.get(key)
+                if entry is None:
+                    sums[key] = [1, score, score * score, score, score]
+                else:
+                    entry[0] += 1
+                    entry[1] += score
+                    entry[2] += score * score
+                    entry[3] = min(entry[3], score)
+                    entry[4] = max(entry[4], score)
+    if not sums:
+        return
+
+    rollup = ScoreRollup.__table__.c
+    stmt = insert(ScoreRollup)
+    db.session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=['scope', 'scope_id', 'period', 'bucket'],
+            set_={
+                'attempts': rollup.attempts + stmt.excluded.attempts,
+                'total': rollup.total + stmt.excluded.total,
+                'sum_squares': rollup.sum_squares + stmt.excluded.sum_squares,
+                'min_score': func.min(rollup.min_score, stmt.excluded.min_score),
+                'max_score': func.max(rollup.max_score, stmt.excluded.max_score),
+            }
+        ),
+        [dict(zip(COLUMNS, key + tuple(entry))) for key, entry in sums.items()]
+    )
+
+
+def _aggregates(scope, period):
+    column, bucket = _scope_column(scope), _bucket_sql(period)
+    query = select(
+        literal(scope), column, literal(period), bucket,
+        func.count(), func.sum(UserScore.score), func.sum(UserScore.score * UserScore.score),
+        func.min(UserScore.score), func.max(UserScore.score),
+    ).where(UserScore.date_taken.isnot(None))
+    if scope in ('chapter', 'subject'):
+        query = query.join(Quiz, Quiz.id == UserScore.quiz_id)
+    if scope == 'subject':
+        query = query.join(Chapter, Chapter.id == Quiz.chapter_id)
+    return query.group_by(column, bucket)
+
+
+# Rewrites the day and week rows of `ids` (a list or a subquery) for the whole weeks
+# spanning start..stop from UserScore; `kept` leaves out scores about to be deleted.
+# Caller commits.
+def _recompute(scope, ids, start, stop, *kept):
+    first = bucket_of('week', start)
+    last = bucket_of('week', stop) + timedelta(days=7)
+    db.session.execute(
+        delete(ScoreRollup).where(ScoreRollup.scope == scope, ScoreRollup.scope_id.in_(ids),
+                                  ScoreRollup.bucket >= first, ScoreRollup.bucket < last)
+        .execution_options(synchronize_session=False)
+    )
+    for period in PERIODS:
+        db.session.execute(ScoreRollup.__table__.insert().from_select(COLUMNS, _aggregates(scope, period).where(
+            _scope_column(scope).in_(ids), *kept,
+            UserScore.date_taken >= datetime.combine(first, time()),
+            UserScore.date_taken < datetime.combine(last, time()),
+        )))
+
+
+# Edits and deletes are rare admin actions; min/max can't be unwound incrementally,
+# so the score's buckets are recomputed (after the change, before the commit)
+def refresh(user_id, quiz_id, date_taken):
+    db.session.flush()
+    parents = _parents([quiz_id])
+    if quiz_id not in parents or date_taken is None:
+        return
+    chapter_id, subject_id = parents[quiz_id]
+    day = date_taken.date()
+    for scope, scope_id in (('quiz', quiz_id), ('chapter', chapter_id), ('subject', subject_id), ('user', user_id)):
+        _recompute(scope, [scope_id], day, day)
+
+
+def _span(condition):
+    return db.session.execute(
+        select(func.min(UserScore.date_taken), func.max(UserScore.date_taken)).where(condition)).one()
+
+
+# Drops the quizzes' rollups and recomputes their chapters', subjects' and takers' without
+# them; run while their scores still exist (i.e. before they are deleted)
+def remove_quizzes(quiz_ids):
+    quiz_ids = list(quiz_ids)
+    if not quiz_ids:
+        return
+    db.session.flush()
+    start, stop = _span(UserScore.quiz_id.in_(quiz_ids))
+    db.session.execute(delete(ScoreRollup).where(ScoreRollup.scope == 'quiz', ScoreRollup.scope_id.in_(quiz_ids)))
+    if start is None:
+        return
+    kept = UserScore.quiz_id.notin_(quiz_ids)
+    chapters = select(Quiz.chapter_id).where(Quiz.id.in_(quiz_ids)).correlate(None)
+    subjects = select(Chapter.subject_id).join(Quiz, Quiz.chapter_id == Chapter.id) \
+        .where(Quiz.id.in_(quiz_ids)).correlate(None)
+    takers = select(UserScore.user_id).where(UserScore.quiz_id.in_(quiz_ids)).correlate(None)
+    for scope, ids in (('chapter', chapters), ('subject', subjects), ('user', takers)):
+        _recompute(scope, ids, start.date(), stop.date(), kept)
+
+
+# Same for a user: their own rollups go, the quizzes they took are recomputed without them
+def remove_user(user_id):
+    db.session.flush()
+    start, stop = _span(UserScore.user_id == user_id)
+    db.session.execute(delete(ScoreRollup).where(ScoreRollup.scope == 'user', ScoreRollup.scope_id == user_id))
+    if start is None:
+        return
+    kept = UserScore.user_id != user_id
+    taken = select(UserScore.quiz_id).where(UserScore.user_id == user_id).correlate(None)
+    chapters = select(Quiz.chapter_id).where(Quiz.id.in_(taken)).correlate(None)
+    subjects = select(Chapter.subject_id).join(Quiz, Quiz.chapter_id == Chapter.id) \
+        .where(Quiz.id.in_(taken)).correlate(None)
+    for scope, ids in (('quiz', taken), ('chapter', chapters), ('subject', subjects)):
+        _recompute(scope, ids, start.date(), stop.date(), kept)
+
+
+# A quiz moved to another chapter (already assigned): its history moves from the old
+# chapter's and subject's rows to the new ones, over the span of its scores
+def quiz_moved(quiz_id, old_chapter_id):
+    db.session.flush()
+    start, stop = _span(UserScore.quiz_id == quiz_id)
+    if start is None:
+        return
+    chapter_ids = {old_chapter_id, _parents([quiz_id])[quiz_id][0]}
+    subject_ids = set(db.session.scalars(
+        select(Chapter.subject_id).where(Chapter.id.in_(chapter_ids)).execution_options(include_deleted=True)))
+    _recompute('chapter', list(chapter_ids), start.date(), stop.date())
+    _recompute('subject', list(subject_ids), start.date(), stop.date())
+
+
+# A chapter moved to another subject (already assigned); its own rows are unchanged
+def chapter_moved(chapter_id, old_subject_id):
+    db.session.flush()
+    start, stop = _span(UserScore.quiz_id.in_(select(Quiz.id).where(Quiz.chapter_id == chapter_id)))
+    if start is None:
+        return
+    new_subject_id = db.session.execute(select(Chapter.subject_id).where(Chapter.id == chapter_id)).scalar()
+    _recompute('subject', [old_subject_id, new_subject_id], start.date(), stop.date())
+
+
+# Backfill: rebuild the whole table from UserScore, one INSERT ... SELECT per scope and period
+def rebuild():
+    db.session.execute(delete(ScoreRollup))
+    for scope in SCOPES:
+        for period in PERIODS:
+            db.session.execute(ScoreRollup.__table__.insert().from_select(COLUMNS, _aggregates(scope, period)))
+    db.session.commit()
+    return db.session.query(func.count()).select_from(ScoreRollup).scalar()
+
+
+# Score history of a quiz, chapter, subject or user between two dates in at most `points`
+# buckets: daily when the range allows, else weekly rows merged into equal runs of weeks.
+# Weeks are whole, so the first and last points may reach a few days past the range.
+def trend(scope, scope_id, start, end, points=DEFAULT_POINTS):
+    if scope not in SCOPES:
+        raise ValueError(f'Unknown trend scope: {scope}')
+    if end < start:
+        raise ValueError('end is before start')
+    points = min(max(points, 1), MAX_POINTS)
+    if (end - start).days + 1 <= points:
+        period, origin, width = 'day', start, 1
+    else:
+        period, origin = 'week', bucket_of('week', start)
+        width = 7 * math.ceil(((end - origin).days // 7 + 1) / points)
+
+    rows = read_session().execute(
+        select(ScoreRollup.bucket, ScoreRollup.attempts, ScoreRollup.total, ScoreRollup.sum_squares,
+               ScoreRollup.min_score, ScoreRollup.max_score)
+        .where(ScoreRollup.scope == scope, ScoreRollup.scope_id == scope_id, ScoreRollup.period == period,
+               ScoreRollup.bucket >= origin, ScoreRollup.bucket <= end)
+        .order_by(ScoreRollup.bucket)
+    ).all()
+    merged = {}  # run index -> [attempts, total, sum_squares, min, max]; rows arrive in order
+    for bucket, attempts, total, sum_squares, lowest, highest in rows:
+        entry = merged.setdefault((bucket - origin).days // width, [0, 0, 0, lowest, highest])
+        entry[0] += attempts
+        entry[1] += total
+        entry[2] += sum_squares
+        entry[3] = min(entry[3], lowest)
+        entry[4] = max(entry[4], highest)
+
+    series = []
+    for index, (attempts, total, sum_squares, lowest, highest) in merged.items():
+        mean = total / attempts
+        series.append(Point(origin + timedelta(days=index * width), attempts, round(mean, 2),
+                            round(math.sqrt(max(sum_squares / attempts - mean * mean, 0)), 2), lowest, highest))
+    return Trend(scope, scope_id, origin, end, width, series)
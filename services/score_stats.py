@@ -0,0 +1,113 @@
+from sqlalchemy import func, case
+from sqlalchemy.dialects.sqlite import insert
+from models import db, Quiz, UserScore, QuizScoreStats
+from services.database import read_session
+
+
+# Called in the same session as the UserScore insert, so both commit together
+def record_score(quiz_id, score):
+    stmt = insert(QuizScoreStats).values(
+        quiz_id=quiz_id, attempts=1, total=score, sum_squares=score * score,
+        min_score=score, max_score=score
+    )
+    stats = QuizScoreStats.__table__.c
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['quiz_id'],
+        set_={
+            'attempts': stats.attempts + 1,
+            'total': stats.total + score,
+            'sum_squares': stats.sum_squares + score * score,
+            'min_score': case((stats.min_score.is_(None), score), else_=func.min(stats.min_score, score)),
+            'max_score': case((stats.max_score.is_(None), score), else_=func.max(stats.max_score, score)),
+        }
+    )
+    db.session.execute(stmt)
+
+
+# Edits and deletes are rare admin actions; min/max can't be unwound incrementally,
+# so the affected quiz is recomputed from its UserScore rows in one aggregate query.
+def refresh_quiz(quiz_id):
+    db.session.flush()
+    attempts, total, sum_squares, lowest, highest = db.session.query(
+        func.count(UserScore.id),
+        func.coalesce(func.sum(UserScore.score), 0),
+        func.coalesce(func.sum(UserScore.score * UserScore.score), 0),
+        func.min(UserScore.score),
+        func.max(UserScore.score),
+    ).filter(UserScore.quiz_id == quiz_id).one()
+
+    stats = db.session.get(QuizScoreStats, quiz_id)
+    if not attempts:
+        if stats:
+            db.session.delete(stats)
+        return
+    if not stats:
+        stats = QuizScoreStats(quiz_id=quiz_id)
+        db.session.add(stats)
+    stats.attempts = attempts
+    stats.total = total
+    stats.sum_squares = sum_squares
+    stats.min_score = lowest
+    stats.max_score = highest
+
+
+def remove_quiz(quiz_id):
+    QuizScoreStats.query.filter_by(quiz_id=quiz_id).delete()
+
+
+# Set-based refresh_quiz for many quizzes at once (e.g. after deleting a user's scores)
+def refresh_quizzes(quiz_ids):
+    quiz_ids = list(quiz_ids)
+    if not quiz_ids:
+        return
+    db.session.flush()
+    QuizScoreStats.query.filter(QuizScoreStats.quiz_id.in_(quiz_ids)).delete(synchronize_session=False)
+    db.session.execute(
+        QuizScoreStats.__table__.insert().from_select(
+            ['quiz_id', 'attempts', 'total', 'sum_squares', 'min_score', 'max_score'],
+            _aggregates().filter(UserScore.quiz_id.in_(quiz_ids))
+        )
+    )
+
+
+# Backfill: rebuild the whole table from UserScore in a single INSERT ... SELECT
+def rebuild():
+    QuizScoreStats.query.delete()
+    db.session.execute(
+        QuizScoreStats.__table__.insert().from_select(
+            ['quiz_id', 'attempts', 'total', 'sum_squares', 'min_score', 'max_score'],
+            _aggregates()
+        )
+    )
+    db.session.commit()
+    return QuizScoreStats.query.count()
+
+
+def _aggregates():
+    return db.session.query(
+        UserScore.quiz_id,
+        func.count(UserScore.id),
+        func.sum(UserScore.score),
+        func.sum(UserScore.score * UserScore.score),
+        func.min(UserScore.score),
+        func.max(UserScore.score),
+    ).group_by(UserScore.quiz_id)
+
+
+def quiz_stats():
+    rows = (
+        read_session().query(Quiz.title, QuizScoreStats)
+        .outerjoin(QuizScoreStats, QuizScoreStats.quiz_id == Quiz.id)
+        .order_by(Quiz.id)
+        .all()
+    )
+    return [
+        {
+            "title": title or "Unknown",
+            "highest": stats.max_score if stats else 0,
+            "lowest": stats.min_score if stats else 0,
+            "average": stats.average if stats else 0,
+            "attempts": stats.attempts if stats else 0,
+        }
+        for title, stats in rows
+    ]
@@ -0,0 +1,358 @@
+import atexit
+import glob
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from models import db, UserScore, User, Quiz
+from services import score_stats, score_rollups
+from services.leaderboard import leaderboards
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRIES = 5  # Failed writes per row before it goes to the dead-letter file
+
+
+# Non-blocking exclusive lock, held for the life of the file object; False if another
+# process holds it. The OS drops it when the holder exits, however it exits.
+def _try_lock(spool):
+    try:
+        if fcntl is not None:
+            fcntl.flock(spool.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(spool.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+
+def new_submission_id():
+    return uuid.uuid4().hex
+
+
+# Single write path for new scores (sync route and background writer alike):
+# bulk insert plus every aggregate that hangs off UserScore. Caller commits.
+def save_scores(rows):
+    if not rows:
+        return
+    db.session.execute(UserScore.__table__.insert(), rows)
+    for row in rows:
+        score_stats.record_score(row['quiz_id'], row['score'])
+    score_rollups.record_scores(rows)
+    leaderboards.record_scores(rows)
+
+
+class ScoreWriter:
+    """Accepts graded results immediately and group-commits them in the background.
+
+    Every accepted row is appended (and fsynced) to this process's own spool file
+    before it is acknowledged, and the spool is truncated once the queue drains.
+    Each worker holds a lock on its spool while it runs; on startup a worker adopts
+    the spools of dead ones (unlocked files), so a crash never loses an accepted
+    submission. Replayed rows are de-duplicated on UserScore.submission_id. A row
+    that still fails after MAX_RETRIES attempts is moved to dead_letter.jsonl.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.enabled = False
+        self.batch_size = 500
+        self.flush_interval = 0.05
+        self.fsync = True
+        self.max_retries = MAX_RETRIES
+        self.spool_dir = None
+        self.spool_path = None
+        self._queue = queue.Queue()
+        self._pending = {}  # submission_id -> row, until committed
+        self._retries = {}  # submission_id -> failed attempts
+        self._lock = threading.Lock()
+        self._spool = None
+        self._thread = None
+        self._stopping = threading.Event()
+        self.metrics = {
+            'accepted': 0, 'persisted': 0, 'duplicates': 0, 'orphaned': 0, 'batches': 0, 'failures': 0,
+            'dead_lettered': 0, 'adopted': 0,
+            'last_batch_size': 0, 'max_batch_size': 0,
+            'last_commit_ms': 0.0, 'max_commit_ms': 0.0, 'total_commit_ms': 0.0,
+        }
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get('SCORE_QUEUE_ENABLED', False)
+        self.batch_size = app.config.get('SCORE_QUEUE_BATCH_SIZE', self.batch_size)
+        self.flush_interval = app.config.get('SCORE_QUEUE_FLUSH_INTERVAL', self.flush_interval)
+        self.fsync = app.config.get('SCORE_QUEUE_FSYNC', self.fsync)
+        self.max_retries = app.config.get('SCORE_QUEUE_MAX_RETRIES', self.max_retries)
+        self.spool_dir = app.config.get('SCORE_QUEUE_SPOOL_DIR') or os.path.join(app.instance_path, 'score_spool')
+        app.extensions['score_writer'] = self
+        if self.enabled:
+            self.start()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        os.makedirs(self.spool_dir, exist_ok=True)
+        # Unique per process (pids get reused), so no two workers ever share a spool
+        self.spool_path = os.path.join(self.spool_dir, f'spool-{os.getpid()}-{uuid.uuid4().hex[:8]}.jsonl')
+        self._spool = open(self.spool_path, 'a', encoding='utf-8')
+        if not _try_lock(self._spool):
+            raise RuntimeError(f"Score spool {self.spool_path} is locked")
+        self._adopt_spools()
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name='score-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    # Takes over the spools of workers that exited before draining: their rows are copied
+    # into this worker's spool (fsynced) and queued, then the old file is deleted
+    def _adopt_spools(self):
+        adopted = []
+        legacy = os.path.join(self.app.instance_path, 'score_spool.jsonl')  # Shared spool of older releases
+        paths = sorted(glob.glob(os.path.join(self.spool_dir, 'spool-*.jsonl')))
+        for path in paths + ([legacy] if os.path.exists(legacy) else []):
+            if path == self.spool_path:
+                continue
+            with open(path, 'a+', encoding='utf-8') as spool:
+                # Locked: its worker is alive. Unlinked: another worker adopted it first.
+                if not _try_lock(spool) or os.fstat(spool.fileno()).st_nlink == 0:
+                    continue
+                spool.seek(0)
+                for line in spool:
+                    try:
+                        row = self._decode(json.loads(line))
+                    except (ValueError, KeyError):
+                        continue  # Torn final line from a crash mid-write
+                    self._spool.write(line if line.endswith('\n') else line + '\n')
+                    adopted.append(row)
+                self._spool.flush()
+                os.fsync(self._spool.fileno())
+                if fcntl is not None:
+                    os.remove(path)  # Before unlocking, so nobody else replays it
+            if fcntl is None:
+                os.remove(path)  # Windows can't delete an open file; a second replay is de-duplicated
+        for row in adopted:
+            self._pending[row['submission_id']] = row
+            self._queue.put(row)
+        self.metrics['adopted'] += len(adopted)
+        if adopted:
+            logger.info("Replaying %d spooled score(s)", len(adopted))
+
+    @staticmethod
+    def _decode(entry):
+        return {
+            'submission_id': entry['submission_id'],
+            'user_id': entry['user_id'],
+            'quiz_id': entry['quiz_id'],
+            'score': entry['score'],
+            'date_taken': datetime.fromisoformat(entry['date_taken']),
+        }
+
+    def submit(self, user_id, quiz_id, score, date_taken=None):
+        row = {
+            'submission_id': new_submission_id(),
+            'user_id': user_id,
+            'quiz_id': quiz_id,
+            'score': score,
+            'date_taken': date_taken or datetime.utcnow(),
+        }
+        entry = dict(row, date_taken=row['date_taken'].isoformat())
+        with self._lock:
+            if self._stopping.is_set():
+                return None  # Shutting down; the caller saves inline
+            self._spool.write(json.dumps(entry) + '\n')
+            self._spool.flush()
+            if self.fsync:
+                os.fsync(self._spool.fileno())
+            self._pending[row['submission_id']] = row
+            self.metrics['accepted'] += 1
+            self._queue.put(row)  # Before the lock is released, so stop() always drains it
+        return row['submission_id']
+
+    def pending(self, submission_id):
+        with self._lock:
+            return self._pending.get(submission_id)
+
+    # A row accepted by any worker sharing the spool directory and not yet committed.
+    # Spools are truncated whenever their queue drains, so this reads a few lines.
+    def spooled(self, submission_id):
+        for path in glob.glob(os.path.join(self.spool_dir, 'spool-*.jsonl')):
+            try:
+                with open(path, encoding='utf-8') as spool:
+                    for line in spool:
+                        if submission_id in line:
+                            try:
+                                row = self._decode(json.loads(line))
+                            except (ValueError, KeyError):
+                                continue
+                            if row['submission_id'] == submission_id:
+                                return row
+            except FileNotFoundError:
+                continue  # Adopted and removed while we looked
+        return None
+
+    def _next_batch(self):
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stopping.is_set() or not self._queue.empty():
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch):
+        start = time.perf_counter()
+        try:
+            with self.app.app_context():
+                ids = [row['submission_id'] for row in batch]
+                existing = {
+                    submission_id for (submission_id,) in
+                    db.session.query(UserScore.submission_id).filter(UserScore.submission_id.in_(ids))
+                }
+                fresh = [row for row in batch if row['submission_id'] not in existing]
+                save_scores(fresh)
+                db.session.commit()
+        except Exception as exc:
+            if isinstance(exc, IntegrityError):
+                kept = self._drop_orphans(batch)
+                if len(kept) < len(batch):
+                    for row in kept:
+                        self._queue.put(row)
+                    return
+            logger.exception("Score batch of %d failed", len(batch))
+            retry, dead = [], []
+            with self._lock:
+                self.metrics['failures'] += 1
+                for row in batch:
+                    failures = self._retries.get(row['submission_id'], 0) + 1
+                    self._retries[row['submission_id']] = failures
+                    (dead if failures >= self.max_retries else retry).append(row)
+            if dead:
+                self._dead_letter(dead)
+            time.sleep(1)
+            for row in retry:
+                self._queue.put(row)
+            return
+
+        elapsed = (time.perf_counter() - start) * 1000
+        with self._lock:
+            for row in batch:
+                self._pending.pop(row['submission_id'], None)
+                self._retries.pop(row['submission_id'], None)
+            metrics = self.metrics
+            metrics['persisted'] += len(fresh)
+            metrics['duplicates'] += len(batch) - len(fresh)
+            metrics['batches'] += 1
+            metrics['last_batch_size'] = len(batch)
+            metrics['max_batch_size'] = max(metrics['max_batch_size'], len(batch))
+            metrics['last_commit_ms'] = elapsed
+            metrics['max_commit_ms'] = max(metrics['max_commit_ms'], elapsed)
+            metrics['total_commit_ms'] += elapsed
+            # Everything accepted so far is durable in the database; start a fresh spool
+            if not self._pending:
+                self._spool.truncate(0)
+                self._spool.seek(0)
+
+    # Rows that keep failing are set aside for an operator instead of blocking the queue
+    # forever; they stay in the spool until written here, so a crash in between loses nothing
+    def _dead_letter(self, rows):
+        with self._lock, open(os.path.join(self.spool_dir, 'dead_letter.jsonl'), 'a', encoding='utf-8') as out:
+            for row in rows:
+                out.write(json.dumps(dict(row, date_taken=row['date_taken'].isoformat())) + '\n')
+            out.flush()
+            os.fsync(out.fileno())
+            for row in rows:
+                self._pending.pop(row['submission_id'], None)
+                self._retries.pop(row['submission_id'], None)
+            self.metrics['dead_lettered'] += len(rows)
+        logger.error("Moved %d score(s) to the dead-letter file after %d failed writes", len(rows), self.max_retries)
+
+    # Rows whose quiz or user was deleted while they were queued can never be written
+    # (foreign keys are enforced); they are dropped and the rest of the batch kept
+    def _drop_orphans(self, batch):
+        with self.app.app_context():
+            quizzes = set(db.session.scalars(
+                select(Quiz.id).where(Quiz.id.in_({row['quiz_id'] for row in batch}))
+                .execution_options(include_deleted=True)))
+            users = set(db.session.scalars(select(User.id).where(User.id.in_({row['user_id'] for row in batch}))))
+        kept = [row for row in batch if row['quiz_id'] in quizzes and row['user_id'] in users]
+        with self._lock:
+            for row in batch:
+                if row['quiz_id'] not in quizzes or row['user_id'] not in users:
+                    self._pending.pop(row['submission_id'], None)
+                    self._retries.pop(row['submission_id'], None)
+            self.metrics['orphaned'] += len(batch) - len(kept)
+        if len(kept) < len(batch):
+            logger.warning("Dropped %d queued score(s) for deleted quizzes or users", len(batch) - len(kept))
+        return kept
+
+    def stop(self, timeout=10):
+        if not self._thread:
+            return
+        with self._lock:
+            self._stopping.set()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            # Still writing: it keeps its spool, which the next worker adopts if this one exits first
+            logger.warning("Score writer still draining after %ss", timeout)
+            return
+        self._thread = None
+        with self._lock:
+            if not self._pending:
+                os.remove(self.spool_path)  # Fully drained; nothing for the next worker to adopt
+            self._spool.close()
+
+    def stats(self):
+        with self._lock:
+            metrics = dict(self.metrics)
+            metrics['queue_depth'] = len(self._pending)
+        metrics['enabled'] = self.enabled
+        written = metrics['persisted'] + metrics['duplicates']
+        metrics['avg_batch_size'] = round(written / metrics['batches'], 2) if metrics['batches'] else 0
+        metrics['avg_commit_ms'] = round(metrics['total_commit_ms'] / metrics['batches'], 3) if metrics['batches'] else 0
+        return metrics
+
+
+score_writer = ScoreWriter()
+
+
+# One graded result from a request: handed to the background writer when the score queue
+# is on, otherwise saved inline. Commits the request's transaction either way (it holds the
+# closed attempt). Returns (submission_id, 'queued' | 'persisted').
+def record_result(user_id, quiz_id, score):
+    if score_writer.enabled:
+        submission_id = score_writer.submit(user_id, quiz_id, score)
+        if submission_id is not None:
+            db.session.commit()
+            return submission_id, 'queued'
+    submission_id = new_submission_id()
+    save_scores([{'submission_id': submission_id, 'user_id': user_id, 'quiz_id': quiz_id,
+                  'score': score, 'date_taken': datetime.utcnow()}])
+    db.session.commit()
+    return submission_id, 'persisted'
@@ -0,0 +1,131 @@
+import re
+from collections import namedtuple
+
+from markupsafe import Markup, escape
+from sqlalchemy import text
+
+from models import db
+from services.database import read_session
+
+# One external-content FTS5 table per searchable entity, kept in sync by triggers
+SEARCH_INDEXES = {
+    'users': {'fts': 'search_users', 'table': 'user', 'columns': ('full_name', 'email')},
+    'subjects': {'fts': 'search_subjects', 'table': 'subject', 'columns': ('name', 'description')},
+    'quizzes': {'fts': 'search_quizzes', 'table': 'quiz', 'columns': ('title', 'remarks')},
+    'questions': {'fts': 'search_questions', 'table': 'question',
+                  'columns': ('question_text', 'option_1', 'option_2', 'option_3', 'option_4')},
+}
+
+# Extra (non-indexed) fields shown next to each hit; soft-deleted rows are left out
+DETAIL_SQL = {
+    'users': "SELECT t.id, t.role AS detail FROM user t",
+    'subjects': "SELECT t.id, NULL AS detail FROM subject t WHERE t.deleted_at IS NULL",
+    'quizzes': "SELECT t.id, chapter.name AS detail FROM quiz t LEFT JOIN chapter ON chapter.id = t.chapter_id "
+               "WHERE t.deleted_at IS NULL",
+    'questions': "SELECT t.id, quiz.title AS detail FROM question t LEFT JOIN quiz ON quiz.id = t.quiz_id "
+                 "WHERE quiz.deleted_at IS NULL",
+}
+
+SearchHit = namedtuple('SearchHit', 'category id rank fields detail')
+SearchPage = namedtuple('SearchPage', 'hits total page per_page')
+
+# Control characters can't come from form input, so they're safe highlight markers
+MARK_START, MARK_END = '\x02', '\x03'
+
+
+def index_ddl(category):
+    spec = SEARCH_INDEXES[category]
+    fts, table, columns = spec['fts'], spec['table'], spec['columns']
+    cols = ', '.join(columns)
+    new_values = ', '.join(f'new.{c}' for c in columns)
+    old_values = ', '.join(f'old.{c}' for c in columns)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({cols}, content='{table}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON \"{table}\" BEGIN "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON \"{table}\" BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON \"{table}\" BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values}); END",
+    ]
+
+
+def create_search_index():
+    created = False
+    for category, spec in SEARCH_INDEXES.items():
+        exists = db.session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE name = :name"), {'name': spec['fts']}
+        ).scalar()
+        for statement in index_ddl(category):
+            db.session.execute(text(statement))
+        if not exists:
+            db.session.execute(text(f"INSERT INTO {spec['fts']}({spec['fts']}) VALUES ('rebuild')"))
+            created = True
+    db.session.commit()
+    return created
+
+
+def rebuild_search_index():
+    for spec in SEARCH_INDEXES.values():
+        db.session.execute(text(f"INSERT INTO {spec['fts']}({spec['fts']}) VALUES ('rebuild')"))
+        db.session.execute(text(f"INSERT INTO {spec['fts']}({spec['fts']}) VALUES ('optimize')"))
+    db.session.commit()
+
+
+# Free text -> FTS5 query: every word must match as a prefix ("alg geo" -> "alg"* "geo"*)
+def match_expression(query):
+    terms = re.findall(r'\w+', query, flags=re.UNICODE)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def highlight(value):
+    if value is None:
+        return None
+    return Markup(str(escape(value)).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>'))
+
+
+def category_sql(category):
+    spec = SEARCH_INDEXES[category]
+    fts = spec['fts']
+    highlights = ', '.join(
+        f"highlight({fts}, {i}, '{MARK_START}', '{MARK_END}') AS {column}"
+        for i, column in enumerate(spec['columns'])
+    )
+    return f"SELECT '{category}' AS category, {fts}.rowid AS id, {fts}.rank AS rank, {highlights}, details.detail " \
+           + matches_sql(category)
+
+
+# The hits themselves: the join drops rows DETAIL_SQL leaves out (tombstoned or orphaned)
+def matches_sql(category):
+    fts = SEARCH_INDEXES[category]['fts']
+    return f"FROM {fts} JOIN ({DETAIL_SQL[category]}) details ON details.id = {fts}.rowid WHERE {fts} MATCH :match"
+
+
+def search(query, category=None, page=1, per_page=20):
+    categories = [category] if category in SEARCH_INDEXES else list(SEARCH_INDEXES)
+    match = match_expression(query)
+    if not match:
+        return SearchPage([], 0, page, per_page)
+
+    session = read_session()
+    total = 0
+    for c in categories:
+        total += session.execute(text("SELECT count(*) " + matches_sql(c)), {'match': match}).scalar()
+
+    # Each category is ranked by bm25 inside FTS5; the page is merged in Python so
+    # each branch only has to produce its best `offset + per_page` hits.
+    offset = (page - 1) * per_page
+    hits = []
+    for c in categories:
+        rows = session.execute(
+            text(category_sql(c) + " ORDER BY rank LIMIT :limit"),
+            {'match': match, 'limit': offset + per_page}
+        ).mappings()
+        for row in rows:
+            fields = {column: highlight(row[column]) for column in SEARCH_INDEXES[c]['columns']}
+            hits.append(SearchHit(c, row['id'], row['rank'], fields, row['detail']))
+
+    hits.sort(key=lambda hit: hit.rank)
+    return SearchPage(hits[offset:offset + per_page], total, page, per_page)
@@ -1,5 +1,8 @@
-from app import app, db
+from app import create_app
+from services.bootstrap import bootstrap
 
+# Same as `flask --app app bootstrap`
+app = create_app()
 with app.app_context():
-    db.create_all()
+    bootstrap(app.config['ADMIN_EMAIL'], app.config['ADMIN_PASSWORD'])
     print("Database tables created successfully!")
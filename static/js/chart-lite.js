@@ -0,0 +1,209 @@
+/*
+ * Offline stand-in for the part of Chart.js the dashboards use: bar and line charts,
+ * a legend above the plot and a y axis that can start at zero. Templates load it only
+ * when Chart.js itself did not load (see VENDORED in services/assets.py), so charts
+ * still render where the CDN is unreachable.
+ */
+(function () {
+    "use strict";
+
+    const FONT = "12px sans-serif";
+    const TEXT_COLOR = "#666";
+    const GRID_COLOR = "rgba(0, 0, 0, 0.1)";
+    const PALETTE = ["rgba(54, 162, 235, 0.8)", "rgba(255, 99, 132, 0.8)", "rgba(75, 192, 192, 0.8)",
+                     "rgba(255, 159, 64, 0.8)", "rgba(153, 102, 255, 0.8)"];
+    const ASPECT_RATIO = 2;  // Chart.js default for responsive charts
+    const SWATCH = 12;
+    const ROW = 20;
+
+    // 1, 2 or 5 times a power of ten, so that about `count` steps cover `span`
+    function niceStep(span, count) {
+        const raw = span / count;
+        const magnitude = Math.pow(10, Math.floor(Math.log10(raw)));
+        return [1, 2, 5, 10].map(step => step * magnitude).find(step => step >= raw);
+    }
+
+    function formatTick(value, step) {
+        const decimals = Math.max(0, -Math.floor(Math.log10(step)));
+        return value.toFixed(decimals);
+    }
+
+    function fitText(ctx, text, width) {
+        text = String(text);
+        if (ctx.measureText(text).width <= width) {
+            return text;
+        }
+        while (text.length > 1 && ctx.measureText(text + "…").width > width) {
+            text = text.slice(0, -1);
+        }
+        return text + "…";
+    }
+
+    function Chart(target, config) {
+        this.ctx = target.getContext ? target.getContext("2d") : target;
+        this.canvas = this.ctx.canvas;
+        this.config = config;
+        const options = config.options || {};
+        if (options.responsive !== false) {
+            window.addEventListener("resize", () => this.draw());
+        }
+        this.draw();
+    }
+
+    Chart.prototype.draw = function () {
+        const ctx = this.ctx;
+        const canvas = this.canvas;
+        const type = this.config.type;
+        const data = this.config.data;
+        const options = this.config.options || {};
+        const yScale = (options.scales || {}).y || {};
+        const legend = (options.plugins || {}).legend || {};
+
+        const width = (canvas.parentNode && canvas.parentNode.clientWidth) || canvas.width || 300;
+        const height = Math.round(width / ASPECT_RATIO);
+        const ratio = window.devicePixelRatio || 1;
+        canvas.style.width = width + "px";
+        canvas.style.height = height + "px";
+        canvas.width = width * ratio;
+        canvas.height = height * ratio;
+        ctx.setTransform(ratio, 0, 0, ratio, 0, 0);
+        ctx.clearRect(0, 0, width, height);
+        ctx.font = FONT;
+        ctx.textBaseline = "middle";
+
+        const labels = data.labels || [];
+        const datasets = data.datasets.map((dataset, i) => ({
+            label: dataset.label,
+            data: dataset.data,
+            color: (type === "line" ? dataset.borderColor : dataset.backgroundColor)
+                || dataset.backgroundColor || dataset.borderColor || PALETTE[i % PALETTE.length],
+        }));
+
+        // Legend: one swatch and label per dataset, wrapped into centred rows
+        let top = 8;
+        if (legend.display !== false) {
+            const rows = [[]];
+            const rowWidths = [0];
+            datasets.forEach(dataset => {
+                const itemWidth = SWATCH + 6 + ctx.measureText(dataset.label || "").width + 16;
+                if (rowWidths[rowWidths.length - 1] + itemWidth > width && rows[rows.length - 1].length) {
+                    rows.push([]);
+                    rowWidths.push(0);
+                }
+                rows[rows.length - 1].push([dataset, itemWidth]);
+                rowWidths[rowWidths.length - 1] += itemWidth;
+            });
+            rows.forEach((row, r) => {
+                let x = (width - rowWidths[r]) / 2;
+                const y = top + r * ROW + ROW / 2;
+                row.forEach(([dataset, itemWidth]) => {
+                    ctx.fillStyle = dataset.color;
+                    ctx.fillRect(x, y - SWATCH / 2, SWATCH, SWATCH);
+                    ctx.fillStyle = TEXT_COLOR;
+                    ctx.textAlign = "left";
+                    ctx.fillText(dataset.label || "", x + SWATCH + 6, y);
+                    x += itemWidth;
+                });
+            });
+            top += rows.length * ROW + 8;
+        }
+
+        // Y scale
+        const values = [].concat(...datasets.map(dataset => dataset.data))
+            .filter(value => typeof value === "number" && isFinite(value));
+        let min = values.length ? Math.min(...values) : 0;
+        let max = values.length ? Math.max(...values) : 1;
+        if (yScale.beginAtZero) {
+            min = Math.min(0, min);
+            max = Math.max(0, max);
+        }
+        if (max === min) {
+            max = min + 1;
+        }
+        const step = niceStep(max - min, 5);
+        const low = Math.floor(min / step) * step;
+        const high = Math.ceil(max / step) * step;
+        const ticks = [];
+        for (let value = low; value <= high + step / 2; value += step) {
+            ticks.push(value);
+        }
+        const tickWidth = Math.max(...ticks.map(value => ctx.measureText(formatTick(value, step)).width));
+
+        const left = tickWidth + 12;
+        const right = width - 8;
+        const bottom = height - 24;
+        const plotWidth = right - left;
+        const y = value => bottom - (value - low) / (high - low) * (bottom - top);
+
+        ctx.textAlign = "right";
+        ticks.forEach(value => {
+            ctx.strokeStyle = GRID_COLOR;
+            ctx.beginPath();
+            ctx.moveTo(left, Math.round(y(value)) + 0.5);
+            ctx.lineTo(right, Math.round(y(value)) + 0.5);
+            ctx.stroke();
+            ctx.fillStyle = TEXT_COLOR;
+            ctx.fillText(formatTick(value, step), left - 6, y(value));
+        });
+
+        // X labels in the middle of each slot, thinned out so they never overlap
+        const slot = plotWidth / Math.max(labels.length, 1);
+        const widest = Math.max(0, ...labels.map(label => ctx.measureText(String(label)).width));
+        const every = Math.max(1, Math.ceil(Math.min(widest + 8, 120) / slot));
+        ctx.textAlign = "center";
+        ctx.fillStyle = TEXT_COLOR;
+        labels.forEach((label, i) => {
+            if (i % every === 0) {
+                ctx.fillText(fitText(ctx, label, slot * every - 4), left + slot * (i + 0.5), bottom + 12);
+            }
+        });
+
+        if (type === "bar") {
+            const group = slot * 0.8;
+            const barWidth = group / Math.max(datasets.length, 1);
+            datasets.forEach((dataset, d) => {
+                ctx.fillStyle = dataset.color;
+                dataset.data.forEach((value, i) => {
+                    if (typeof value !== "number") {
+                        return;
+                    }
+                    const x = left + slot * i + (slot - group) / 2 + barWidth * d;
+                    const y0 = y(Math.max(low, Math.min(0, high)));
+                    ctx.fillRect(x, Math.min(y(value), y0), barWidth, Math.abs(y0 - y(value)));
+                });
+            });
+        } else {
+            ctx.lineWidth = 2;
+            datasets.forEach(dataset => {
+                ctx.strokeStyle = dataset.color;
+                ctx.fillStyle = dataset.color;
+                ctx.beginPath();
+                let drawing = false;
+                dataset.data.forEach((value, i) => {
+                    if (typeof value !== "number") {
+                        drawing = false;  // Gap in the series
+                        return;
+                    }
+                    const x = left + slot * (i + 0.5);
+                    if (drawing) {
+                        ctx.lineTo(x, y(value));
+                    } else {
+                        ctx.moveTo(x, y(value));
+                        drawing = true;
+                    }
+                });
+                ctx.stroke();
+                dataset.data.forEach((value, i) => {
+                    if (typeof value === "number") {
+                        ctx.beginPath();
+                        ctx.arc(left + slot * (i + 0.5), y(value), 3, 0, 2 * Math.PI);
+                        ctx.fill();
+                    }
+                });
+            });
+            ctx.lineWidth = 1;
+        }
+    };
+
+    window.Chart = Chart;
+})();